@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+"""Fixtures for the benchmarks.
+
+Timings are compared against earlier runs with pytest-benchmark's own storage, since they depend on the
+machine. Save a baseline with ``tox -e benchmark -- --benchmark-save=baseline`` and compare against it with
+``tox -e benchmark -- --benchmark-compare --benchmark-compare-fail=median:25%``.
+
+The peak memory of each benchmark that uses :func:`measure_memory` is compared against the baseline in
+``memory_baseline.json``, which doesn't depend on the machine as much, so it's kept in the repository.
+A benchmark fails if its peak memory grows by more than ``--memory-tolerance``. Update the baseline with
+``--update-memory-baseline`` after an intended change.
+"""
+
+import gc
+import json
+import tracemalloc
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+HERE = Path(__file__).parent.resolve()
+MEMORY_BASELINE_PATH = HERE / 'memory_baseline.json'
+
+#: The peak memory of the benchmarks in this session, if the baseline is updated
+_PEAK_MEMORY: Dict[str, int] = {}
+
+
+def pytest_addoption(parser):
+    """Add options for comparing memory and sizing the synthetic fixtures."""
+    group = parser.getgroup('compath', 'ComPath benchmarks')
+    group.addoption(
+        '--memory-tolerance', type=float, default=0.25,
+        help='Fail benchmarks whose peak memory grew by more than this fraction of the baseline (default: 0.25)',
+    )
+    group.addoption(
+        '--update-memory-baseline', action='store_true',
+        help=f'Write the peak memory of the benchmarks that ran to {MEMORY_BASELINE_PATH.name}',
+    )
+    group.addoption(
+        '--curation-pathways', type=int, default=500,
+        help='The number of pathways in each synthetic database for the curation benchmarks (default: 500)',
+    )
+    group.addoption(
+        '--curation-genes', type=int, default=10_000,
+        help='The number of genes in the synthetic gene vocabulary for the curation benchmarks (default: 10000)',
+    )
+
+
+def pytest_generate_tests(metafunc):
+    """Parametrize the curation benchmarks with the size of the synthetic databases, so it's in their names."""
+    if 'curation_size' in metafunc.fixturenames:
+        pathways, genes = metafunc.config.getoption('curation_pathways'), metafunc.config.getoption('curation_genes')
+        metafunc.parametrize('curation_size', [(pathways, genes)], ids=[f'{pathways}x{genes}'])
+
+
+def pytest_sessionfinish(session):
+    """Write the memory baseline, keeping the entries of the benchmarks that didn't run."""
+    if not session.config.getoption('update_memory_baseline') or not _PEAK_MEMORY:
+        return
+    baseline = _read_memory_baseline()
+    baseline.update(_PEAK_MEMORY)
+    MEMORY_BASELINE_PATH.write_text(json.dumps(dict(sorted(baseline.items())), indent=2) + '\n')
+
+
+def _read_memory_baseline() -> Dict[str, int]:
+    if not MEMORY_BASELINE_PATH.exists():
+        return {}
+    return json.loads(MEMORY_BASELINE_PATH.read_text())
+
+
+def _measure_memory(func):
+    """Get the peak and retained memory in bytes allocated while calling the function."""
+    gc.collect()
+    tracemalloc.start()
+    rv = func()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rv
+    return peak, retained
+
+
+@pytest.fixture(scope='session')
+def memory_baseline() -> Dict[str, int]:
+    """Get the peak memory of each benchmark in the baseline, by its name."""
+    return _read_memory_baseline()
+
+
+@pytest.fixture
+def measure_memory(benchmark, request, memory_baseline):
+    """Get a function that records the peak and retained memory of calling a function in the benchmark.
+
+    If the peak memory grew by more than the tolerance since the baseline, the benchmark fails.
+    """
+    key = f'{request.node.module.__name__}::{request.node.name}'
+
+    def _record(func) -> None:
+        peak, retained = _measure_memory(func)
+        benchmark.extra_info['peak_memory'], benchmark.extra_info['retained_memory'] = peak, retained
+
+        if request.config.getoption('update_memory_baseline'):
+            _PEAK_MEMORY[key] = peak
+            return
+        baseline = memory_baseline.get(key)
+        if baseline is None:
+            return
+        benchmark.extra_info['baseline_peak_memory'] = baseline
+        tolerance = request.config.getoption('memory_tolerance')
+        if peak > (1 + tolerance) * baseline:
+            pytest.fail(f'peak memory regressed from {baseline} to {peak} bytes ({peak / baseline - 1:+.0%})')
+
+    return _record
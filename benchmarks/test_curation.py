@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmarks for calculating the gene set and name similarities between pathways of different databases.
+
+The gene sets are synthetic, so no Bio2BEL database is needed. Their size is set with ``--curation-pathways``
+and ``--curation-genes``.
+
+Run with ``tox -e benchmark`` or ``pytest benchmarks``.
+"""
+
+import math
+from typing import Dict, Mapping, Set, Tuple
+
+import numpy as np
+import pytest
+
+from compath_resources.curation import (
+    MinHashLSH, calculate_pairwise_similarities, calculate_similarity_matrices, evaluate_candidates,
+    get_gene_set_matrix, get_gene_vocabulary,
+)
+
+#: The names of the synthetic databases
+DATABASES = ['a', 'b', 'c']
+
+
+def get_synthetic_databases(
+    pathways: int,
+    genes: int,
+    seed: int = 0,
+) -> Tuple[Dict[str, Dict[str, Set[str]]], Dict[str, Dict[str, str]]]:
+    """Make gene sets and names of pathways in several databases, with about a third shared between them.
+
+    Pathway sizes have a long tail, like in real databases. Shared pathways have the same name and gene
+    set in each database, up to a few genes, so they pass the default similarity thresholds.
+
+    :return: A dictionary from database names to pathway identifiers to gene sets, and a dictionary from
+        database names to pathway identifiers to names
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f'G{i}' for i in range(genes)])
+    sizes = np.clip(rng.lognormal(3.5, 1.0, pathways), 2, genes // 2).astype(int)
+    shared = [
+        set(rng.choice(genes, size=size, replace=False).tolist())
+        for size in sizes[:pathways // 3]
+    ]
+
+    database: Dict[str, Dict[str, Set[str]]] = {}
+    mappings: Dict[str, Dict[str, str]] = {}
+    for name in DATABASES:
+        database[name], mappings[name] = {}, {}
+        for i, size in enumerate(sizes):
+            if i < len(shared):
+                indexes = set(shared[i])
+                indexes.difference_update(rng.choice(list(indexes), size=len(indexes) // 10, replace=False).tolist())
+                pathway_name = f'pathway {i}'
+            else:
+                indexes = rng.choice(genes, size=size, replace=False).tolist()
+                pathway_name = f'{name} pathway {i}'
+            database[name][f'{name}:{i}'] = set(vocabulary[sorted(indexes)].tolist())
+            mappings[name][f'{name}:{i}'] = pathway_name
+    return database, mappings
+
+
+@pytest.fixture
+def databases(curation_size: Tuple[int, int]) -> Tuple[Mapping[str, Mapping[str, Set[str]]], Mapping[str, Mapping[str, str]]]:
+    """Get the synthetic databases, sized with the command line options."""
+    pathways, genes = curation_size
+    return get_synthetic_databases(pathways=pathways, genes=genes)
+
+
+@pytest.mark.parametrize('name_similarity', ['exact', 'ngram'])
+def test_similarity_matrices(benchmark, measure_memory, databases, name_similarity: str):
+    """Benchmark calculating the similarities of all pairs of synthetic databases."""
+    database, mappings = databases
+
+    def _calculate():
+        return calculate_similarity_matrices(database, mappings, name_similarity=name_similarity)
+
+    measure_memory(_calculate)
+    results = benchmark(_calculate)
+    assert all(len(df.index) for df in results.values())
+
+
+@pytest.mark.parametrize('minimum_gene_set_similarity', [0.8, 0.3])
+def test_lsh(benchmark, databases, minimum_gene_set_similarity: float):
+    """Benchmark scoring only the candidates from locality-sensitive hashing, and report their recall.
+
+    The recall and the fraction of pairs of pathways that were scored are in the benchmark's extra info.
+    The pathways shared between the synthetic databases should all be found.
+    """
+    database, mappings = databases
+    gene_to_index = get_gene_vocabulary(database.values())
+    gene_set_matrices = {
+        name: get_gene_set_matrix(pathway_id_to_symbols, mappings[name], gene_to_index)
+        for name, pathway_id_to_symbols in database.items()
+    }
+    lsh = MinHashLSH()
+
+    benchmark(
+        calculate_pairwise_similarities, gene_set_matrices,
+        minimum_gene_set_similarity=minimum_gene_set_similarity, name_similarity='ngram', lsh=lsh,
+    )
+    evaluation = evaluate_candidates(gene_set_matrices, lsh, minimum_gene_set_similarity=minimum_gene_set_similarity)
+    benchmark.extra_info.update(evaluation)
+    shared = len(next(iter(database.values()))) // 3
+    assert evaluation['found'] >= 0.95 * shared * math.comb(len(gene_set_matrices), 2)
+
+
+@pytest.mark.parametrize('top_k', [None, 5])
+def test_top_k(benchmark, measure_memory, databases, tmp_path, top_k):
+    """Benchmark a low threshold with and without keeping only the best matches of each pathway.
+
+    The peak memory of the top-k mode grows with the number of pathways, not with the number of pairs.
+    """
+    database, mappings = databases
+
+    def _calculate():
+        return calculate_similarity_matrices(
+            database, mappings, minimum_gene_set_similarity=0.05, name_similarity='ngram',
+            directory=tmp_path, top_k=top_k,
+        )
+
+    measure_memory(_calculate)
+    results = benchmark(_calculate)
+    if top_k is not None:
+        assert all(df.groupby(df.columns[0]).size().max() <= top_k for df in results.values())
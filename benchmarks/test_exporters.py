@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmarks for exporting the resources.
+
+Run with ``tox -e benchmark`` or ``pytest benchmarks``.
+"""
+
+import io
+
+import pytest
+
+import pybel
+from compath_resources import get_df
+from compath_resources.exporters.bel import BEL_RELATIONS, get_bel, write_bel_script, write_nodelink
+from compath_resources.exporters.rdf import get_rdf
+from pybel.dsl import BiologicalProcess
+
+
+@pytest.fixture(scope='module')
+def df():
+    """Get the full mapping table."""
+    return get_df(include_reactome_hierarchy=True, include_decopath=True, include_special=True)
+
+
+def _get_bel_legacy(df) -> pybel.BELGraph:
+    graph = pybel.BELGraph(name='ComPath Mappings', version='1.1.0')
+    for source_ns, source_id, source_name, relation, target_ns, target_id, target_name in df.values:
+        source = BiologicalProcess(namespace=source_ns, identifier=source_id, name=source_name)
+        target = BiologicalProcess(namespace=target_ns, identifier=target_id, name=target_name)
+        if BEL_RELATIONS[relation] == pybel.constants.PART_OF:
+            graph.add_part_of(source, target)
+        else:
+            graph.add_equivalence(source, target)
+    return graph
+
+
+def test_bel_legacy(benchmark, measure_memory, df):
+    """Benchmark building the BEL graph by adding one mapping at a time."""
+    measure_memory(lambda: _get_bel_legacy(df))
+    benchmark(_get_bel_legacy, df)
+
+
+def test_bel(benchmark, measure_memory, df):
+    """Benchmark building the BEL graph in bulk."""
+    measure_memory(lambda: get_bel(df))
+    benchmark(get_bel, df)
+
+
+def test_bel_script_legacy(benchmark, df):
+    """Benchmark writing a BEL script by building a graph first."""
+    benchmark(lambda: pybel.to_bel_script(_get_bel_legacy(df), io.StringIO()))
+
+
+def test_bel_script(benchmark, measure_memory, df):
+    """Benchmark streaming a BEL script."""
+    measure_memory(lambda: write_bel_script(io.StringIO(), df))
+    benchmark(lambda: write_bel_script(io.StringIO(), df))
+
+
+def test_nodelink_legacy(benchmark, df):
+    """Benchmark writing node-link JSON by building a graph first."""
+    benchmark(lambda: pybel.to_nodelink_file(_get_bel_legacy(df), io.StringIO()))
+
+
+def test_nodelink(benchmark, measure_memory, df):
+    """Benchmark streaming node-link JSON."""
+    measure_memory(lambda: write_nodelink(io.StringIO(), df))
+    benchmark(lambda: write_nodelink(io.StringIO(), df))
+
+
+@pytest.mark.parametrize('rdf_format', ['nt', 'turtle', 'xml'])
+def test_rdf_graph(benchmark, measure_memory, rdf_format: str):
+    """Benchmark writing RDF by building and serializing an RDFLib graph."""
+    def _write():
+        get_rdf().serialize(io.BytesIO(), format=rdf_format)
+
+    measure_memory(_write)
+    benchmark(_write)
+
+
+@pytest.mark.parametrize('rdf_format', ['nt', 'turtle', 'xml'])
+def test_rdf_stream(benchmark, measure_memory, rdf_format: str):
+    """Benchmark streaming RDF."""
+    def _write():
+        get_rdf(io.StringIO(), format=rdf_format)
+
+    measure_memory(_write)
+    benchmark(_write)
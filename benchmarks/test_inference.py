@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmarks for inferring the mappings implied by the resources.
+
+Run with ``tox -e benchmark`` or ``pytest benchmarks``.
+"""
+
+from typing import Optional
+
+import pytest
+
+from compath_resources import get_df
+from compath_resources.inference import INFERRED_MAX_HOPS, infer_mappings
+
+
+@pytest.fixture(scope='module')
+def df():
+    """Get the full mapping table."""
+    return get_df(include_reactome_hierarchy=True, include_decopath=True, include_special=True)
+
+
+@pytest.mark.parametrize('max_hops', [INFERRED_MAX_HOPS, None])
+def test_infer_mappings(benchmark, measure_memory, df, max_hops: Optional[int]):
+    """Benchmark inferring the mappings up to the hops written by the sync, and until no new ones are found."""
+    measure_memory(lambda: infer_mappings(df, max_hops=max_hops))
+    inferred_df = benchmark(infer_mappings, df, max_hops=max_hops)
+    assert len(inferred_df.index)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmarks for loading the resources.
+
+Run with ``tox -e benchmark`` or ``pytest benchmarks``.
+"""
+
+import itertools as itt
+
+import pandas as pd
+import pytest
+
+from compath_resources.resources import (
+    RESOURCE_PATHS, SNAPSHOT_CODES_PATH, SNAPSHOT_METADATA_PATH, clear_cache, get_df,
+)
+from compath_resources.resources.snapshot import read_snapshot
+
+
+def _parse_csv():
+    return [pd.read_csv(path, sep='\t') for path in RESOURCE_PATHS]
+
+
+def _load_snapshot():
+    snapshot = read_snapshot(SNAPSHOT_METADATA_PATH, SNAPSHOT_CODES_PATH)
+    return [snapshot.get_df(path) for path in RESOURCE_PATHS]
+
+
+def test_parse_csv(benchmark, measure_memory):
+    """Benchmark parsing all resource files from their TSVs."""
+    measure_memory(_parse_csv)
+    benchmark(_parse_csv)
+
+
+def test_load_snapshot(benchmark, measure_memory):
+    """Benchmark loading all resource files from the precompiled snapshot."""
+    measure_memory(_load_snapshot)
+    benchmark(_load_snapshot)
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_get_df_memory(benchmark, measure_memory, compact: bool):
+    """Benchmark building the full mapping table from a cold cache, with or without compact encoding."""
+    def _get_df():
+        clear_cache()
+        return get_df(include_reactome_hierarchy=True, include_decopath=True, include_special=True, compact=compact)
+
+    measure_memory(_get_df)
+    benchmark(_get_df)
+
+
+@pytest.mark.parametrize(
+    'include_reactome_hierarchy,include_decopath,include_special',
+    list(itt.product([False, True], repeat=3)),
+)
+def test_get_df(benchmark, measure_memory, include_reactome_hierarchy: bool, include_decopath: bool,
+                include_special: bool):
+    """Benchmark building the mapping table from a cold cache with each combination of included resources."""
+    def _get_df():
+        clear_cache()
+        return get_df(
+            include_reactome_hierarchy=include_reactome_hierarchy,
+            include_decopath=include_decopath,
+            include_special=include_special,
+        )
+
+    measure_memory(_get_df)
+    benchmark(_get_df)
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmarks for importing the package, with ``python -X importtime``.
+
+The cumulative import time of the package, in microseconds, is recorded in the extra info of each benchmark.
+"""
+
+import pytest
+
+from compath_resources.utils import get_import_times
+
+STATEMENTS = {
+    'package': 'import compath_resources',
+    'get_df': 'from compath_resources import get_df',
+    'get_bel': 'from compath_resources import get_bel',
+}
+
+#: The largest cumulative import time of the package in microseconds that doesn't count as a regression
+BUDGETS = {
+    'package': 50_000,
+}
+
+
+def _get_package_import_time(statement: str) -> int:
+    """Get the cumulative import time of the package in microseconds when running the statement."""
+    import_times = get_import_times(statement)
+    if 'compath_resources' not in import_times:
+        raise ValueError(f'compath_resources was not imported by `{statement}`')
+    return import_times['compath_resources']
+
+
+@pytest.mark.parametrize('key', sorted(STATEMENTS))
+def test_import_time(benchmark, key: str):
+    """Benchmark importing the package in a new interpreter."""
+    import_time = benchmark.pedantic(_get_package_import_time, args=(STATEMENTS[key],), rounds=5)
+    benchmark.extra_info['import_time'] = import_time
+    if key in BUDGETS:
+        assert import_time < BUDGETS[key]
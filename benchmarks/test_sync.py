@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmarks for syncing the mappings into the package.
+
+The resource files, snapshot, closure, and manifest are written to a temporary directory, so the
+package's own resources aren't touched.
+
+Run with ``tox -e benchmark`` or ``pytest benchmarks``.
+"""
+
+from pathlib import Path
+from unittest import mock
+
+import pytest
+from click.testing import CliRunner
+
+from compath_resources import sync
+from compath_resources.closure import write_closure
+from compath_resources.inference import write_inferred
+from compath_resources.resources.snapshot import write_snapshot
+
+
+@pytest.fixture
+def directory(tmp_path: Path):
+    """Redirect everything the sync writes to a temporary directory."""
+    outputs = {importer.output: tmp_path / importer.output.name for importer in sync.IMPORTERS}
+    # importers that read the outputs of other importers read the redirected ones
+    importers = [
+        importer._replace(
+            output=outputs[importer.output],
+            dependencies=tuple(outputs.get(path, path) for path in importer.dependencies),
+        )
+        for importer in sync.IMPORTERS
+    ]
+
+    def _write_snapshot():
+        write_snapshot(list(outputs.values()), tmp_path / 'snapshot.json', tmp_path / 'snapshot.npy')
+
+    with mock.patch.object(sync, 'IMPORTERS', importers), \
+            mock.patch.object(sync, 'MANIFEST_PATH', tmp_path / 'sync.json'), \
+            mock.patch.object(sync.rsc, 'write_snapshot', _write_snapshot), \
+            mock.patch.object(sync, 'write_closure', lambda: write_closure(tmp_path / 'closure.json')), \
+            mock.patch.object(sync, 'write_inferred', lambda: write_inferred(tmp_path / 'inferred.tsv')):
+        yield tmp_path
+
+
+def _main(*args: str) -> None:
+    result = CliRunner().invoke(sync._main, args, catch_exceptions=False)
+    assert result.exit_code == 0, result.output
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_sync(benchmark, measure_memory, directory, workers: int):
+    """Benchmark importing all mappings, with the importers in this process or in worker processes."""
+    def _sync():
+        _main('--force', '--workers', str(workers))
+
+    measure_memory(_sync)
+    benchmark(_sync)
+
+
+def test_sync_unchanged(benchmark, measure_memory, directory):
+    """Benchmark syncing when no sources changed since the last sync."""
+    _main('--workers', '1')
+
+    measure_memory(_main)
+    benchmark(_main)
+
+
+def test_check(benchmark, directory):
+    """Benchmark checking if the resources are in sync."""
+    _main('--workers', '1')
+    benchmark(_main, '--check')
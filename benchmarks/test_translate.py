@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmarks for translating columns of pathways in large tables.
+
+Run with ``tox -e benchmark`` or ``pytest benchmarks``.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from compath_resources import get_df
+from compath_resources.translate import TranslationResult, translate_file
+
+#: The number of rows in the synthetic table
+ROWS = 200_000
+
+
+@pytest.fixture(scope='module')
+def table(tmp_path_factory) -> Path:
+    """Write a synthetic table of enrichment results for the pathways in the mappings and some unmapped ones."""
+    df = get_df()
+    curies = np.concatenate([
+        (df['source prefix'] + ':' + df['source identifier']).to_numpy(dtype=str),
+        [f'unmapped:{i}' for i in range(100)],
+    ])
+    rng = np.random.default_rng(0)
+    path = tmp_path_factory.mktemp('translate') / 'enrichment.tsv'
+    pd.DataFrame({
+        'pathway': curies[rng.integers(0, len(curies), ROWS)],
+        'p': rng.random(ROWS).round(6),
+    }).to_csv(path, sep='\t', index=False)
+    return path
+
+
+def _translate(path: Path, **kwargs) -> TranslationResult:
+    with path.open() as input_file, open(os.devnull, 'w') as output_file:
+        return translate_file(input_file, output_file, **kwargs)
+
+
+@pytest.mark.parametrize('representative', [False, True])
+def test_translate_file(benchmark, measure_memory, table: Path, representative: bool):
+    """Benchmark translating a table to Reactome, or to the representatives of the clusters.
+
+    The peak memory is bounded by the size of the chunks, not of the table.
+    """
+    kwargs = dict(column='pathway', prefix=None if representative else 'reactome', representative=representative)
+    measure_memory(lambda: _translate(table, **kwargs))
+    result = benchmark(_translate, table, **kwargs)
+    benchmark.extra_info['rows_per_second'] = result.rows_per_second
+    assert result.rows == ROWS
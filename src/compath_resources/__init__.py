@@ -1,6 +1,39 @@
 # -*- coding: utf-8 -*-
 
-"""Utilities for ComPath's resources."""
+"""Utilities for ComPath's resources.
 
-from .exporters import get_bel, get_rdf  # noqa: F401
-from .resources import get_df  # noqa: F401
+The functions are imported on first use, so ``import compath_resources`` doesn't import pandas,
+PyBEL, or RDFLib. Using :func:`get_df` doesn't import PyBEL or RDFLib either.
+"""
+
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .exporters import get_bel, get_rdf  # noqa: F401
+    from .resources import get_df  # noqa: F401
+
+__all__ = [
+    'get_bel',
+    'get_df',
+    'get_rdf',
+]
+
+#: The module each function is imported from on first use
+_LAZY_ATTRIBUTES = {
+    'get_bel': '.exporters.bel',
+    'get_df': '.resources',
+    'get_rdf': '.exporters.rdf',
+}
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    rv = globals()[name] = getattr(importlib.import_module(module_name, __name__), name)
+    return rv
+
+
+def __dir__():
+    return sorted({*globals(), *__all__})
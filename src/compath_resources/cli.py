@@ -2,9 +2,41 @@
 
 """Command line interface for ComPath's resources."""
 
+import sys
+import time
+
+import click
+
+from .exporters.rdf import RDF_FORMATS, write_rdf
 from .manager import Manager
 
 main = Manager.get_cli()
 
+
+@main.command()
+@click.option(
+    '-o', '--output', type=click.File('w', encoding='utf-8'), default='compath_mappings.rdf', show_default=True,
+)
+@click.option('-f', '--rdf-format', type=click.Choice(sorted(RDF_FORMATS)), default='xml', show_default=True)
+def rdf(output, rdf_format: str):
+    """Write the mappings as RDF."""
+    start = time.time()
+    write_rdf(output, format=rdf_format)
+    click.echo(f'wrote {rdf_format} to {output.name} in {time.time() - start:.2f} seconds', err=True)
+
+
+@main.command()
+def validate():
+    """Validate the prefixes and identifiers in the mappings against the Bioregistry."""
+    # the Bioregistry is slow to import, so only import it for this command
+    from .validate import validate_resources
+
+    report = validate_resources()
+    if len(report.index):
+        click.echo(report.to_string(index=False))
+        sys.exit(1)
+    click.echo('all prefixes and identifiers are valid')
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+
+"""Precomputed equivalence clusters and part-of closure of the ComPath mappings.
+
+Pathways connected by ``skos:exactMatch`` mappings are merged into clusters with a union-find, and
+the ancestors of each pathway along ``BFO:0000050`` (part of) mappings are stored as a bitset. The
+part-of graph is not guaranteed to be acyclic, so its strongly connected components are ancestors
+of each other. Pathways are numbered such that ancestors come first, which keeps the bitsets small.
+
+.. code-block:: python
+
+    from compath_resources.closure import get_closure
+
+    closure = get_closure()
+    closure.is_ancestor('reactome:R-HSA-1430728', 'reactome:R-HSA-71406')
+    closure.same_cluster('kegg.pathway:hsa00020', 'reactome:R-HSA-71403')
+
+The closure is written to ``closure.json`` next to the resources by :mod:`compath_resources.sync` as a
+compressed ancestor table, and :func:`get_closure` loads it from there while it is up-to-date.
+"""
+
+import itertools as itt
+import json
+import logging
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from .constants import EXACT_MATCH, PART_OF
+from .index import PathwayMapping, Reference, parse_curie
+from .resources import RESOURCES, RESOURCE_PATHS, _get_cached, get_df
+from .resources.snapshot import get_hashes
+from .utils import atomic_path
+
+__all__ = [
+    'Closure',
+    'get_closure',
+    'write_closure',
+    'CLOSURE_PATH',
+]
+
+logger = logging.getLogger(__name__)
+
+CLOSURE_PATH = RESOURCES / 'closure.json'
+
+#: The version of the serialization format. Files with other versions are ignored.
+CLOSURE_VERSION = 1
+
+
+class Closure:
+    """Equivalence clusters and the transitive closure of the part-of hierarchy."""
+
+    def __init__(self, nodes: List[Reference], clusters: List[int], ancestors: List[List[int]]):
+        """Initialize the closure.
+
+        :param nodes: The pathways, numbered by their position
+        :param clusters: The number of the representative pathway of each pathway's cluster
+        :param ancestors: The numbers of the ancestors of each pathway, i.e., its compressed ancestor table
+        """
+        self.nodes = nodes
+        self.node_to_index: Dict[Reference, int] = {node: index for index, node in enumerate(nodes)}
+        self.clusters = clusters
+        self.ancestor_table = ancestors
+        self.ancestor_bits: List[int] = [_to_bits(indices) for indices in ancestors]
+
+        descendants: List[List[int]] = [[] for _ in nodes]
+        for index, indices in enumerate(ancestors):
+            for ancestor in indices:
+                descendants[ancestor].append(index)
+        self.descendant_bits: List[int] = [_to_bits(indices) for indices in descendants]
+
+        self.members: Dict[int, List[int]] = defaultdict(list)
+        for index, cluster in enumerate(clusters):
+            self.members[cluster].append(index)
+
+    @classmethod
+    def from_mappings(cls, mappings: Iterable[PathwayMapping]) -> 'Closure':
+        """Compute the closure of the given mappings."""
+        references = set()
+        equivalences, parents = [], defaultdict(set)
+        for mapping in mappings:
+            source = mapping.source_prefix, mapping.source_identifier
+            target = mapping.target_prefix, mapping.target_identifier
+            references.update((source, target))
+            if mapping.relation == EXACT_MATCH:
+                equivalences.append((source, target))
+            elif mapping.relation == PART_OF:
+                parents[source].add(target)
+
+        components = _get_components(sorted(references), parents)
+        nodes = [node for component in components for node in component]
+        return cls(
+            nodes=nodes,
+            clusters=_get_clusters(nodes, equivalences),
+            ancestors=_get_ancestors(components, parents),
+        )
+
+    @classmethod
+    def from_resources(cls) -> 'Closure':
+        """Compute the closure of all mappings in :func:`compath_resources.get_df`."""
+        df = get_df(
+            include_reactome_hierarchy=True, include_decopath=True, include_special=True, include_neurommsig=True,
+        )
+        return cls.from_mappings(map(PathwayMapping._make, df.itertuples(index=False, name=None)))
+
+    def to_json(self, path: Path, hashes: Optional[Mapping[str, str]] = None) -> None:
+        """Write the closure as JSON.
+
+        :param path: The path to the file
+        :param hashes: The hashes of the resource files the closure was computed from
+        """
+        with atomic_path(path) as temporary_path:
+            temporary_path.write_text(json.dumps(dict(
+                version=CLOSURE_VERSION,
+                resources=hashes or {},
+                nodes=[f'{prefix}:{identifier}' for prefix, identifier in self.nodes],
+                clusters=self.clusters,
+                ancestors=self.ancestor_table,
+            )), encoding='utf-8')
+
+    @classmethod
+    def from_json(cls, path: Path, hashes: Optional[Mapping[str, str]] = None) -> Optional['Closure']:
+        """Read a closure from JSON.
+
+        :param path: The path to the file
+        :param hashes: If given, the closure is only read if it was computed from files with these hashes
+        :return: The closure, or None if the file does not exist, has another version, or is out of date
+        """
+        if not Path(path).exists():
+            return None
+        data = json.loads(Path(path).read_text(encoding='utf-8'))
+        if data.get('version') != CLOSURE_VERSION:
+            return None
+        if hashes is not None and data['resources'] != hashes:
+            logger.warning('closure is out of date. run `python -m compath_resources.sync`')
+            return None
+        return cls(
+            nodes=[parse_curie(curie) for curie in data['nodes']],
+            clusters=data['clusters'],
+            ancestors=data['ancestors'],
+        )
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self.nodes)
+
+    def __contains__(self, curie: str) -> bool:  # noqa: D105
+        return parse_curie(curie) in self.node_to_index
+
+    def _curies(self, bits: int) -> Set[str]:
+        rv = set()
+        while bits:
+            low = bits & -bits
+            prefix, identifier = self.nodes[low.bit_length() - 1]
+            rv.add(f'{prefix}:{identifier}')
+            bits ^= low
+        return rv
+
+    def ancestors(self, curie: str) -> Set[str]:
+        """Get the CURIEs of all pathways the given pathway is directly or indirectly part of."""
+        index = self.node_to_index.get(parse_curie(curie))
+        return set() if index is None else self._curies(self.ancestor_bits[index])
+
+    def descendants(self, curie: str) -> Set[str]:
+        """Get the CURIEs of all pathways that are directly or indirectly part of the given pathway."""
+        index = self.node_to_index.get(parse_curie(curie))
+        return set() if index is None else self._curies(self.descendant_bits[index])
+
+    def is_ancestor(self, ancestor: str, descendant: str) -> bool:
+        """Check if the descendant pathway is directly or indirectly part of the ancestor pathway."""
+        ancestor_index = self.node_to_index.get(parse_curie(ancestor))
+        descendant_index = self.node_to_index.get(parse_curie(descendant))
+        if ancestor_index is None or descendant_index is None:
+            return False
+        return bool(self.ancestor_bits[descendant_index] >> ancestor_index & 1)
+
+    def representative(self, curie: str) -> str:
+        """Get the CURIE of the representative of the pathway's equivalence cluster.
+
+        Pathways that don't appear in any mapping are their own representative.
+        """
+        index = self.node_to_index.get(parse_curie(curie))
+        if index is None:
+            return curie
+        prefix, identifier = self.nodes[self.clusters[index]]
+        return f'{prefix}:{identifier}'
+
+    def cluster(self, curie: str) -> Set[str]:
+        """Get the CURIEs of all pathways that are directly or indirectly equivalent to the given pathway."""
+        index = self.node_to_index.get(parse_curie(curie))
+        if index is None:
+            return {curie}
+        return {
+            f'{prefix}:{identifier}'
+            for prefix, identifier in map(self.nodes.__getitem__, self.members[self.clusters[index]])
+        }
+
+    def same_cluster(self, a: str, b: str) -> bool:
+        """Check if two pathways are directly or indirectly equivalent."""
+        return a == b or self.representative(a) == self.representative(b)
+
+
+def _to_bits(indices: Iterable[int]) -> int:
+    rv = 0
+    for index in indices:
+        rv |= 1 << index
+    return rv
+
+
+def _get_ancestors(
+    components: List[List[Reference]],
+    parents: Mapping[Reference, Set[Reference]],
+) -> List[List[int]]:
+    """Get the ancestors of each pathway, numbered in the order of the components."""
+    node_to_index = {node: index for index, node in enumerate(itt.chain.from_iterable(components))}
+    component_of = {node: i for i, component in enumerate(components) for node in component}
+
+    # the parents of each component come before it, so their ancestors are already done
+    component_ancestors: List[Set[int]] = []
+    for i, component in enumerate(components):
+        rv: Set[int] = set()
+        if len(component) > 1:
+            rv.update(node_to_index[node] for node in component)
+        for j in {component_of[parent] for node in component for parent in parents.get(node, ())} - {i}:
+            rv.update(node_to_index[node] for node in components[j])
+            rv.update(component_ancestors[j])
+        component_ancestors.append(rv)
+
+    return [
+        sorted(component_ancestors[component_of[node]] - {node_to_index[node]})
+        for node in node_to_index
+    ]
+
+
+def _get_clusters(nodes: List[Reference], equivalences: Iterable[Tuple[Reference, Reference]]) -> List[int]:
+    """Get the number of the representative of each pathway's cluster, using a union-find."""
+    node_to_index = {node: index for index, node in enumerate(nodes)}
+    forest = list(range(len(nodes)))
+    for source, target in equivalences:
+        _union(forest, node_to_index[source], node_to_index[target])
+
+    # the representative of each cluster is its first pathway in sorted order
+    roots = [_find(forest, index) for index in range(len(nodes))]
+    representatives: Dict[int, int] = {}
+    for index in sorted(range(len(nodes)), key=nodes.__getitem__):
+        representatives.setdefault(roots[index], index)
+    return [representatives[root] for root in roots]
+
+
+def _find(forest: List[int], index: int) -> int:
+    root = index
+    while forest[root] != root:
+        root = forest[root]
+    while forest[index] != root:
+        forest[index], index = root, forest[index]
+    return root
+
+
+def _union(forest: List[int], a: int, b: int) -> None:
+    a, b = _find(forest, a), _find(forest, b)
+    if a != b:
+        forest[max(a, b)] = min(a, b)
+
+
+def _get_components(nodes: List[Reference], parents: Mapping[Reference, Set[Reference]]) -> List[List[Reference]]:
+    """Get the strongly connected components of the part-of graph with Tarjan's algorithm.
+
+    Components are returned such that the parents of a component come before it.
+    """
+    index_of: Dict[Reference, int] = {}
+    low: Dict[Reference, int] = {}
+    stack: List[Reference] = []
+    on_stack: Set[Reference] = set()
+    components: List[List[Reference]] = []
+
+    def _visit(node: Reference):
+        index_of[node] = low[node] = len(index_of)
+        stack.append(node)
+        on_stack.add(node)
+        return node, iter(sorted(parents.get(node, ())))
+
+    for root in nodes:
+        if root in index_of:
+            continue
+        work = [_visit(root)]
+        while work:
+            node, it = work[-1]
+            for parent in it:
+                if parent not in index_of:
+                    work.append(_visit(parent))
+                    break
+                if parent in on_stack:
+                    low[node] = min(low[node], index_of[parent])
+            else:
+                work.pop()
+                if work:
+                    low[work[-1][0]] = min(low[work[-1][0]], low[node])
+                if low[node] == index_of[node]:
+                    position = stack.index(node)
+                    components.append(sorted(stack[position:]))
+                    on_stack.difference_update(stack[position:])
+                    del stack[position:]
+
+    return components
+
+
+def _get_hashes() -> Dict[str, str]:
+    return get_hashes(RESOURCE_PATHS)
+
+
+def write_closure(path: Path = CLOSURE_PATH) -> None:
+    """Compute the closure of the resources and write it next to them."""
+    Closure.from_resources().to_json(path, hashes=_get_hashes())
+
+
+def get_closure() -> Closure:
+    """Get a process-wide closure of the mappings.
+
+    It's loaded from ``closure.json`` if that's up-to-date with the resources, and computed otherwise.
+    """
+    return _get_cached('closure', [*RESOURCE_PATHS, CLOSURE_PATH], _load_closure)
+
+
+def _load_closure() -> Closure:
+    closure = Closure.from_json(CLOSURE_PATH, hashes=_get_hashes())
+    if closure is None:
+        closure = Closure.from_resources()
+    return closure
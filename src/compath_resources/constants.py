@@ -5,17 +5,17 @@
 import os
 from pathlib import Path
 
-import pystow
-
-COMPATH_HOME = pystow.join('compath')
-
 HERE = os.path.abspath(os.path.dirname(__file__))
 ROOT = Path(os.path.abspath(os.path.join(HERE, os.pardir, os.pardir)))
 RESOURCES = Path(HERE) / 'resources'
 DOCS_DIRECTORY = ROOT / 'docs'
 IMG_DIRECTORY = DOCS_DIRECTORY / 'img'
 DATA_DIRECTORY = DOCS_DIRECTORY / 'data'
-DATA_DIRECTORY.mkdir(parents=True, exist_ok=True)
+
+#: The relation for equivalent pathways
+EXACT_MATCH = 'skos:exactMatch'
+#: The relation for a pathway that is part of another pathway
+PART_OF = 'BFO:0000050'
 
 _BASE_URL = 'https://raw.githubusercontent.com/ComPath/resources/master/mappings'
 
@@ -32,3 +32,11 @@ PATHBANK_WIKIPATHWAYS_URL = f'{_BASE_URL}/pathbank_wikipathways.csv'
 
 SPECIAL_MAPPINGS_URL = f'{_BASE_URL}/special_mappings.csv'
 REACTOME_HIERARCHICAL_MAPPINGS_URL = f'{_BASE_URL}/reactome_hierarchy.tsv'
+
+
+def __getattr__(name: str):
+    # pystow is slow to import and creates the directory, so only do it for code that uses it
+    if name == 'COMPATH_HOME':
+        import pystow
+        return pystow.join('compath')
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
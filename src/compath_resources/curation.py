@@ -1,19 +1,75 @@
 # -*- coding: utf-8 -*-
 
-"""Curation utilities."""
+"""Curation utilities.
 
+Gene set similarities between all pathways of two databases are calculated at once. Each database's
+pathway gene sets are encoded as a sparse pathway-gene incidence matrix over a gene vocabulary that is
+shared by all databases, so the intersection sizes of every pair of pathways are given by a single sparse
+matrix product. The overlap coefficient threshold is applied to the product before any pathway names are
+looked up, so only passing pairs ever reach Python. The names of those pairs are then scored by a
+pluggable :class:`NameSimilarity` stage.
+
+Each run stores a fingerprint of every pathway's name and gene set next to its outputs. With
+``--incremental``, a rerun only calculates the rows involving pathways whose fingerprints changed and
+merges them into the existing ``{a}_{b}.tsv`` files. What was reused and recalculated for each pair of
+databases is written to ``manifest.json``.
+
+Databases can be loaded and database pairs can be calculated in separate processes with
+``python -m compath_resources.curation --workers N``. The gene sets travel between processes as
+incidence matrices, not as dictionaries of sets, and each process writes its own ``{a}_{b}.tsv``.
+
+Lowering the gene set threshold makes the sparse product denser. With ``--lsh``, the pathways of all
+databases are instead bucketed together by MinHash signatures with locality-sensitive hashing and only
+the colliding pairs are scored exactly, trading some recall for a runtime that doesn't grow with the
+number of pairs. Its recall against the exact method can be measured with :func:`evaluate_candidates`.
+With ``--top-k``, only the best matches of each pathway are kept and written as they're calculated, so
+a low threshold doesn't fill the memory with every passing pair.
+"""
+
+import hashlib
 import itertools as itt
+import json
 import logging
 import os
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
 from difflib import SequenceMatcher
-from typing import Mapping, Tuple
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Set, Tuple, Type, Union
 
 import click
+import numpy as np
 import pandas as pd
-from tqdm import tqdm
+from scipy import sparse
 
-from bio2bel.compath import get_compath_manager_classes
 from compath_resources.constants import COMPATH_HOME
+from compath_resources.utils import atomic_path
+
+__all__ = [
+    'make_similarity_matrices',
+    'GeneSetMatrix',
+    'load_gene_set_matrices',
+    'calculate_similarity_matrices',
+    'calculate_pairwise_similarities',
+    'calculate_similarity_matrix',
+    'iter_top_similarities',
+    'get_gene_set_matrix',
+    'align_gene_set_matrices',
+    'get_fingerprints',
+    'get_gene_vocabulary',
+    'get_incidence_matrix',
+    'get_gene_set_similarities',
+    'MinHashLSH',
+    'get_candidate_similarities',
+    'evaluate_candidates',
+    'NameSimilarity',
+    'SequenceMatcherSimilarity',
+    'NgramSimilarity',
+    'NAME_SIMILARITIES',
+    'get_name_similarity',
+    'calculate_jaccard',
+]
 
 logger = logging.getLogger(__name__)
 
@@ -21,63 +77,1130 @@ logger = logging.getLogger(__name__)
 def make_similarity_matrices(
     minimum_gene_set_similarity: float = 0.8,
     minimum_string_similarity: float = 0.00,
+    workers: Optional[int] = None,
+    name_similarity: Union[None, str, 'NameSimilarity'] = None,
+    incremental: bool = False,
+    lsh: Optional['MinHashLSH'] = None,
+    top_k: Optional[int] = None,
 ) -> Mapping[Tuple[str, str], pd.DataFrame]:
-    """Make similarity matricies.
-
-    :param minimum_gene_set_similarity:
-    :param minimum_string_similarity:
-    """
-    database = {}
-    mappings = {}
-    for name, manager_cls in get_compath_manager_classes().items():
-        logger.info('loading %s', name)
-        manager = manager_cls()
-        if not manager.is_populated():
-            logger.warning('not populated %s', name)
-            continue
-        logger.info('getting pathways from %s', name)
-        database[name] = manager.get_pathway_id_to_symbols()
-        mappings[name] = manager.get_pathway_id_name_mapping()
+    """Make similarity matricies for all pairs of populated ComPath databases.
+
+    :param minimum_gene_set_similarity: The minimum overlap coefficient between the gene sets of two pathways
+    :param minimum_string_similarity: The minimum string similarity between the names of two pathways
+    :param name_similarity: The name similarity stage, or its key in :data:`NAME_SIMILARITIES`.
+        Defaults to the exact :class:`SequenceMatcherSimilarity`.
+    :param workers: If more than one, the number of processes used to load the databases and to
+        calculate the database pairs concurrently
+    :param incremental: Reuse the results of the previous run for pathways whose gene sets and names did not change
+    :param lsh: If given, only the candidate pairs of pathways from MinHash locality-sensitive hashing are scored
+    :param top_k: If given, only the best matches of each pathway are kept, see :func:`iter_top_similarities`
+    :return: A dictionary from pairs of database names to dataframes of similar pathways. Each dataframe
+        is also written to ``{a}_{b}.tsv`` in :data:`compath_resources.constants.COMPATH_HOME`.
+    """
+    gene_set_matrices = load_gene_set_matrices(workers=workers)
+    return calculate_pairwise_similarities(
+        gene_set_matrices,
+        minimum_gene_set_similarity=minimum_gene_set_similarity,
+        minimum_string_similarity=minimum_string_similarity,
+        directory=COMPATH_HOME,
+        workers=workers,
+        name_similarity=name_similarity,
+        incremental=incremental,
+        lsh=lsh,
+        top_k=top_k,
+    )
+
+
+class GeneSetMatrix(NamedTuple):
+    """The pathways of a database as a sparse pathway-gene incidence matrix."""
+
+    #: The pathway identifiers, in row order
+    pathway_ids: List[str]
+    #: The pathway names, in row order
+    pathway_names: List[str]
+    #: The gene symbols, in column order
+    genes: List[str]
+    #: The binary incidence matrix
+    matrix: sparse.csr_matrix
+
+
+def load_gene_set_matrices(workers: Optional[int] = None) -> Dict[str, GeneSetMatrix]:
+    """Load the gene sets of all populated ComPath databases over a shared gene vocabulary.
+
+    :param workers: If more than one, the number of processes used to load the databases concurrently.
+        Each process sends back its gene sets as compact incidence matrices instead of dictionaries of sets.
+    """
+    from bio2bel.compath import get_compath_manager_classes
+
+    names = list(get_compath_manager_classes())
+    if workers is None or workers <= 1:
+        results = map(_load_gene_set_matrix, names)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(names))) as executor:
+            results = list(executor.map(_load_gene_set_matrix, names))
+
+    return align_gene_set_matrices({
+        name: gene_set_matrix
+        for name, gene_set_matrix in zip(names, results)
+        if gene_set_matrix is not None
+    })
+
+
+def _load_gene_set_matrix(name: str) -> Optional[GeneSetMatrix]:
+    from bio2bel.compath import get_compath_manager_classes
+
+    logger.info('loading %s', name)
+    manager = get_compath_manager_classes()[name]()
+    if not manager.is_populated():
+        logger.warning('not populated %s', name)
+        return
+    logger.info('getting pathways from %s', name)
+    return get_gene_set_matrix(manager.get_pathway_id_to_symbols(), manager.get_pathway_id_name_mapping())
+
+
+def calculate_similarity_matrices(
+    database: Mapping[str, Mapping[str, Set[str]]],
+    mappings: Mapping[str, Mapping[str, str]],
+    minimum_gene_set_similarity: float = 0.8,
+    minimum_string_similarity: float = 0.00,
+    directory=None,
+    workers: Optional[int] = None,
+    name_similarity: Union[None, str, 'NameSimilarity'] = None,
+    incremental: bool = False,
+    lsh: Optional['MinHashLSH'] = None,
+    top_k: Optional[int] = None,
+) -> Mapping[Tuple[str, str], pd.DataFrame]:
+    """Calculate similarity matrices for all pairs of databases.
+
+    :param database: A dictionary from database name to a dictionary of pathway identifiers to gene sets
+    :param mappings: A dictionary from database name to a dictionary of pathway identifiers to names
+    :param minimum_gene_set_similarity: The minimum overlap coefficient between the gene sets of two pathways
+    :param minimum_string_similarity: The minimum string similarity between the names of two pathways
+    :param directory: If given, the directory in which each ``{a}_{b}.tsv`` is written
+    :param workers: If more than one, the number of processes used to calculate the database pairs
+    :param name_similarity: The name similarity stage, or its key in :data:`NAME_SIMILARITIES`
+    :param incremental: If true and a directory is given, reuse the results of the previous run
+        for pathways that did not change
+    :param lsh: If given, only the candidate pairs of pathways from MinHash locality-sensitive hashing are scored
+    :param top_k: If given, only the best matches of each pathway are kept, see :func:`iter_top_similarities`
+    :return: A dictionary from pairs of database names to dataframes of similar pathways
+    """
+    gene_to_index = get_gene_vocabulary(database.values())
+    gene_set_matrices = {
+        name: get_gene_set_matrix(pathway_id_to_symbols, mappings[name], gene_to_index)
+        for name, pathway_id_to_symbols in database.items()
+    }
+    return calculate_pairwise_similarities(
+        gene_set_matrices,
+        minimum_gene_set_similarity=minimum_gene_set_similarity,
+        minimum_string_similarity=minimum_string_similarity,
+        directory=directory,
+        workers=workers,
+        name_similarity=name_similarity,
+        incremental=incremental,
+        lsh=lsh,
+        top_k=top_k,
+    )
+
+
+def calculate_pairwise_similarities(
+    gene_set_matrices: Mapping[str, GeneSetMatrix],
+    minimum_gene_set_similarity: float = 0.8,
+    minimum_string_similarity: float = 0.00,
+    directory=None,
+    workers: Optional[int] = None,
+    name_similarity: Union[None, str, 'NameSimilarity'] = None,
+    incremental: bool = False,
+    lsh: Optional['MinHashLSH'] = None,
+    top_k: Optional[int] = None,
+) -> Mapping[Tuple[str, str], pd.DataFrame]:
+    """Calculate similarity matrices for all pairs of databases.
+
+    :param gene_set_matrices: A dictionary from database name to gene set matrices over a shared vocabulary
+    :param minimum_gene_set_similarity: The minimum overlap coefficient between the gene sets of two pathways
+    :param minimum_string_similarity: The minimum string similarity between the names of two pathways
+    :param directory: If given, the directory in which each ``{a}_{b}.tsv`` is written, along with the
+        fingerprints of each database's pathways and a manifest describing the run
+    :param workers: If more than one, the number of processes used to calculate the database pairs. The
+        gene set matrices and name profiles are sent to each process once, when it starts.
+    :param name_similarity: The name similarity stage, or its key in :data:`NAME_SIMILARITIES`. The
+        name profiles of each database are prepared once, before any pair is calculated.
+    :param incremental: If true and a directory is given, only the rows involving pathways whose
+        fingerprints changed since the previous run with the same parameters are calculated and merged
+        into the previous ``{a}_{b}.tsv``. See :func:`get_fingerprints`.
+    :param lsh: If given, the pathways of all databases are bucketed together with MinHash
+        locality-sensitive hashing and only the colliding pairs are scored. See :class:`MinHashLSH`.
+    :param top_k: If given, only the ``top_k`` best matches in the second database are kept for each
+        pathway in the first database. The pathways are compared in chunks with :func:`iter_top_similarities`
+        and each chunk is appended to its ``{a}_{b}.tsv`` as soon as it's calculated, so memory grows with
+        the number of pathways times ``top_k`` instead of with the number of passing pairs. Can't be
+        combined with ``incremental``.
+    :return: A dictionary from pairs of database names to dataframes of similar pathways
+    :raises ValueError: If both ``top_k`` and ``incremental`` are given
+    """
+    if top_k is not None and incremental:
+        raise ValueError('the best matches of unchanged pathways can change, so top_k runs can not be incremental')
+    name_similarity = get_name_similarity(name_similarity)
+    name_profiles = {
+        name: name_similarity.prepare(gene_set_matrix.pathway_names)
+        for name, gene_set_matrix in gene_set_matrices.items()
+    }
+    pairs = list(itt.combinations(gene_set_matrices, r=2))
+    candidates = dict.fromkeys(pairs) if lsh is None else lsh.get_candidates(gene_set_matrices)
+    kwargs = dict(
+        minimum_gene_set_similarity=minimum_gene_set_similarity,
+        minimum_string_similarity=minimum_string_similarity,
+        directory=directory,
+        name_similarity=name_similarity,
+        top_k=top_k,
+    )
+
+    parameters = dict(
+        minimum_gene_set_similarity=minimum_gene_set_similarity,
+        minimum_string_similarity=minimum_string_similarity,
+        name_similarity=type(name_similarity).__name__,
+        name_similarity_parameters=vars(name_similarity),
+        lsh=None if lsh is None else vars(lsh),
+        top_k=top_k,
+    )
+    fingerprints = {
+        name: get_fingerprints(gene_set_matrix)
+        for name, gene_set_matrix in gene_set_matrices.items()
+    }
+    changes: Dict[Tuple[str, str], Optional[_Changes]] = dict.fromkeys(pairs)
+    if incremental and directory is not None:
+        changes.update(_get_changes(directory, fingerprints, gene_set_matrices, parameters, pairs))
+
+    if workers is None or workers <= 1 or len(pairs) <= 1:
+        results = {
+            (a_database_name, b_database_name): _calculate_pair(
+                gene_set_matrices, name_profiles, a_database_name, b_database_name,
+                changes=changes[a_database_name, b_database_name],
+                candidates=candidates[a_database_name, b_database_name], **kwargs,
+            )
+            for a_database_name, b_database_name in pairs
+        }
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(pairs)),
+            initializer=_initialize_worker,
+            initargs=(gene_set_matrices, name_profiles),
+        ) as executor:
+            futures = {
+                (a_database_name, b_database_name): executor.submit(
+                    _calculate_pair_in_worker, a_database_name, b_database_name,
+                    changes=changes[a_database_name, b_database_name],
+                    candidates=candidates[a_database_name, b_database_name], **kwargs,
+                )
+                for a_database_name, b_database_name in pairs
+            }
+            results = {
+                pair: future.result()
+                for pair, future in futures.items()
+            }
+
+    if directory is not None:
+        _write_cache(directory, fingerprints, parameters, changes, results)
+
+    return {
+        pair: df
+        for pair, (df, _) in results.items()
+    }
+
 
+class _Changes(NamedTuple):
+    """The changes to a pair of databases since the previous run."""
+
+    #: The rows of the first database whose fingerprints changed
+    a_rows: np.ndarray
+    #: The rows of the second database whose fingerprints changed
+    b_rows: np.ndarray
+    #: The identifiers of the first database that were changed or removed
+    a_stale: Set[str]
+    #: The identifiers of the second database that were changed or removed
+    b_stale: Set[str]
+
+
+def get_fingerprints(gene_set_matrix: GeneSetMatrix) -> Dict[str, str]:
+    """Get a content hash of the name and gene set of each pathway in a gene set matrix.
+
+    The fingerprints don't depend on the gene vocabulary, so they can be compared between runs.
+    """
+    genes = gene_set_matrix.genes
+    indptr, indices = gene_set_matrix.matrix.indptr, gene_set_matrix.matrix.indices
     rv = {}
-    for (a_database_name, a_sets), (b_database_name, b_sets) in itt.combinations(database.items(), r=2):
-        logger.info('calculating similarities between %s and %s', a_database_name, b_database_name)
-        a_pathway_id_to_name, b_pathway_id_to_name = mappings[a_database_name], mappings[b_database_name]
-
-        rows = []
-        it = itt.product(a_sets.items(), b_sets.items())
-        it = tqdm(it, total=len(a_sets) * len(b_sets))
-        for (a_pathway_id, a_set), (b_pathway_id, b_set) in it:
-            gene_similarity = calculate_jaccard(a_set, b_set)
-            if gene_similarity < minimum_gene_set_similarity:
-                continue
+    for row, (pathway_id, pathway_name) in enumerate(zip(gene_set_matrix.pathway_ids, gene_set_matrix.pathway_names)):
+        symbols = sorted(genes[index] for index in indices[indptr[row]:indptr[row + 1]])
+        content = '\t'.join([pathway_name, *symbols])
+        rv[pathway_id] = hashlib.sha256(content.encode('utf-8')).hexdigest()
+    return rv
 
-            a_pathway_name = a_pathway_id_to_name[a_pathway_id]
-            b_pathway_name = b_pathway_id_to_name[b_pathway_id]
 
-            sequence_matcher = SequenceMatcher(None, a_pathway_name, b_pathway_name)
-            string_similarity = sequence_matcher.ratio()
-            if string_similarity < minimum_string_similarity:
-                continue
+def _get_fingerprints_path(directory, name: str) -> Path:
+    return Path(directory).joinpath('fingerprints', f'{name}.json')
+
+
+def _get_manifest_path(directory) -> Path:
+    return Path(directory).joinpath('manifest.json')
+
+
+def _get_changes(
+    directory,
+    fingerprints: Mapping[str, Mapping[str, str]],
+    gene_set_matrices: Mapping[str, GeneSetMatrix],
+    parameters: Mapping[str, Any],
+    pairs: Iterable[Tuple[str, str]],
+) -> Dict[Tuple[str, str], _Changes]:
+    """Get the changes for the pairs whose previous results can be reused."""
+    manifest_path = _get_manifest_path(directory)
+    if not manifest_path.exists():
+        logger.info('no previous results in %s', directory)
+        return {}
+    manifest = json.loads(manifest_path.read_text())
+    if manifest['parameters'] != json.loads(json.dumps(parameters)):
+        logger.info('parameters changed since the previous run, recalculating all pairs')
+        return {}
+
+    rows, stale = {}, {}
+    for name, gene_set_matrix in gene_set_matrices.items():
+        path = _get_fingerprints_path(directory, name)
+        if not path.exists():
+            continue
+        previous = json.loads(path.read_text())
+        current = fingerprints[name]
+        rows[name] = np.array([
+            row
+            for row, pathway_id in enumerate(gene_set_matrix.pathway_ids)
+            if previous.get(pathway_id) != current[pathway_id]
+        ], dtype=np.int64)
+        stale[name] = {
+            pathway_id
+            for pathway_id, fingerprint in previous.items()
+            if current.get(pathway_id) != fingerprint
+        }
+
+    return {
+        (a_database_name, b_database_name): _Changes(
+            a_rows=rows[a_database_name],
+            b_rows=rows[b_database_name],
+            a_stale=stale[a_database_name],
+            b_stale=stale[b_database_name],
+        )
+        for a_database_name, b_database_name in pairs
+        if all((
+            a_database_name in rows,
+            b_database_name in rows,
+            f'{a_database_name}_{b_database_name}' in manifest['pairs'],
+            Path(directory).joinpath(f'{a_database_name}_{b_database_name}.tsv').exists(),
+        ))
+    }
+
 
-            rows.append((
-                a_pathway_id, a_pathway_name,
-                b_pathway_id, b_pathway_name,
-                round(gene_similarity, 3), round(string_similarity, 3),
-            ))
+def _write_cache(
+    directory,
+    fingerprints: Mapping[str, Mapping[str, str]],
+    parameters: Mapping[str, Any],
+    changes: Mapping[Tuple[str, str], Optional[_Changes]],
+    results: Mapping[Tuple[str, str], Tuple[pd.DataFrame, Mapping[str, Any]]],
+) -> None:
+    """Write the fingerprints and the manifest describing what was reused and recalculated."""
+    for name, pathway_id_to_fingerprint in fingerprints.items():
+        path = _get_fingerprints_path(directory, name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(pathway_id_to_fingerprint, indent=2, sort_keys=True))
 
-        rv[a_database_name, b_database_name] = df = pd.DataFrame(
-            rows,
-            columns=[f'{a_database_name}_id', f'{a_database_name}_name', f'{b_database_name}_id',
-                     f'{b_database_name}_name', 'gene_set_similarity', 'string_similarity'],
-        ).sort_values([f'{a_database_name}_name', 'gene_set_similarity'], ascending=False)
+    changed = {}
+    for (a_database_name, b_database_name), pair_changes in changes.items():
+        if pair_changes is not None:
+            changed[a_database_name] = len(pair_changes.a_rows)
+            changed[b_database_name] = len(pair_changes.b_rows)
 
-        path = os.path.join(COMPATH_HOME, f'{a_database_name}_{b_database_name}.tsv')
+    manifest = dict(
+        parameters=parameters,
+        databases={
+            name: dict(pathways=len(pathway_id_to_fingerprint), changed=changed.get(name))
+            for name, pathway_id_to_fingerprint in fingerprints.items()
+        },
+        pairs={
+            f'{a_database_name}_{b_database_name}': statistics
+            for (a_database_name, b_database_name), (_, statistics) in results.items()
+        },
+    )
+    _get_manifest_path(directory).write_text(json.dumps(manifest, indent=2))
+
+
+#: The gene set matrices and name profiles of the current worker process, set by :func:`_initialize_worker`
+_WORKER_GENE_SET_MATRICES: Mapping[str, GeneSetMatrix] = {}
+_WORKER_NAME_PROFILES: Mapping[str, Any] = {}
+
+
+def _initialize_worker(gene_set_matrices: Mapping[str, GeneSetMatrix], name_profiles: Mapping[str, Any]) -> None:
+    global _WORKER_GENE_SET_MATRICES, _WORKER_NAME_PROFILES
+    _WORKER_GENE_SET_MATRICES = gene_set_matrices
+    _WORKER_NAME_PROFILES = name_profiles
+
+
+def _calculate_pair_in_worker(a_database_name: str, b_database_name: str, **kwargs):
+    return _calculate_pair(
+        _WORKER_GENE_SET_MATRICES, _WORKER_NAME_PROFILES, a_database_name, b_database_name, **kwargs,
+    )
+
+
+def _calculate_pair(
+    gene_set_matrices: Mapping[str, GeneSetMatrix],
+    name_profiles: Mapping[str, Any],
+    a_database_name: str,
+    b_database_name: str,
+    minimum_gene_set_similarity: float,
+    minimum_string_similarity: float,
+    name_similarity: 'NameSimilarity',
+    directory=None,
+    changes: Optional[_Changes] = None,
+    candidates: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    top_k: Optional[int] = None,
+) -> Tuple[pd.DataFrame, Mapping[str, Any]]:
+    logger.info('calculating similarities between %s and %s', a_database_name, b_database_name)
+    a, b = gene_set_matrices[a_database_name], gene_set_matrices[b_database_name]
+    if top_k is not None:
+        chunks = iter_top_similarities(
+            a_database_name, a,
+            b_database_name, b,
+            k=top_k,
+            minimum_gene_set_similarity=minimum_gene_set_similarity,
+            minimum_string_similarity=minimum_string_similarity,
+            name_similarity=name_similarity,
+            a_name_profile=name_profiles[a_database_name],
+            b_name_profile=name_profiles[b_database_name],
+            candidates=candidates,
+        )
+        if directory is None:
+            df = _concat_chunks(list(chunks))
+        else:
+            df = _write_chunks(os.path.join(directory, f'{a_database_name}_{b_database_name}.tsv'), chunks)
+        statistics = dict(mode='top_k', reused=0, recalculated=len(df.index))
+        if candidates is not None:
+            statistics['candidates'] = len(candidates[0])
+        return df, statistics
+
+    df = calculate_similarity_matrix(
+        a_database_name, a,
+        b_database_name, b,
+        minimum_gene_set_similarity=minimum_gene_set_similarity,
+        minimum_string_similarity=minimum_string_similarity,
+        name_similarity=name_similarity,
+        a_name_profile=name_profiles[a_database_name],
+        b_name_profile=name_profiles[b_database_name],
+        changed=None if changes is None else (changes.a_rows, changes.b_rows),
+        candidates=candidates,
+    )
+    if changes is None:
+        statistics = dict(mode='full', reused=0, recalculated=len(df.index))
+    else:
+        path = os.path.join(directory, f'{a_database_name}_{b_database_name}.tsv')
+        previous_df = _read_similarity_matrix(path, a_database_name, b_database_name)
+        a_stale = previous_df[f'{a_database_name}_id'].isin(changes.a_stale)
+        b_stale = previous_df[f'{b_database_name}_id'].isin(changes.b_stale)
+        previous_df = previous_df[~(a_stale | b_stale)]
+        statistics = dict(
+            mode='incremental',
+            reused=len(previous_df.index),
+            recalculated=len(df.index),
+            changed_pathways={a_database_name: len(changes.a_rows), b_database_name: len(changes.b_rows)},
+        )
+        logger.info(
+            'reused %d and recalculated %d rows between %s and %s',
+            statistics['reused'], statistics['recalculated'], a_database_name, b_database_name,
+        )
+        df = _merge_similarity_matrices(a_database_name, a, b_database_name, b, previous_df, df)
+    if candidates is not None:
+        statistics['candidates'] = len(candidates[0])
+
+    if directory is not None:
+        path = os.path.join(directory, f'{a_database_name}_{b_database_name}.tsv')
         df.to_csv(path, sep='\t', index=False)
+    return df, statistics
+
 
+def _write_chunks(path, chunks: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """Append each chunk to a TSV file as soon as it's calculated and get all of them."""
+    dfs = []
+    with atomic_path(path) as temporary_path, open(temporary_path, 'w', newline='') as file:
+        for i, df in enumerate(chunks):
+            df.to_csv(file, sep='\t', index=False, header=i == 0)
+            dfs.append(df)
+    return _concat_chunks(dfs)
+
+
+def _concat_chunks(dfs: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate chunks, leaving out empty ones since they could change the column types."""
+    return pd.concat([df for df in dfs if len(df.index)] or dfs[:1], ignore_index=True)
+
+
+def _read_similarity_matrix(path, a_database_name: str, b_database_name: str) -> pd.DataFrame:
+    return pd.read_csv(
+        path,
+        sep='\t',
+        na_filter=False,
+        dtype={
+            f'{a_database_name}_id': str,
+            f'{a_database_name}_name': str,
+            f'{b_database_name}_id': str,
+            f'{b_database_name}_name': str,
+            'gene_set_similarity': float,
+            'string_similarity': float,
+        },
+    )
+
+
+def _merge_similarity_matrices(
+    a_database_name: str,
+    a: GeneSetMatrix,
+    b_database_name: str,
+    b: GeneSetMatrix,
+    previous_df: pd.DataFrame,
+    df: pd.DataFrame,
+) -> pd.DataFrame:
+    """Merge reused and recalculated rows, ordered as if all were calculated together."""
+    # both are already ordered, and concatenating empty dataframes could change the column types
+    if not len(previous_df.index):
+        return df
+    if not len(df.index):
+        return previous_df
+    a_id_to_row = {pathway_id: row for row, pathway_id in enumerate(a.pathway_ids)}
+    b_id_to_row = {pathway_id: row for row, pathway_id in enumerate(b.pathway_ids)}
+    df = pd.concat([previous_df, df], ignore_index=True)
+    order = np.lexsort((
+        df[f'{b_database_name}_id'].map(b_id_to_row).to_numpy(),
+        df[f'{a_database_name}_id'].map(a_id_to_row).to_numpy(),
+    ))
+    return df.iloc[order].sort_values([f'{a_database_name}_name', 'gene_set_similarity'], ascending=False)
+
+
+def calculate_similarity_matrix(
+    a_database_name: str,
+    a: GeneSetMatrix,
+    b_database_name: str,
+    b: GeneSetMatrix,
+    minimum_gene_set_similarity: float = 0.8,
+    minimum_string_similarity: float = 0.00,
+    name_similarity: Union[None, str, 'NameSimilarity'] = None,
+    a_name_profile=None,
+    b_name_profile=None,
+    changed: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    candidates: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+) -> pd.DataFrame:
+    """Calculate the similarities between the pathways of two databases.
+
+    :param name_similarity: The name similarity stage, or its key in :data:`NAME_SIMILARITIES`
+    :param a_name_profile: The name profile of the first database, if already prepared by the name similarity
+    :param b_name_profile: The name profile of the second database, if already prepared by the name similarity
+    :param changed: If given, the rows of changed pathways in the first and second database. Only
+        pairs involving at least one changed pathway are calculated.
+    :param candidates: If given, the row indices of the candidate pairs in the first and second
+        database, like from :meth:`MinHashLSH.get_candidates`. Only these pairs are calculated.
+    :return: A dataframe with the identifiers, names, gene set similarity, and string similarity of
+        each pair of pathways passing both thresholds, sorted in the same way as the legacy
+        pairwise implementation.
+    """
+    if a.genes is not b.genes and a.genes != b.genes:
+        raise ValueError('gene set matrices should share the same gene vocabulary')
+
+    if candidates is not None:
+        a_indices, b_indices = candidates
+        if changed is not None:
+            idx = np.isin(a_indices, changed[0]) | np.isin(b_indices, changed[1])
+            a_indices, b_indices = a_indices[idx], b_indices[idx]
+        a_indices, b_indices, gene_similarities = get_candidate_similarities(
+            a.matrix, b.matrix, a_indices, b_indices, minimum=minimum_gene_set_similarity,
+        )
+    elif changed is None:
+        a_indices, b_indices, gene_similarities = get_gene_set_similarities(
+            a.matrix, b.matrix, minimum=minimum_gene_set_similarity,
+        )
+    else:
+        a_changed, b_changed = changed
+        a_unchanged = np.setdiff1d(np.arange(a.matrix.shape[0]), a_changed)
+        parts = [
+            get_gene_set_similarities(
+                a.matrix, b.matrix, minimum=minimum_gene_set_similarity, a_rows=a_changed,
+            ),
+            get_gene_set_similarities(
+                a.matrix, b.matrix, minimum=minimum_gene_set_similarity, a_rows=a_unchanged, b_rows=b_changed,
+            ),
+        ]
+        a_indices, b_indices, gene_similarities = (np.concatenate(arrays) for arrays in zip(*parts))
+        order = np.lexsort((b_indices, a_indices))
+        a_indices, b_indices, gene_similarities = a_indices[order], b_indices[order], gene_similarities[order]
+
+    name_similarity = get_name_similarity(name_similarity)
+    if a_name_profile is None:
+        a_name_profile = name_similarity.prepare(a.pathway_names)
+    if b_name_profile is None:
+        b_name_profile = name_similarity.prepare(b.pathway_names)
+    string_similarities = name_similarity.score(
+        a_name_profile, b_name_profile, a_indices, b_indices, minimum=minimum_string_similarity,
+    )
+    idx = string_similarities >= minimum_string_similarity
+
+    return _get_similarity_df(
+        a_database_name, a, b_database_name, b,
+        a_indices[idx], b_indices[idx], gene_similarities[idx], string_similarities[idx],
+    ).sort_values([f'{a_database_name}_name', 'gene_set_similarity'], ascending=False)
+
+
+def iter_top_similarities(
+    a_database_name: str,
+    a: GeneSetMatrix,
+    b_database_name: str,
+    b: GeneSetMatrix,
+    k: int,
+    minimum_gene_set_similarity: float = 0.8,
+    minimum_string_similarity: float = 0.00,
+    name_similarity: Union[None, str, 'NameSimilarity'] = None,
+    a_name_profile=None,
+    b_name_profile=None,
+    candidates: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    chunk_size: int = 512,
+) -> Iterable[pd.DataFrame]:
+    """Calculate the best matches in the second database for each pathway in the first database.
+
+    The pathways of the first database are compared in chunks, and only the ``k`` best pairs of each
+    pathway are kept from each chunk, so the pairs passing both thresholds are never all in memory at once.
+
+    :param k: The number of matches kept for each pathway of the first database
+    :param chunk_size: The number of pathways of the first database compared at once
+    :param candidates: If given, the row indices of the candidate pairs in the first and second
+        database, ordered by the first index, like from :meth:`MinHashLSH.get_candidates`.
+        Only these pairs are calculated.
+    :return: Dataframes with the same columns as :func:`calculate_similarity_matrix`, one per chunk. Rows are
+        ordered by the pathway of the first database, then from the best to the worst match by gene set
+        similarity, then string similarity.
+    """
+    if k < 1:
+        raise ValueError(f'k should be positive: {k}')
+    if a.genes is not b.genes and a.genes != b.genes:
+        raise ValueError('gene set matrices should share the same gene vocabulary')
+
+    name_similarity = get_name_similarity(name_similarity)
+    if a_name_profile is None:
+        a_name_profile = name_similarity.prepare(a.pathway_names)
+    if b_name_profile is None:
+        b_name_profile = name_similarity.prepare(b.pathway_names)
+
+    # there's always at least one chunk, so the header is written even if nothing matches
+    for start in range(0, max(1, a.matrix.shape[0]), chunk_size):
+        stop = min(start + chunk_size, a.matrix.shape[0])
+        if candidates is None:
+            a_indices, b_indices, gene_similarities = get_gene_set_similarities(
+                a.matrix, b.matrix, minimum=minimum_gene_set_similarity, a_rows=np.arange(start, stop),
+            )
+        else:
+            left, right = np.searchsorted(candidates[0], [start, stop])
+            a_indices, b_indices, gene_similarities = get_candidate_similarities(
+                a.matrix, b.matrix, candidates[0][left:right], candidates[1][left:right],
+                minimum=minimum_gene_set_similarity,
+            )
+
+        string_similarities = name_similarity.score(
+            a_name_profile, b_name_profile, a_indices, b_indices, minimum=minimum_string_similarity,
+        )
+        idx = string_similarities >= minimum_string_similarity
+        a_indices, b_indices = a_indices[idx], b_indices[idx]
+        gene_similarities, string_similarities = gene_similarities[idx], string_similarities[idx]
+
+        # rank the matches of each pathway and keep the first k
+        order = np.lexsort((b_indices, -string_similarities, -gene_similarities, a_indices))
+        ranks = np.arange(len(order)) - np.searchsorted(a_indices[order], a_indices[order])
+        idx = order[ranks < k]
+        yield _get_similarity_df(
+            a_database_name, a, b_database_name, b,
+            a_indices[idx], b_indices[idx], gene_similarities[idx], string_similarities[idx],
+        )
+
+
+def _get_similarity_df(
+    a_database_name: str,
+    a: GeneSetMatrix,
+    b_database_name: str,
+    b: GeneSetMatrix,
+    a_indices: np.ndarray,
+    b_indices: np.ndarray,
+    gene_similarities: np.ndarray,
+    string_similarities: np.ndarray,
+) -> pd.DataFrame:
+    rows = [
+        (
+            a.pathway_ids[a_index], a.pathway_names[a_index],
+            b.pathway_ids[b_index], b.pathway_names[b_index],
+            round(gene_similarity, 3), round(string_similarity, 3),
+        )
+        for a_index, b_index, gene_similarity, string_similarity in zip(
+            a_indices.tolist(), b_indices.tolist(), gene_similarities.tolist(), string_similarities.tolist(),
+        )
+    ]
+    return pd.DataFrame(
+        rows,
+        columns=[f'{a_database_name}_id', f'{a_database_name}_name', f'{b_database_name}_id',
+                 f'{b_database_name}_name', 'gene_set_similarity', 'string_similarity'],
+    )
+
+
+def get_gene_set_matrix(
+    pathway_id_to_symbols: Mapping[str, Set[str]],
+    pathway_id_to_name: Mapping[str, str],
+    gene_to_index: Optional[Mapping[str, int]] = None,
+) -> GeneSetMatrix:
+    """Encode the gene sets and names of a database's pathways.
+
+    :param pathway_id_to_symbols: A dictionary from pathway identifiers to gene sets
+    :param pathway_id_to_name: A dictionary from pathway identifiers to names
+    :param gene_to_index: A gene vocabulary. If none is given, one is made from the given gene sets
+        and :func:`align_gene_set_matrices` can be used to bring several databases together later.
+    """
+    if gene_to_index is None:
+        gene_to_index = get_gene_vocabulary([pathway_id_to_symbols])
+    pathway_ids, matrix = get_incidence_matrix(pathway_id_to_symbols, gene_to_index)
+    return GeneSetMatrix(
+        pathway_ids=pathway_ids,
+        pathway_names=[pathway_id_to_name[pathway_id] for pathway_id in pathway_ids],
+        genes=list(gene_to_index),
+        matrix=matrix,
+    )
+
+
+def align_gene_set_matrices(gene_set_matrices: Mapping[str, GeneSetMatrix]) -> Dict[str, GeneSetMatrix]:
+    """Re-encode gene set matrices made with different vocabularies over the union of their vocabularies."""
+    genes = sorted(set(itt.chain.from_iterable(
+        gene_set_matrix.genes
+        for gene_set_matrix in gene_set_matrices.values()
+    )))
+    genes_array = np.array(genes, dtype=object)
+
+    rv = {}
+    for name, gene_set_matrix in gene_set_matrices.items():
+        columns = np.searchsorted(genes_array, np.array(gene_set_matrix.genes, dtype=object))
+        matrix = sparse.csr_matrix(
+            (gene_set_matrix.matrix.data, columns[gene_set_matrix.matrix.indices], gene_set_matrix.matrix.indptr),
+            shape=(gene_set_matrix.matrix.shape[0], len(genes)),
+        )
+        matrix.sort_indices()
+        rv[name] = gene_set_matrix._replace(genes=genes, matrix=matrix)
     return rv
 
 
+def get_gene_vocabulary(databases: Iterable[Mapping[str, Set[str]]]) -> Dict[str, int]:
+    """Assign a column index to every gene appearing in any of the given databases."""
+    genes = {
+        gene
+        for pathway_id_to_symbols in databases
+        for symbols in pathway_id_to_symbols.values()
+        for gene in symbols
+    }
+    return {gene: index for index, gene in enumerate(sorted(genes))}
+
+
+def get_incidence_matrix(
+    pathway_id_to_symbols: Mapping[str, Set[str]],
+    gene_to_index: Mapping[str, int],
+) -> Tuple[List[str], sparse.csr_matrix]:
+    """Encode the gene sets of a database as a sparse pathway-gene incidence matrix.
+
+    :param pathway_id_to_symbols: A dictionary from pathway identifiers to gene sets
+    :param gene_to_index: A gene vocabulary, like from :func:`get_gene_vocabulary`
+    :return: The pathway identifiers in row order and the binary incidence matrix. Pathways
+        with empty gene sets are skipped since they can not overlap with anything.
+    """
+    pathway_ids = []
+    indptr = [0]
+    indices = []
+    for pathway_id, symbols in pathway_id_to_symbols.items():
+        if not symbols:
+            logger.debug('skipping %s since it has no genes', pathway_id)
+            continue
+        pathway_ids.append(pathway_id)
+        indices.extend(gene_to_index[gene] for gene in symbols)
+        indptr.append(len(indices))
+
+    indices = np.array(indices, dtype=np.int32)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.int32), indices, np.array(indptr, dtype=np.int64)),
+        shape=(len(pathway_ids), len(gene_to_index)),
+    )
+    matrix.sort_indices()
+    return pathway_ids, matrix
+
+
+def get_gene_set_similarities(
+    a_matrix: sparse.csr_matrix,
+    b_matrix: sparse.csr_matrix,
+    minimum: float = 0.8,
+    a_rows: Optional[np.ndarray] = None,
+    b_rows: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Calculate the overlap coefficients between all rows of two incidence matrices.
+
+    :param a_matrix: A pathway-gene incidence matrix
+    :param b_matrix: A pathway-gene incidence matrix over the same gene vocabulary
+    :param minimum: The minimum overlap coefficient for a pair to be returned
+    :param a_rows: If given, only these sorted rows of the first matrix are compared
+    :param b_rows: If given, only these sorted rows of the second matrix are compared
+    :return: The row indices in the first matrix, row indices in the second matrix, and overlap
+        coefficients of all pairs reaching the minimum, ordered by the first then second index.
+    """
+    if a_rows is not None or b_rows is not None:
+        a_rows = np.arange(a_matrix.shape[0]) if a_rows is None else np.asarray(a_rows, dtype=np.int64)
+        b_rows = np.arange(b_matrix.shape[0]) if b_rows is None else np.asarray(b_rows, dtype=np.int64)
+        a_indices, b_indices, similarities = get_gene_set_similarities(
+            a_matrix[a_rows], b_matrix[b_rows], minimum=minimum,
+        )
+        return a_rows[a_indices], b_rows[b_indices], similarities
+
+    a_sizes = a_matrix.getnnz(axis=1)
+    b_sizes = b_matrix.getnnz(axis=1)
+
+    intersections = (a_matrix @ b_matrix.T).tocsr()
+    if minimum <= 0:
+        # pairs without any overlap pass the threshold too, so every entry has to be explicit
+        intersections = _densify(intersections)
+    intersections.sort_indices()
+
+    a_indices = np.repeat(np.arange(a_matrix.shape[0]), np.diff(intersections.indptr))
+    b_indices = intersections.indices
+    similarities = intersections.data / np.minimum(a_sizes[a_indices], b_sizes[b_indices])
+
+    idx = similarities >= minimum
+    return a_indices[idx], b_indices[idx], similarities[idx]
+
+
+def _densify(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    """Make a CSR matrix that explicitly stores every entry, including zeros."""
+    n_rows, n_columns = matrix.shape
+    return sparse.csr_matrix(
+        (
+            matrix.toarray().ravel(),
+            np.tile(np.arange(n_columns), n_rows),
+            np.arange(0, n_rows * n_columns + 1, n_columns),
+        ),
+        shape=matrix.shape,
+    )
+
+
+class MinHashLSH:
+    """Candidate pairs of pathways from MinHash signatures bucketed with locality-sensitive hashing.
+
+    Each pathway gets a signature of ``bands * rows`` MinHash values over the shared gene vocabulary, so
+    the signatures of all databases can be bucketed together. Two pathways become a candidate pair if
+    all ``rows`` values of at least one of the ``bands`` are equal, which happens with probability
+    ``1 - (1 - J ** rows) ** bands`` for pathways with a Jaccard index of ``J``. More bands raise the
+    recall, more rows per band raise the precision.
+
+    MinHash estimates the Jaccard index and not the overlap coefficient that's thresholded, which is
+    always at least as large. Pathways that are mostly contained in a much larger one have a low Jaccard
+    index, so they are the first to be missed. Use :func:`evaluate_candidates` to measure the recall
+    against the exact method on a sample before choosing the knobs.
+    """
+
+    def __init__(self, bands: int = 32, rows: int = 3, seed: int = 0):
+        """Initialize the candidate generation.
+
+        :param bands: The number of bands of each signature
+        :param rows: The number of MinHash values in each band
+        :param seed: The seed for drawing the hash functions
+        """
+        self.bands = bands
+        self.rows = rows
+        self.seed = seed
+
+    def get_signatures(self, matrix: sparse.csr_matrix, chunk_size: int = 2 ** 14) -> np.ndarray:
+        """Get the MinHash signature of each row of a pathway-gene incidence matrix.
+
+        :param matrix: A pathway-gene incidence matrix with sorted indices and no empty rows
+        :param chunk_size: The number of genes hashed at once, which bounds the memory used
+        :return: An array with a row of ``bands * rows`` MinHash values for each pathway
+        """
+        # multiply-shift hash functions of the gene column indices, which are shared by all databases
+        rng = np.random.default_rng(self.seed)
+        n_hashes = self.bands * self.rows
+        a = rng.integers(0, 2 ** 63, size=n_hashes, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        b = rng.integers(0, 2 ** 63, size=n_hashes, dtype=np.uint64)
+
+        signatures = np.empty((matrix.shape[0], n_hashes), dtype=np.uint32)
+        indptr, indices = matrix.indptr, matrix.indices.astype(np.uint64)
+        start = 0
+        while start < matrix.shape[0]:
+            # take whole rows until the chunk is full, but at least one
+            stop = max(start + 1, int(np.searchsorted(indptr, indptr[start] + chunk_size, side='right')) - 1)
+            stop = min(stop, matrix.shape[0])
+            hashes = ((indices[indptr[start]:indptr[stop], None] * a + b) >> np.uint64(32)).astype(np.uint32)
+            signatures[start:stop] = np.minimum.reduceat(hashes, indptr[start:stop] - indptr[start], axis=0)
+            start = stop
+        return signatures
+
+    def get_candidates(
+        self,
+        gene_set_matrices: Mapping[str, GeneSetMatrix],
+    ) -> Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]]:
+        """Bucket the pathways of all databases together and get the colliding pairs of each database pair.
+
+        :param gene_set_matrices: A dictionary from database name to gene set matrices over a shared vocabulary
+        :return: A dictionary from each pair of database names, in the order of
+            :func:`itertools.combinations`, to the row indices of the candidate pairs in the first and
+            second database, ordered by the first then second index
+        """
+        names = list(gene_set_matrices)
+        signatures = np.concatenate([
+            self.get_signatures(gene_set_matrix.matrix)
+            for gene_set_matrix in gene_set_matrices.values()
+        ])
+        sizes = np.array([gene_set_matrix.matrix.shape[0] for gene_set_matrix in gene_set_matrices.values()])
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        databases = np.repeat(np.arange(len(names)), sizes)
+        n = len(signatures)
+
+        # multipliers for folding the values of a band into one bucket key. Collisions between different
+        # bands only add candidates, which are scored exactly anyway.
+        multipliers = np.random.default_rng(self.seed + 1).integers(1, 2 ** 63, size=self.rows, dtype=np.uint64)
+        keys = []
+        for band in range(self.bands):
+            buckets = (signatures[:, band * self.rows:(band + 1) * self.rows] * multipliers).sum(axis=1)
+            keys.append(_get_colliding_pairs(buckets, databases, n))
+        keys = np.unique(np.concatenate(keys)) if keys else np.zeros(0, dtype=np.int64)
+        a_rows, b_rows = keys // n, keys % n
+
+        rv = {}
+        for (a_database, a_database_name), (b_database, b_database_name) in itt.combinations(enumerate(names), r=2):
+            idx = (databases[a_rows] == a_database) & (databases[b_rows] == b_database)
+            rv[a_database_name, b_database_name] = (
+                a_rows[idx] - offsets[a_database],
+                b_rows[idx] - offsets[b_database],
+            )
+        return rv
+
+
+def _get_colliding_pairs(buckets: np.ndarray, databases: np.ndarray, n: int) -> np.ndarray:
+    """Get the pairs of rows from different databases sharing a bucket, encoded as ``a_row * n + b_row``."""
+    order = np.argsort(buckets, kind='stable')
+    sorted_buckets = buckets[order]
+    starts = np.flatnonzero(np.concatenate([[True], sorted_buckets[1:] != sorted_buckets[:-1]]))
+    counts = np.diff(np.append(starts, len(order)))
+    keys = []
+    # buckets of the same size are expanded into pairs together, and most buckets have two or three members
+    for count in np.unique(counts[counts > 1]).tolist():
+        bucket_starts = starts[counts == count]
+        members = order[bucket_starts[:, None] + np.arange(count)]  # rows are sorted, since the sort is stable
+        i, j = np.triu_indices(count, k=1)
+        a_rows, b_rows = members[:, i].ravel(), members[:, j].ravel()
+        idx = databases[a_rows] != databases[b_rows]
+        keys.append(a_rows[idx].astype(np.int64) * n + b_rows[idx])
+    if not keys:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(keys)
+
+
+def get_candidate_similarities(
+    a_matrix: sparse.csr_matrix,
+    b_matrix: sparse.csr_matrix,
+    a_indices: np.ndarray,
+    b_indices: np.ndarray,
+    minimum: float = 0.8,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Calculate the overlap coefficients of the given pairs of rows of two incidence matrices.
+
+    :param a_matrix: A pathway-gene incidence matrix
+    :param b_matrix: A pathway-gene incidence matrix over the same gene vocabulary
+    :param a_indices: The row indices of the pairs in the first matrix
+    :param b_indices: The row indices of the pairs in the second matrix
+    :param minimum: The minimum overlap coefficient for a pair to be returned
+    :return: The row indices in the first matrix, row indices in the second matrix, and overlap
+        coefficients of the given pairs reaching the minimum, in the given order
+    """
+    a_indices = np.asarray(a_indices, dtype=np.int64)
+    b_indices = np.asarray(b_indices, dtype=np.int64)
+    if not len(a_indices):
+        return a_indices, b_indices, np.zeros(0)
+    a_rows, b_rows = a_matrix[a_indices], b_matrix[b_indices]
+    intersections = np.asarray(a_rows.multiply(b_rows).sum(axis=1)).ravel()
+    similarities = intersections / np.minimum(a_rows.getnnz(axis=1), b_rows.getnnz(axis=1))
+    idx = similarities >= minimum
+    return a_indices[idx], b_indices[idx], similarities[idx]
+
+
+def evaluate_candidates(
+    gene_set_matrices: Mapping[str, GeneSetMatrix],
+    lsh: Optional[MinHashLSH] = None,
+    minimum_gene_set_similarity: float = 0.8,
+) -> Dict[str, Any]:
+    """Measure the recall of the candidate pairs against the exact method.
+
+    :param gene_set_matrices: A dictionary from database name to gene set matrices over a shared vocabulary
+    :param lsh: The candidate generation. Defaults to a :class:`MinHashLSH` with the default knobs.
+    :param minimum_gene_set_similarity: The minimum overlap coefficient between the gene sets of two pathways
+    :return: The number of pairs passing the threshold with the exact method, how many of them were
+        found from the candidates, the recall, the number of candidates, and the fraction of all pairs
+        of pathways that were candidates
+    """
+    if lsh is None:
+        lsh = MinHashLSH()
+    candidates = lsh.get_candidates(gene_set_matrices)
+    expected = found = n_candidates = n_pairs = 0
+    for (a_database_name, b_database_name), (a_indices, b_indices) in candidates.items():
+        a, b = gene_set_matrices[a_database_name].matrix, gene_set_matrices[b_database_name].matrix
+        exact_a, exact_b, _ = get_gene_set_similarities(a, b, minimum=minimum_gene_set_similarity)
+        approximate_a, _, _ = get_candidate_similarities(
+            a, b, a_indices, b_indices, minimum=minimum_gene_set_similarity,
+        )
+        expected += len(exact_a)
+        found += len(approximate_a)
+        n_candidates += len(a_indices)
+        n_pairs += a.shape[0] * b.shape[0]
+    return dict(
+        expected=expected,
+        found=found,
+        recall=found / expected if expected else 1.0,
+        candidates=n_candidates,
+        candidate_fraction=n_candidates / n_pairs if n_pairs else 0.0,
+    )
+
+
+class NameSimilarity(ABC):
+    """A stage that scores the similarity between the names of pathways.
+
+    Names are turned into profiles once per database with :meth:`prepare`, then the candidate pairs
+    passing the gene set threshold are scored in one batch with :meth:`score`.
+    """
+
+    def prepare(self, names: Sequence[str]) -> Any:
+        """Precompute the profile of the given pathway names, in row order."""
+        return list(names)
+
+    @abstractmethod
+    def score(
+        self,
+        a_profile,
+        b_profile,
+        a_indices: np.ndarray,
+        b_indices: np.ndarray,
+        minimum: float = 0.0,
+    ) -> np.ndarray:
+        """Score pairs of pathway names.
+
+        :param a_profile: The profile of the first database's names
+        :param b_profile: The profile of the second database's names
+        :param a_indices: The row indices of the pairs in the first database
+        :param b_indices: The row indices of the pairs in the second database
+        :param minimum: The minimum score of interest. Pairs that can be cheaply shown to score lower
+            may be left unscored and get NaN.
+        :return: An array with the score of each pair
+        """
+
+
+class SequenceMatcherSimilarity(NameSimilarity):
+    """Exact :meth:`difflib.SequenceMatcher.ratio` name similarities.
+
+    Pairs are first bounded from above with the name lengths (like
+    :meth:`difflib.SequenceMatcher.real_quick_ratio`) for all candidates at once, then with
+    :meth:`difflib.SequenceMatcher.quick_ratio`, and only the remaining pairs are fully aligned. Since
+    both are upper bounds of the ratio, the scores of all pairs reaching the minimum are identical to
+    building a new :class:`difflib.SequenceMatcher` for each pair. One matcher is kept per name in
+    the second database so its character index is only built once.
+    """
+
+    def prepare(self, names: Sequence[str]) -> Tuple[List[str], np.ndarray]:  # noqa:D102
+        names = list(names)
+        return names, np.array([len(name) for name in names], dtype=np.int64)
+
+    def score(self, a_profile, b_profile, a_indices, b_indices, minimum=0.0):  # noqa:D102
+        a_names, a_lengths = a_profile
+        b_names, b_lengths = b_profile
+        rv = np.full(len(a_indices), np.nan)
+
+        candidates = np.arange(len(a_indices))
+        if minimum > 0:
+            shortest = np.minimum(a_lengths[a_indices], b_lengths[b_indices])
+            total = a_lengths[a_indices] + b_lengths[b_indices]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                upper_bounds = np.where(total > 0, 2.0 * shortest / total, 1.0)
+            candidates = candidates[upper_bounds >= minimum]
+
+        matchers: Dict[int, SequenceMatcher] = {}
+        for i, a_index, b_index in zip(candidates.tolist(), a_indices[candidates].tolist(),
+                                       b_indices[candidates].tolist()):
+            matcher = matchers.get(b_index)
+            if matcher is None:
+                matcher = matchers[b_index] = SequenceMatcher(None, b=b_names[b_index])
+            matcher.set_seq1(a_names[a_index])
+            if minimum > 0 and matcher.quick_ratio() < minimum:
+                continue
+            rv[i] = matcher.ratio()
+
+        return rv
+
+
+class NgramSimilarity(NameSimilarity):
+    """Approximate name similarities from the Sørensen-Dice coefficient of character n-gram sets.
+
+    Names are lower-cased and their whitespace is normalized before being split into n-grams, which
+    are hashed into a fixed number of columns of a sparse binary matrix so databases don't need
+    to share a vocabulary. A batch of pairs is scored with a single element-wise sparse product.
+    """
+
+    def __init__(self, n: int = 3, n_features: int = 2 ** 20):
+        """Initialize the n-gram similarity.
+
+        :param n: The length of the character n-grams
+        :param n_features: The number of hash buckets for n-grams
+        """
+        self.n = n
+        self.n_features = n_features
+
+    def _iter_ngrams(self, name: str) -> Iterable[str]:
+        name = ' '.join(name.lower().split())
+        padded = f' {name} '
+        if len(padded) <= self.n:
+            yield padded
+            return
+        for i in range(len(padded) - self.n + 1):
+            yield padded[i:i + self.n]
+
+    def prepare(self, names: Sequence[str]) -> sparse.csr_matrix:  # noqa:D102
+        indptr = [0]
+        indices = []
+        for name in names:
+            indices.extend(sorted({
+                zlib.crc32(ngram.encode('utf-8')) % self.n_features
+                for ngram in self._iter_ngrams(name)
+            }))
+            indptr.append(len(indices))
+        return sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.int32), np.array(indices, dtype=np.int64), indptr),
+            shape=(len(names), self.n_features),
+        )
+
+    def score(self, a_profile, b_profile, a_indices, b_indices, minimum=0.0):  # noqa:D102
+        if not len(a_indices):
+            return np.zeros(0)
+        a_rows, b_rows = a_profile[a_indices], b_profile[b_indices]
+        intersections = np.asarray(a_rows.multiply(b_rows).sum(axis=1)).ravel()
+        totals = a_rows.getnnz(axis=1) + b_rows.getnnz(axis=1)
+        return 2.0 * intersections / totals
+
+
+#: Name similarity stages that can be chosen by key
+NAME_SIMILARITIES: Mapping[str, Type[NameSimilarity]] = {
+    'exact': SequenceMatcherSimilarity,
+    'ngram': NgramSimilarity,
+}
+
+
+def get_name_similarity(name_similarity: Union[None, str, NameSimilarity] = None) -> NameSimilarity:
+    """Get a name similarity stage, defaulting to the exact one."""
+    if name_similarity is None:
+        return SequenceMatcherSimilarity()
+    if isinstance(name_similarity, str):
+        return NAME_SIMILARITIES[name_similarity]()
+    return name_similarity
+
+
 def calculate_jaccard(set_1, set_2) -> float:
     """Calculate the jaccard similarity between two sets.
 
@@ -91,8 +1214,27 @@ def calculate_jaccard(set_1, set_2) -> float:
 
 
 @click.command()
-def _main():
-    make_similarity_matrices()
+@click.option('--workers', type=int, default=1, show_default=True, help='Number of worker processes')
+@click.option(
+    '--name-similarity', type=click.Choice(list(NAME_SIMILARITIES)), default='exact', show_default=True,
+    help='How pathway names are compared',
+)
+@click.option('--incremental', is_flag=True, help='Only recalculate pathways that changed since the previous run')
+@click.option('--lsh', is_flag=True, help='Only score candidate pairs from MinHash locality-sensitive hashing')
+@click.option('--bands', type=int, default=32, show_default=True, help='LSH bands. More bands raise the recall')
+@click.option('--rows', type=int, default=3, show_default=True, help='LSH rows per band. More rows raise the precision')
+@click.option('--minimum-gene-set-similarity', type=float, default=0.8, show_default=True)
+@click.option('--top-k', type=int, help='Only keep the best matches of each pathway')
+def _main(workers: int, name_similarity: str, incremental: bool, lsh: bool, bands: int, rows: int,
+          minimum_gene_set_similarity: float, top_k: Optional[int]):
+    make_similarity_matrices(
+        minimum_gene_set_similarity=minimum_gene_set_similarity,
+        workers=workers,
+        name_similarity=name_similarity,
+        incremental=incremental,
+        lsh=MinHashLSH(bands=bands, rows=rows) if lsh else None,
+        top_k=top_k,
+    )
 
 
 if __name__ == '__main__':
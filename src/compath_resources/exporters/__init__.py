@@ -1,6 +1,42 @@
 # -*- coding: utf-8 -*-
 
-"""Exporters for ComPath resources."""
+"""Exporters for ComPath resources.
 
-from .bel import get_bel  # noqa:F401
-from .rdf import get_rdf  # noqa:F401
+Each exporter's module, and with it PyBEL or RDFLib, is imported the first time the exporter is used.
+"""
+
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .bel import get_bel, write_bel_script, write_nodelink  # noqa: F401
+    from .rdf import get_rdf, write_rdf  # noqa: F401
+
+__all__ = [
+    'get_bel',
+    'write_bel_script',
+    'write_nodelink',
+    'get_rdf',
+    'write_rdf',
+]
+
+#: The module each exporter is imported from on first use
+_LAZY_ATTRIBUTES = {
+    'get_bel': '.bel',
+    'write_bel_script': '.bel',
+    'write_nodelink': '.bel',
+    'get_rdf': '.rdf',
+    'write_rdf': '.rdf',
+}
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    rv = globals()[name] = getattr(importlib.import_module(module_name, __name__), name)
+    return rv
+
+
+def __dir__():
+    return sorted({*globals(), *__all__})
@@ -1,41 +1,182 @@
 # -*- coding: utf-8 -*-
 
-"""Export ComPath resources as BEL."""
+"""Export ComPath resources as BEL.
+
+Each unique pathway is converted to a :class:`pybel.dsl.BiologicalProcess` once, no matter how many
+mappings it appears in, and the edges are added to the graph in one batch. The BEL script and node-link
+JSON writers stream the mappings to a file without building a :class:`pybel.BELGraph` at all.
+"""
+
+import json
+from typing import Iterable, List, Optional, TextIO, Tuple
+
+import pandas as pd
+from networkx.utils import open_file
 
 import pybel
+import pybel.constants as pc
 from pybel.dsl import BiologicalProcess
+from pybel.utils import hash_edge
+from ..constants import EXACT_MATCH, PART_OF
 from ..resources import get_df
 
 __all__ = [
     'get_bel',
+    'write_bel_script',
+    'write_nodelink',
+    'BEL_RELATIONS',
 ]
 
+#: The BEL relation for each relation in the resources. Both the current vocabulary and the one used
+#: by older versions of the resources are supported.
+BEL_RELATIONS = {
+    PART_OF: pc.PART_OF,
+    'isPartOf': pc.PART_OF,
+    EXACT_MATCH: pc.EQUIVALENT_TO,
+    'equivalentTo': pc.EQUIVALENT_TO,
+}
+
+#: BEL relations that are added in both directions
+SYMMETRIC_RELATIONS = {pc.EQUIVALENT_TO}
+
+#: An edge as the positions of its source and target nodes and its BEL relation
+Edge = Tuple[int, int, str]
+
+
+class _BiologicalProcess(BiologicalProcess):
+    """A biological process that remembers its BEL.
+
+    PyBEL hashes and compares nodes by their BEL, so this avoids rebuilding it every time the node
+    is looked up in the graph.
+    """
+
+    def __init__(self, *args, **kwargs):  # noqa: D107
+        super().__init__(*args, **kwargs)
+        self._bel = {}
 
-def get_bel() -> pybel.BELGraph:
-    """Get the ComPath mappings as BEL."""
-    graph = pybel.BELGraph(
+    def as_bel(self, use_identifiers: bool = True) -> str:  # noqa: D102
+        rv = self._bel.get(use_identifiers)
+        if rv is None:
+            rv = self._bel[use_identifiers] = super().as_bel(use_identifiers=use_identifiers)
+        return rv
+
+    def __reduce__(self):
+        # pickle as a plain biological process, so pickled graphs don't depend on this module
+        return BiologicalProcess, (self.namespace, self.name, self.identifier)
+
+
+def _get_empty_graph() -> pybel.BELGraph:
+    return pybel.BELGraph(
         name='ComPath Mappings',
         version='1.1.0',
         description='Hierarchical and equivalence relations between entries in KEGG, Reactome, PathBank,'
                     ' and WikiPathways.'
     )
-    df = get_df()
+
+
+def _get_nodes_and_edges(df: pd.DataFrame) -> Tuple[List[BiologicalProcess], List[Edge]]:
+    """Get the unique nodes and edges of the mappings, in the order adding them one by one would."""
+    node_to_index = {}
+    edges = {}
     for source_ns, source_id, source_name, relation, target_ns, target_id, target_name in df.values:
-        source = BiologicalProcess(
-            namespace=source_ns,
-            identifier=source_id,
-            name=source_name,
-        )
-        target = BiologicalProcess(
-            namespace=target_ns,
-            identifier=target_id,
-            name=target_name,
-        )
-        if relation == 'isPartOf':
-            graph.add_part_of(source, target)
-        elif relation == 'equivalentTo':
-            graph.add_equivalence(source, target)
-        else:
+        bel_relation = BEL_RELATIONS.get(relation)
+        if bel_relation is None:
             raise ValueError(f'invalid mapping with relation: {relation}')
+        source, target = (source_ns, source_id, source_name), (target_ns, target_id, target_name)
+        if bel_relation in SYMMETRIC_RELATIONS:
+            target = node_to_index.setdefault(target, len(node_to_index))
+            source = node_to_index.setdefault(source, len(node_to_index))
+            edges[target, source, bel_relation] = None
+        else:
+            source = node_to_index.setdefault(source, len(node_to_index))
+            target = node_to_index.setdefault(target, len(node_to_index))
+        edges[source, target, bel_relation] = None
+
+    nodes = [
+        _BiologicalProcess(namespace=namespace, identifier=identifier, name=name)
+        for namespace, identifier, name in node_to_index
+    ]
+    return nodes, list(edges)
+
 
+def get_bel(df: Optional[pd.DataFrame] = None) -> pybel.BELGraph:
+    """Get the ComPath mappings as BEL.
+
+    :param df: The mappings, in the format of :func:`compath_resources.get_df`. Defaults to all of them.
+    """
+    graph = _get_empty_graph()
+    nodes, edges = _get_nodes_and_edges(get_df() if df is None else df)
+    graph.add_nodes_from(nodes)
+    graph.add_edges_from(
+        (nodes[source], nodes[target], hash_edge(nodes[source], nodes[target], attr), attr)
+        for source, target, attr in (
+            (source, target, {pc.RELATION: relation})
+            for source, target, relation in edges
+        )
+    )
     return graph
+
+
+def _iter_bel_script_lines(df: pd.DataFrame) -> Iterable[str]:
+    yield from pybel.to_bel_script_lines(_get_empty_graph())
+
+    nodes, edges = _get_nodes_and_edges(df)
+    if not edges:
+        return
+    node_strings = [node.as_bel() for node in nodes]
+    yield '###############################################\n'
+    yield pc.SET_CITATION_FMT.format(pc.CITATION_TYPE_PUBMED, pc.PYBEL_PUBMED)
+    yield f'SET SupportingText = "{pc.PYBEL_AUTOEVIDENCE}"'
+    for source, target, relation in edges:
+        yield f'{node_strings[source]} {relation} {node_strings[target]}'
+    yield 'UNSET SupportingText'
+    yield 'UNSET Citation'
+
+
+@open_file(0, mode='w')
+def write_bel_script(path, df: Optional[pd.DataFrame] = None) -> None:
+    """Write the ComPath mappings as a BEL script, like :func:`pybel.to_bel_script`, without building a graph.
+
+    :param path: A path or file-like
+    :param df: The mappings, in the format of :func:`compath_resources.get_df`. Defaults to all of them.
+    """
+    for line in _iter_bel_script_lines(get_df() if df is None else df):
+        print(line, file=path)
+
+
+@open_file(0, mode='w')
+def write_nodelink(path, df: Optional[pd.DataFrame] = None, **kwargs) -> None:
+    """Write the ComPath mappings as node-link JSON, like :func:`pybel.to_nodelink_file`, without building a graph.
+
+    :param path: A path or file-like
+    :param df: The mappings, in the format of :func:`compath_resources.get_df`. Defaults to all of them.
+    :param kwargs: Keyword arguments passed to :func:`json.dumps` for each part of the document
+    """
+    file: TextIO = path
+    nodes, edges = _get_nodes_and_edges(get_df() if df is None else df)
+
+    # node-link JSON lists nodes sorted by their BEL and links refer to nodes by position in that list
+    node_strings = [node.as_bel() for node in nodes]
+    order = sorted(range(len(nodes)), key=node_strings.__getitem__)
+    positions = [0] * len(nodes)
+    for position, index in enumerate(order):
+        positions[index] = position
+
+    header = pybel.to_nodelink(_get_empty_graph())
+    file.write('{"directed": true, "multigraph": true, "graph": ')
+    file.write(json.dumps(header['graph'], ensure_ascii=False, **kwargs))
+    file.write(', "nodes": [')
+    for i, index in enumerate(order):
+        if i:
+            file.write(', ')
+        node = nodes[index]
+        file.write(json.dumps(dict(node, id=node.md5, bel=node_strings[index]), ensure_ascii=False, **kwargs))
+    file.write('], "links": [')
+    for i, (source, target, relation) in enumerate(edges):
+        if i:
+            file.write(', ')
+        attr = {pc.RELATION: relation}
+        link = dict(attr, source=positions[source], target=positions[target])
+        link['key'] = hash_edge(nodes[source], nodes[target], attr)
+        file.write(json.dumps(link, ensure_ascii=False, **kwargs))
+    file.write(']}')
@@ -1,59 +1,204 @@
 # -*- coding: utf-8 -*-
 
-"""Export ComPath resources as RDF."""
+"""Export ComPath resources as RDF.
 
+With a stream, :func:`get_rdf` writes the triples directly from the mapping rows as N-Triples, Turtle, or
+RDF/XML instead of building an :class:`rdflib.Graph`. Each pathway's label is written once, no matter how
+many mappings it appears in.
+"""
+
+from typing import Iterable, Optional, Set, TextIO, Tuple
+from xml.sax.saxutils import quoteattr
+
+import pandas as pd
 import rdflib
-from rdflib import Namespace
-from rdflib.namespace import RDFS
+from rdflib import Literal, Namespace
+from rdflib.namespace import RDF, RDFS
 
+from ..constants import EXACT_MATCH, PART_OF
 from ..resources import get_df
 
 __all__ = [
     'get_rdf',
+    'write_rdf',
+    'RDF_FORMATS',
 ]
 
 KEGG_PREFIX = 'http://identifiers.org/kegg.pathway/'
 REACTOME_PREFIX = 'http://identifiers.org/reactome/'
 WIKIPATHWAYS_PREFIX = 'http://identifiers.org/wikipathways/'
 PATHBANK_PREFIX = 'http://identifiers.org/pathbank/'
+DECOPATH_PREFIX = 'https://bioregistry.io/decopath:'
+NEUROMMSIG_PREFIX = 'https://bioregistry.io/neurommsig:'
 COMPATH_PREFIX = 'http://compath.scai.fraunhofer.de/rdfs#'
 
 KEGG_NAMESPACE = Namespace(KEGG_PREFIX)
 REACTOME_NAMESPACE = Namespace(REACTOME_PREFIX)
 PATHBANK_NAMESPACE = Namespace(PATHBANK_PREFIX)
 WIKIPATHWAYS_NAMESPACE = Namespace(WIKIPATHWAYS_PREFIX)
+DECOPATH_NAMESPACE = Namespace(DECOPATH_PREFIX)
+NEUROMMSIG_NAMESPACE = Namespace(NEUROMMSIG_PREFIX)
 compath = Namespace(COMPATH_PREFIX)
 
+#: The predicate for each relation in the resources. Both the current vocabulary and the one used
+#: by older versions of the resources are supported, and give the same predicates as before.
 RELATIONS = {
+    PART_OF: compath['partOf'],
+    'isPartOf': compath['partOf'],
     'partOf': compath['partOf'],
+    EXACT_MATCH: compath['equivalentTo'],
     'equivalentTo': compath['equivalentTo'],
 }
 NAMESPACES = {
     'kegg': KEGG_NAMESPACE,
+    'kegg.pathway': KEGG_NAMESPACE,
     'reactome': REACTOME_NAMESPACE,
     'pathbank': PATHBANK_NAMESPACE,
     'wikipathways': WIKIPATHWAYS_NAMESPACE,
+    'decopath': DECOPATH_NAMESPACE,
+    'neurommsig': NEUROMMSIG_NAMESPACE,
+}
+
+#: The prefixes bound in the RDF documents
+BINDINGS = {
+    'kegg': KEGG_NAMESPACE,
+    'reactome': REACTOME_NAMESPACE,
+    'wp': WIKIPATHWAYS_NAMESPACE,
+    'pathbank': PATHBANK_NAMESPACE,
+    'decopath': DECOPATH_NAMESPACE,
+    'neurommsig': NEUROMMSIG_NAMESPACE,
+    'compath': compath,
+    'rdf': Namespace(str(RDF)),
+    'rdfs': Namespace(str(RDFS)),
 }
 
+#: The formats :func:`write_rdf` can write
+RDF_FORMATS = {'nt', 'turtle', 'xml'}
+
+#: A triple of a subject IRI, a predicate IRI, and an IRI or a literal, and whether the object is a literal
+Triple = Tuple[str, str, str, bool]
+
+
+def get_rdf(stream: Optional[TextIO] = None, format: str = 'nt') -> Optional[rdflib.Graph]:  # noqa: A002
+    """Get an RDFLib graph, or write the RDF to a stream without building a graph.
+
+    :param stream: If given, the RDF is written to it with :func:`write_rdf`
+    :param format: The format to write to the stream. One of :data:`RDF_FORMATS`.
+    :return: An RDFLib graph if no stream was given
+    """
+    if stream is not None:
+        write_rdf(stream, format=format)
+        return None
 
-def get_rdf() -> rdflib.Graph:
-    """Get an RDFLib graph."""
     graph = rdflib.Graph()
+    for prefix, namespace in BINDINGS.items():
+        graph.namespace_manager.bind(prefix, namespace)
+
+    for subject, predicate, obj, is_literal in _iter_triples(get_df()):
+        graph.add((rdflib.URIRef(subject), rdflib.URIRef(predicate), Literal(obj) if is_literal else rdflib.URIRef(obj)))
+
+    return graph
+
+
+def write_rdf(stream: TextIO, df: Optional[pd.DataFrame] = None, format: str = 'nt') -> None:  # noqa: A002
+    """Write the mappings as RDF, one row at a time.
 
-    graph.namespace_manager.bind('kegg', KEGG_NAMESPACE)
-    graph.namespace_manager.bind('reactome', REACTOME_NAMESPACE)
-    graph.namespace_manager.bind('wp', WIKIPATHWAYS_NAMESPACE)
-    graph.namespace_manager.bind('pathbank', WIKIPATHWAYS_NAMESPACE)
-    graph.namespace_manager.bind('compath', compath)
+    :param stream: A writable text stream
+    :param df: The mappings, in the format of :func:`compath_resources.get_df`. Defaults to the same ones
+        as :func:`get_rdf`.
+    :param format: One of :data:`RDF_FORMATS`
+    """
+    if format not in RDF_FORMATS:
+        raise ValueError(f'invalid RDF format: {format}. Use one of {sorted(RDF_FORMATS)}')
+    if df is None:
+        df = get_df()
+    triples = _iter_triples(df)
+    if format == 'nt':
+        _write_ntriples(stream, triples)
+    elif format == 'turtle':
+        _write_turtle(stream, triples)
+    else:
+        _write_xml(stream, triples)
 
-    df = get_df()
+
+def _iter_triples(df: pd.DataFrame) -> Iterable[Triple]:
+    """Iterate over the triples of the mappings, and whether their object is a literal.
+
+    The label of each pathway is generated the first time it appears.
+    """
+    labeled: Set[str] = set()
     for source_ns, source_id, source_name, relation, target_ns, target_id, target_name in df.values:
+        predicate = RELATIONS.get(relation)
+        if predicate is None:
+            raise ValueError(f'invalid mapping with relation: {relation}')
         h = NAMESPACES[source_ns][source_id]
-        r = RELATIONS[relation]
         t = NAMESPACES[target_ns][target_id]
+        yield h, predicate, t, False
+        for node, name in ((h, source_name), (t, target_name)):
+            if node not in labeled and isinstance(name, str):
+                labeled.add(node)
+                yield node, RDFS.label, name, True
 
-        graph.add((h, r, t))
-        graph.add((h, RDFS.label, source_name))
-        graph.add((t, RDFS.label, target_name))
 
-    return graph
+def _quote_literal(value: str) -> str:
+    value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
+    return f'"{value}"'
+
+
+def _write_ntriples(stream: TextIO, triples: Iterable[Triple]) -> None:
+    for subject, predicate, obj, is_literal in triples:
+        stream.write(f'<{subject}> <{predicate}> {_quote_literal(obj) if is_literal else f"<{obj}>"} .\n')
+
+
+def _get_turtle_term(iri: str) -> str:
+    """Abbreviate the IRI with a bound prefix, if its local name is safe to write as is."""
+    for prefix, namespace in BINDINGS.items():
+        if iri.startswith(namespace):
+            local = iri[len(namespace):]
+            if local and local[0] != '-' and local.replace('_', '').replace('-', '').isalnum():
+                return f'{prefix}:{local}'
+    return f'<{iri}>'
+
+
+def _write_turtle(stream: TextIO, triples: Iterable[Triple]) -> None:
+    for prefix, namespace in BINDINGS.items():
+        stream.write(f'@prefix {prefix}: <{namespace}> .\n')
+
+    # the rows are sorted by their source, so consecutive triples about the same subject are grouped
+    last_subject = None
+    for subject, predicate, obj, is_literal in triples:
+        obj = _quote_literal(obj) if is_literal else _get_turtle_term(obj)
+        if subject == last_subject:
+            stream.write(f' ;\n    {_get_turtle_term(predicate)} {obj}')
+        else:
+            stream.write(' .\n' if last_subject is not None else '\n')
+            stream.write(f'{_get_turtle_term(subject)} {_get_turtle_term(predicate)} {obj}')
+            last_subject = subject
+    if last_subject is not None:
+        stream.write(' .\n')
+
+
+def _write_xml(stream: TextIO, triples: Iterable[Triple]) -> None:
+    stream.write('<?xml version="1.0" encoding="UTF-8"?>\n<rdf:RDF\n')
+    stream.write('\n'.join(f'   xmlns:{prefix}={quoteattr(str(namespace))}' for prefix, namespace in BINDINGS.items()))
+    stream.write('\n>\n')
+
+    last_subject = None
+    for subject, predicate, obj, is_literal in triples:
+        if subject != last_subject:
+            if last_subject is not None:
+                stream.write('  </rdf:Description>\n')
+            stream.write(f'  <rdf:Description rdf:about={quoteattr(subject)}>\n')
+            last_subject = subject
+        tag = _get_turtle_term(predicate)
+        if is_literal:
+            stream.write(f'    <{tag}>{_escape_xml(obj)}</{tag}>\n')
+        else:
+            stream.write(f'    <{tag} rdf:resource={quoteattr(obj)}/>\n')
+    if last_subject is not None:
+        stream.write('  </rdf:Description>\n')
+    stream.write('</rdf:RDF>\n')
+
+
+def _escape_xml(value: str) -> str:
+    return value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+
+"""An in-memory index of the ComPath mappings for constant time lookup by CURIE.
+
+.. code-block:: python
+
+    from compath_resources.index import get_index
+
+    index = get_index()
+    index.equivalents('reactome:R-HSA-71406')
+    index.lookup_many(['kegg.pathway:hsa00020', 'wikipathways:WP78'])
+
+The index is built once per process from :func:`compath_resources.get_df`. Queries only touch
+dictionaries, so they are fast enough for translating large numbers of pathway annotations.
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+from .constants import EXACT_MATCH, PART_OF
+from .resources import RESOURCE_PATHS, _get_cached, get_df
+
+__all__ = [
+    'PathwayMapping',
+    'MappingIndex',
+    'get_index',
+    'parse_curie',
+]
+
+Reference = Tuple[str, str]
+
+
+def parse_curie(curie: str) -> Reference:
+    """Split a CURIE like ``reactome:R-HSA-71406`` into its prefix and identifier."""
+    prefix, delimiter, identifier = curie.partition(':')
+    if not delimiter:
+        raise ValueError(f'invalid CURIE: {curie}')
+    return prefix, identifier
+
+
+class PathwayMapping(NamedTuple):
+    """A mapping between two pathways."""
+
+    source_prefix: str
+    source_identifier: str
+    source_name: str
+    relation: str
+    target_prefix: str
+    target_identifier: str
+    target_name: str
+
+    @property
+    def source_curie(self) -> str:
+        """The CURIE of the source pathway."""
+        return f'{self.source_prefix}:{self.source_identifier}'
+
+    @property
+    def target_curie(self) -> str:
+        """The CURIE of the target pathway."""
+        return f'{self.target_prefix}:{self.target_identifier}'
+
+
+class MappingIndex:
+    """Hash maps from pathways to their outgoing and incoming mappings, by relation."""
+
+    def __init__(self, mappings: Iterable[PathwayMapping]):
+        """Index the given mappings.
+
+        :param mappings: An iterable of mappings, like from :meth:`PathwayMapping._make` on the rows of
+            :func:`compath_resources.get_df`
+        """
+        self.outgoing: Dict[Reference, Dict[str, List[PathwayMapping]]] = defaultdict(lambda: defaultdict(list))
+        self.incoming: Dict[Reference, Dict[str, List[PathwayMapping]]] = defaultdict(lambda: defaultdict(list))
+        self.names: Dict[Reference, Optional[str]] = {}
+        self.number_of_mappings = 0
+        for mapping in mappings:
+            source = mapping.source_prefix, mapping.source_identifier
+            target = mapping.target_prefix, mapping.target_identifier
+            self.outgoing[source][mapping.relation].append(mapping)
+            self.incoming[target][mapping.relation].append(mapping)
+            # keep the first name, unless it's missing
+            if self.names.get(source) is None:
+                self.names[source] = mapping.source_name
+            if self.names.get(target) is None:
+                self.names[target] = mapping.target_name
+            self.number_of_mappings += 1
+        # freeze, so lookups of unknown pathways don't add entries
+        self.outgoing = {reference: dict(relations) for reference, relations in self.outgoing.items()}
+        self.incoming = {reference: dict(relations) for reference, relations in self.incoming.items()}
+
+    @classmethod
+    def from_resources(
+        cls,
+        include_reactome_hierarchy: bool = True,
+        include_decopath: bool = True,
+        include_special: bool = True,
+        include_neurommsig: bool = True,
+    ) -> 'MappingIndex':
+        """Build an index from the mappings in :func:`compath_resources.get_df`.
+
+        Missing names, like of some pathways in the NeuroMMSig mappings, are indexed as None.
+        """
+        df = get_df(
+            include_reactome_hierarchy=include_reactome_hierarchy,
+            include_decopath=include_decopath,
+            include_special=include_special,
+            include_neurommsig=include_neurommsig,
+        )
+        df = df.astype(object).where(df.notna(), None)
+        return cls(map(PathwayMapping._make, df.itertuples(index=False, name=None)))
+
+    def __len__(self) -> int:  # noqa: D105
+        return self.number_of_mappings
+
+    def __contains__(self, curie: str) -> bool:  # noqa: D105
+        return parse_curie(curie) in self.names
+
+    def get_name(self, curie: str) -> Optional[str]:
+        """Get the name of a pathway."""
+        return self.names.get(parse_curie(curie))
+
+    def get_outgoing(self, curie: str, relation: Optional[str] = None) -> List[PathwayMapping]:
+        """Get the mappings in which the pathway is the source."""
+        return _get_relations(self.outgoing, parse_curie(curie), relation)
+
+    def get_incoming(self, curie: str, relation: Optional[str] = None) -> List[PathwayMapping]:
+        """Get the mappings in which the pathway is the target."""
+        return _get_relations(self.incoming, parse_curie(curie), relation)
+
+    def lookup(self, curie: str, relation: Optional[str] = None) -> List[PathwayMapping]:
+        """Get the mappings in which the pathway is the source or target.
+
+        :param curie: The CURIE of a pathway, like ``reactome:R-HSA-71406``
+        :param relation: If given, only mappings with this relation, like ``skos:exactMatch``
+        :return: The outgoing then incoming mappings, grouped by relation
+        """
+        reference = parse_curie(curie)
+        return [
+            *_get_relations(self.outgoing, reference, relation),
+            *_get_relations(self.incoming, reference, relation),
+        ]
+
+    def lookup_many(self, curies: Iterable[str], relation: Optional[str] = None) -> Mapping[str, List[PathwayMapping]]:
+        """Get the mappings for each of the given pathways, see :meth:`lookup`."""
+        return {
+            curie: self.lookup(curie, relation=relation)
+            for curie in curies
+        }
+
+    def equivalents(self, curie: str) -> Set[str]:
+        """Get the CURIEs of pathways with an exact match to the given pathway, in either direction."""
+        reference = parse_curie(curie)
+        return {
+            *(mapping.target_curie for mapping in _get_relations(self.outgoing, reference, EXACT_MATCH)),
+            *(mapping.source_curie for mapping in _get_relations(self.incoming, reference, EXACT_MATCH)),
+        }
+
+    def equivalents_many(self, curies: Iterable[str]) -> Mapping[str, Set[str]]:
+        """Get the equivalents of each of the given pathways, see :meth:`equivalents`."""
+        return {
+            curie: self.equivalents(curie)
+            for curie in curies
+        }
+
+    def parents(self, curie: str) -> Set[str]:
+        """Get the CURIEs of the pathways the given pathway is directly part of."""
+        return {
+            mapping.target_curie
+            for mapping in _get_relations(self.outgoing, parse_curie(curie), PART_OF)
+        }
+
+    def children(self, curie: str) -> Set[str]:
+        """Get the CURIEs of the pathways that are directly part of the given pathway."""
+        return {
+            mapping.source_curie
+            for mapping in _get_relations(self.incoming, parse_curie(curie), PART_OF)
+        }
+
+
+def _get_relations(
+    index: Mapping[Reference, Mapping[str, List[PathwayMapping]]],
+    reference: Reference,
+    relation: Optional[str] = None,
+) -> List[PathwayMapping]:
+    relations = index.get(reference)
+    if not relations:
+        return []
+    if relation is not None:
+        return relations.get(relation, [])
+    return [mapping for mappings in relations.values() for mapping in mappings]
+
+
+def get_index(
+    include_reactome_hierarchy: bool = True,
+    include_decopath: bool = True,
+    include_special: bool = True,
+    include_neurommsig: bool = True,
+) -> MappingIndex:
+    """Get a process-wide index of the mappings, built on first use and rebuilt if the resources change."""
+    return _get_cached(
+        ('index', include_reactome_hierarchy, include_decopath, include_special, include_neurommsig),
+        RESOURCE_PATHS,
+        lambda: MappingIndex.from_resources(
+            include_reactome_hierarchy=include_reactome_hierarchy,
+            include_decopath=include_decopath,
+            include_special=include_special,
+            include_neurommsig=include_neurommsig,
+        ),
+    )
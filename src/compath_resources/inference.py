@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+
+"""Mappings implied by composing the ComPath mappings.
+
+``skos:exactMatch`` is symmetric and transitive, ``BFO:0000050`` (part of) is transitive, and a pathway
+that is part of another one is also part of everything equivalent to it. So, a PathBank pathway that
+is equivalent to a KEGG pathway that is part of a WikiPathways pathway is part of that WikiPathways
+pathway, too. The composition of two equivalences is an equivalence, and every other composition is a
+part of relation.
+
+.. code-block:: python
+
+    from compath_resources.inference import infer_mappings
+
+    df = infer_mappings()
+    df[df['Source ID'] == 'PW000001']
+
+Pathways are numbered and the direct mappings are kept as integer arrays sorted by their source, with
+equivalences in both directions. Starting from the direct mappings, the mappings found in each step are
+joined with the direct mappings that start where they end in one vectorized pass, until no new mappings
+are found. Each mapping points to the mapping it extends, so the supporting path of direct mappings
+is recovered at the end. Only the first path found for each inferred mapping is kept, which is one of
+the shortest.
+
+The inferred mappings of up to :data:`INFERRED_MAX_HOPS` hops are written to ``inferred.tsv`` next to the
+resources by :mod:`compath_resources.sync` and can be added to the direct ones with
+``get_df(include_inferred=True)``. Write them with another limit with
+``python -m compath_resources.inference --max-hops``.
+"""
+
+import logging
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+import click
+import numpy as np
+import pandas as pd
+
+from .constants import EXACT_MATCH, PART_OF
+from .resources import INFERRED_PATH, get_df
+from .resources.snapshot import COLUMNS
+from .utils import atomic_path
+
+__all__ = [
+    'infer_mappings',
+    'write_inferred',
+]
+
+logger = logging.getLogger(__name__)
+
+#: The code of each relation. Composing two relations gives the one with the larger code.
+RELATION_CODES = {
+    EXACT_MATCH: 0,
+    PART_OF: 1,
+}
+RELATIONS = [EXACT_MATCH, PART_OF]
+
+#: The columns of the inferred mappings, in addition to the columns of the resource files
+INFERRED_COLUMNS = [*COLUMNS, 'Hops', 'Provenance']
+
+#: The largest number of direct mappings composed into the mappings in ``inferred.tsv``. Longer
+#: compositions keep getting found up to about a dozen hops, and the file would get several times
+#: larger than all the other resources together.
+INFERRED_MAX_HOPS = 3
+
+
+class _Graph(NamedTuple):
+    """The direct mappings as integer arrays, sorted by source."""
+
+    #: The CURIE of each pathway, sorted
+    curies: np.ndarray
+    #: The prefix, identifier, and name of each pathway
+    references: pd.DataFrame
+    sources: np.ndarray
+    targets: np.ndarray
+    relations: np.ndarray
+    #: The position of the first mapping of each source, like the row pointers of a CSR matrix
+    indptr: np.ndarray
+
+
+def _get_graph(df: pd.DataFrame) -> _Graph:
+    """Encode the direct mappings with numbered pathways, with equivalences in both directions."""
+    sides = []
+    for side in ('source', 'target'):
+        sides.append(pd.DataFrame({
+            'prefix': df[f'{side} prefix'].astype(str).to_numpy(),
+            'identifier': df[f'{side} identifier'].astype(str).to_numpy(),
+            'name': df[f'{side} name'].astype(object).to_numpy(),
+        }))
+    for side in sides:
+        side['curie'] = side['prefix'] + ':' + side['identifier']
+    references = pd.concat(sides, ignore_index=True).drop_duplicates('curie').set_index('curie').sort_index()
+    curies = references.index.to_numpy()
+
+    relations = df['relation'].astype(str).map(RELATION_CODES)
+    if relations.isna().any():
+        raise ValueError(f'can not infer from relations: {set(df["relation"][relations.isna()])}')
+    relations = relations.to_numpy(dtype=np.int64)
+    sources = np.searchsorted(curies, sides[0]['curie'].to_numpy())
+    targets = np.searchsorted(curies, sides[1]['curie'].to_numpy())
+
+    equivalences = relations == RELATION_CODES[EXACT_MATCH]
+    sources, targets = (
+        np.concatenate([sources, targets[equivalences]]),
+        np.concatenate([targets, sources[equivalences]]),
+    )
+    relations = np.concatenate([relations, relations[equivalences]])
+
+    keys = _get_keys(sources, targets, relations, len(curies))
+    _, first = np.unique(keys, return_index=True)
+    first = first[sources[first] != targets[first]]
+    order = first[np.lexsort((relations[first], targets[first], sources[first]))]
+    sources, targets, relations = sources[order], targets[order], relations[order]
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=len(curies)))])
+    return _Graph(
+        curies=curies,
+        references=references.reset_index(drop=True),
+        sources=sources,
+        targets=targets,
+        relations=relations,
+        indptr=indptr,
+    )
+
+
+def _get_keys(sources: np.ndarray, targets: np.ndarray, relations: np.ndarray, n: int) -> np.ndarray:
+    """Encode each mapping as a single integer."""
+    return (sources.astype(np.int64) * n + targets) * len(RELATIONS) + relations
+
+
+def _extend(graph: _Graph, targets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Get the positions of the given mappings and of the direct mappings starting where they end."""
+    starts, stops = graph.indptr[targets], graph.indptr[targets + 1]
+    counts = stops - starts
+    left = np.repeat(np.arange(len(targets)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return left, starts[left] + offsets
+
+
+class _Facts(NamedTuple):
+    """All mappings that were found, with the mapping each extends and the direct mapping it extends it with."""
+
+    sources: np.ndarray
+    targets: np.ndarray
+    relations: np.ndarray
+    hops: np.ndarray
+    #: The position of the mapping that's extended, or -1 for direct mappings
+    parents: np.ndarray
+    #: The position of the last direct mapping in the graph
+    edges: np.ndarray
+
+
+def _infer(graph: _Graph, max_hops: Optional[int] = None) -> _Facts:
+    """Join the mappings found in each step with the direct mappings, until no new ones are found."""
+    n = len(graph.curies)
+    sources, targets, relations = [graph.sources], [graph.targets], [graph.relations]
+    hops = [np.ones(len(graph.sources), dtype=np.int64)]
+    parents = [np.full(len(graph.sources), -1, dtype=np.int64)]
+    edges = [np.arange(len(graph.sources))]
+    known = np.sort(_get_keys(graph.sources, graph.targets, graph.relations, n))
+    frontier = np.arange(len(graph.sources))
+    size, hop = len(graph.sources), 1
+
+    while len(frontier) and (max_hops is None or hop < max_hops):
+        hop += 1
+        left, edge = _extend(graph, targets[-1])
+        new_sources = sources[-1][left]
+        new_targets = graph.targets[edge]
+        new_relations = np.maximum(relations[-1][left], graph.relations[edge])
+
+        keys = _get_keys(new_sources, new_targets, new_relations, n)
+        _, first = np.unique(keys, return_index=True)
+        first = first[(new_sources[first] != new_targets[first]) & ~_isin_sorted(keys[first], known)]
+        first.sort()
+
+        sources.append(new_sources[first])
+        targets.append(new_targets[first])
+        relations.append(new_relations[first])
+        hops.append(np.full(len(first), hop, dtype=np.int64))
+        parents.append(frontier[left[first]])
+        edges.append(edge[first])
+        known = np.sort(np.concatenate([known, keys[first]]))
+        frontier = np.arange(size, size + len(first))
+        size += len(first)
+        logger.debug('found %d mappings with %d hops', len(first), hop)
+
+    return _Facts(*map(np.concatenate, (sources, targets, relations, hops, parents, edges)))
+
+
+def _isin_sorted(values: np.ndarray, sorted_values: np.ndarray) -> np.ndarray:
+    if not len(sorted_values):
+        return np.zeros(len(values), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_values, values), len(sorted_values) - 1)
+    return sorted_values[positions] == values
+
+
+def _get_provenance(graph: _Graph, facts: _Facts, positions: np.ndarray) -> List[str]:
+    """Get the supporting path of each of the given mappings, like ``a:1 skos:exactMatch b:2 BFO:0000050 c:3``."""
+    paths: List[List[int]] = [[] for _ in positions]
+    # walk back from all mappings at once, dropping each one when it reaches a direct mapping
+    rows, current = np.arange(len(positions)), positions
+    while len(rows):
+        for row, edge in zip(rows.tolist(), facts.edges[current].tolist()):
+            paths[row].append(edge)
+        current = facts.parents[current]
+        rows, current = rows[current >= 0], current[current >= 0]
+
+    curies, sources, targets = graph.curies, graph.sources, graph.targets
+    relations = [RELATIONS[relation] for relation in graph.relations.tolist()]
+    rv = []
+    for path in paths:
+        path.reverse()
+        parts = [curies[sources[path[0]]]]
+        for edge in path:
+            parts.extend((relations[edge], curies[targets[edge]]))
+        rv.append(' '.join(parts))
+    return rv
+
+
+def infer_mappings(df: Optional[pd.DataFrame] = None, max_hops: Optional[int] = None) -> pd.DataFrame:
+    """Get the mappings implied by the compositions of the given mappings.
+
+    :param df: The direct mappings, with the columns of :func:`compath_resources.get_df`. Defaults to all of
+        them, including the Reactome hierarchy, DecoPath, and the special mappings, but not NeuroMMSig.
+        ``get_df(include_inferred=True)`` adds the inferred mappings whether or not NeuroMMSig is
+        included, so they can't mention its subgraphs.
+    :param max_hops: The largest number of direct mappings that are composed. Defaults to no limit.
+    :return: A dataframe with the columns of the resource files for each inferred mapping that isn't
+        already a direct mapping, along with the number of direct mappings it's composed of in ``Hops``
+        and the path of direct mappings supporting it in ``Provenance``. Equivalences are only given
+        in one direction, from the pathway with the smaller CURIE.
+    """
+    if df is None:
+        df = get_df(include_reactome_hierarchy=True, include_decopath=True, include_special=True)
+    graph = _get_graph(df)
+    facts = _infer(graph, max_hops=max_hops)
+
+    positions = np.flatnonzero(facts.hops > 1)
+    equivalences = facts.relations[positions] == RELATION_CODES[EXACT_MATCH]
+    positions = positions[~equivalences | (facts.sources[positions] < facts.targets[positions])]
+    positions = positions[np.lexsort((
+        facts.relations[positions], facts.targets[positions], facts.sources[positions],
+    ))]
+    logger.info('inferred %d mappings from %d', len(positions), len(df.index))
+
+    sources = graph.references.iloc[facts.sources[positions]].reset_index(drop=True)
+    targets = graph.references.iloc[facts.targets[positions]].reset_index(drop=True)
+    return pd.DataFrame({
+        'Source Resource': sources['prefix'],
+        'Source ID': sources['identifier'],
+        'Source Name': sources['name'],
+        'Mapping Type': np.array(RELATIONS, dtype=object)[facts.relations[positions]],
+        'Target Resource': targets['prefix'],
+        'Target ID': targets['identifier'],
+        'Target Name': targets['name'],
+        'Hops': facts.hops[positions],
+        'Provenance': _get_provenance(graph, facts, positions),
+    }, columns=INFERRED_COLUMNS)
+
+
+def write_inferred(path: Path = INFERRED_PATH, max_hops: Optional[int] = INFERRED_MAX_HOPS) -> pd.DataFrame:
+    """Infer the mappings implied by all resources and write them next to them.
+
+    :param path: The path to the file
+    :param max_hops: The largest number of direct mappings that are composed. If none, there's no limit.
+    """
+    df = infer_mappings(max_hops=max_hops)
+    with atomic_path(path) as temporary_path:
+        df.to_csv(temporary_path, sep='\t', index=False)
+    return df
+
+
+@click.command()
+@click.option(
+    '--max-hops', type=int, default=INFERRED_MAX_HOPS, show_default=True,
+    help='The largest number of direct mappings that are composed',
+)
+def _main(max_hops: Optional[int]):
+    """Write the mappings implied by the resources."""
+    df = write_inferred(max_hops=max_hops)
+    for (relation, hops), count in df.groupby(['Mapping Type', 'Hops']).size().items():
+        click.echo(f'{relation:<16} {hops:>3} hops {count:>8}')
+
+
+if __name__ == '__main__':
+    _main()
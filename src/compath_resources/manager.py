@@ -1,16 +1,86 @@
 # -*- coding: utf-8 -*-
 
-"""Managerial and export functions for ComPath's resources."""
+"""Managerial and export functions for ComPath's resources.
 
+Creating a :class:`Manager` doesn't load anything. Its BEL graph is built on the first call to
+:meth:`Manager.to_bel` and shared by all managers in the process, and its summary is counted
+directly from the mapping table.
+"""
+
+from typing import Mapping, Optional, TextIO
+
+import click
+import pandas as pd
+
+from bio2bel.manager.abstract_manager import add_cli_summarize
 from bio2bel.manager.bel_manager import BELManagerMixin
 from bio2bel.manager.cli_manager import CliMixin
 from pybel import BELGraph
+from .constants import EXACT_MATCH, PART_OF
 from .exporters import get_bel
+from .index import MappingIndex, get_index
+from .resources import RESOURCE_PATHS, _get_cached, get_df
+from .server import DEFAULT_HOST, DEFAULT_PORT, run_server
+from .translate import DEFAULT_CHUNK_SIZE, translate_file
 
 __all__ = [
     'Manager',
+    'get_graph',
+    'get_statistics',
 ]
 
+#: The relation of each relation in the resources in the current vocabulary, like in the BEL exporter
+_RELATIONS = {
+    PART_OF: PART_OF,
+    'isPartOf': PART_OF,
+    EXACT_MATCH: EXACT_MATCH,
+    'equivalentTo': EXACT_MATCH,
+}
+
+#: Relations that are added to the BEL graph in both directions
+_SYMMETRIC_RELATIONS = {EXACT_MATCH}
+
+
+def get_graph() -> BELGraph:
+    """Get a process-wide BEL graph of the mappings, built on first use and rebuilt if the resources change.
+
+    The graph is shared, so copy it before modifying it.
+    """
+    return _get_cached('bel', RESOURCE_PATHS, get_bel)
+
+
+def get_statistics() -> Mapping[str, int]:
+    """Count the nodes and edges of the BEL graph from the mapping table, without building it."""
+    return _get_cached('statistics', RESOURCE_PATHS, lambda: _count_nodes_and_edges(get_df()))
+
+
+def _count_nodes_and_edges(df: pd.DataFrame) -> Mapping[str, int]:
+    """Count the unique pathways and the unique edges of the BEL graph, as in :func:`get_bel`."""
+    source_columns = ['source prefix', 'source identifier', 'source name']
+    target_columns = ['target prefix', 'target identifier', 'target name']
+    nodes = pd.concat([
+        df[source_columns].set_axis(['prefix', 'identifier', 'name'], axis=1),
+        df[target_columns].set_axis(['prefix', 'identifier', 'name'], axis=1),
+    ])
+
+    relations = df['relation'].map(_RELATIONS)
+    if relations.isna().any():
+        raise ValueError(f'invalid mappings with relations: {set(df["relation"][relations.isna()])}')
+    edges = pd.DataFrame({
+        'source': list(map(tuple, df[source_columns].values)),
+        'target': list(map(tuple, df[target_columns].values)),
+        'relation': relations.to_numpy(),
+    })
+    symmetric = edges[edges['relation'].isin(_SYMMETRIC_RELATIONS)]
+    edges = pd.concat([
+        edges,
+        symmetric.rename(columns={'source': 'target', 'target': 'source'}),
+    ])
+    return dict(
+        pathways=len(nodes.drop_duplicates().index),
+        mappings=len(edges.drop_duplicates().index),
+    )
+
 
 class Manager(BELManagerMixin, CliMixin):
     """Pathway-pathway equivalences and hierarchies."""
@@ -18,24 +88,87 @@ class Manager(BELManagerMixin, CliMixin):
     module_name = 'compath'
 
     def __init__(self, *args, **kwargs):  # noqa: D107
-        self.graph = get_bel()
+        pass
 
     @classmethod
     def _get_connection(cls):
         pass
 
+    @classmethod
+    def get_cli(cls) -> click.Group:
+        """Get the command line interface, with commands for summarizing, serving, and translating the mappings."""
+        main = super().get_cli()
+        add_cli_summarize(main)
+
+        @main.command()
+        @click.option('--host', default=DEFAULT_HOST, show_default=True)
+        @click.option('--port', type=int, default=DEFAULT_PORT, show_default=True)
+        @click.pass_obj
+        def serve(manager: 'Manager', host: str, port: int):
+            """Serve mapping lookups over HTTP from an in-memory index."""
+            run_server(host=host, port=port, index=manager.index)
+
+        @main.command()
+        @click.option('-i', '--input', 'input_file', type=click.File('r', encoding='utf-8'), default='-')
+        @click.option('-o', '--output', type=click.File('w', encoding='utf-8'), default='-')
+        @click.option('-c', '--column', required=True, help='The column with the pathways to translate')
+        @click.option('--prefix', help='Translate to the equivalents with this prefix, like reactome')
+        @click.option('--representative', is_flag=True, help='Translate to the representatives of the clusters')
+        @click.option('--input-prefix', help='The prefix of the pathways, if the column has identifiers')
+        @click.option('--output-column', help='The column of the translations. Defaults to {column}_translated')
+        @click.option('--sep', default='\t', show_default=True, help='The delimiter of the table')
+        @click.option('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, show_default=True)
+        def translate(
+            input_file: TextIO,
+            output: TextIO,
+            column: str,
+            prefix: Optional[str],
+            representative: bool,
+            input_prefix: Optional[str],
+            output_column: Optional[str],
+            sep: str,
+            chunk_size: int,
+        ):
+            """Translate a column of pathways in a large table through the equivalence mappings."""
+            if prefix is not None and representative:
+                raise click.UsageError('use either --prefix or --representative')
+            result = translate_file(
+                input_file, output,
+                column=column,
+                prefix=prefix,
+                representative=representative,
+                input_prefix=input_prefix,
+                output_column=output_column,
+                sep=sep,
+                chunk_size=chunk_size,
+            )
+            click.echo(
+                f'translated {result.translated:,} of {result.rows:,} rows in {result.seconds:.2f} seconds '
+                f'({result.rows_per_second:,.0f} rows/s)',
+                err=True,
+            )
+
+        return main
+
+    @property
+    def graph(self) -> BELGraph:
+        """Get the process-wide BEL graph, see :func:`get_graph`."""
+        return get_graph()
+
+    @property
+    def index(self) -> MappingIndex:
+        """Get the process-wide index for looking up mappings by CURIE."""
+        return get_index()
+
     def is_populated(self) -> bool:  # noqa:D102
         return True
 
     def summarize(self):  # noqa:D102
-        return dict(
-            pathways=self.graph.number_of_nodes(),
-            mappings=self.graph.number_of_edges(),
-        )
+        return dict(get_statistics())
 
     def count_relations(self) -> int:
         """Count the number of ComPath mappings."""
-        return self.graph.number_of_edges()
+        return get_statistics()['mappings']
 
     def to_bel(self) -> BELGraph:
         """Convert ComPath to BEL."""
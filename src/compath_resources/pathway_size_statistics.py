@@ -1,66 +1,388 @@
 # -*- coding: utf-8 -*-
 
-"""Plot pathway size statistics."""
+"""Calculate and plot pathway size statistics.
 
+Calculating and plotting are separate steps. The sizes of each database's pathways are streamed from its
+Bio2BEL manager into a fixed-bin histogram and a quantile sketch, without collecting them first, and the
+databases are calculated in separate processes with ``--workers``. The statistics are written to
+``size_statistics.json`` and ``size_statistics.tsv`` in :data:`compath_resources.constants.COMPATH_HOME`,
+which the plot is drawn from, so figures can be regenerated without loading any manager:
+
+.. code-block:: sh
+
+    $ python -m compath_resources.pathway_size_statistics calculate --workers 4
+    $ python -m compath_resources.pathway_size_statistics plot
+"""
+
+import json
 import logging
-from typing import Iterable, Mapping, Tuple
+import math
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional
 
 import click
-import matplotlib.pyplot as plt
-import seaborn as sns
+import pandas as pd
 from more_click import verbose_option
 
-from bio2bel.compath import CompathManager, get_compath_manager_classes
 from compath_resources.constants import COMPATH_HOME
+from compath_resources.utils import atomic_path
+
+__all__ = [
+    'QuantileSketch',
+    'SizeStatistics',
+    'calculate_size_statistics',
+    'get_summary_df',
+    'write_size_statistics',
+    'read_size_statistics',
+    'plot_size_statistics',
+]
 
 logger = logging.getLogger(__name__)
 
+#: The version of the statistics file format. Files with other versions are ignored.
+STATISTICS_VERSION = 1
 
-@click.command()
-@verbose_option
-def main():
-    """Plot pathway size statistics."""
-    x = list(_iter())
+#: The width of each histogram bin
+BIN_WIDTH = 20
+#: Pathways with at least this many genes are counted as overflow instead of in a histogram bin
+MAXIMUM_SIZE = 2000
+#: The relative accuracy of the quantiles given by the sketches
+RELATIVE_ACCURACY = 0.01
+#: The quantiles written to the TSV summary
+QUANTILES = [0.25, 0.5, 0.75, 0.9, 0.99]
 
-    fig, axes = plt.subplots(len(x), figsize=(10, 6))
 
-    for ax, (manager, pathway_id_to_size, maximum) in zip(axes.ravel(), x):
-        _plot(ax, manager.module_name, maximum, pathway_id_to_size)
+class QuantileSketch:
+    """A mergeable sketch of the quantiles of non-negative numbers, with bounded relative error.
 
-    path = COMPATH_HOME / 'size_statistics.png'
-    plt.savefig(path, dpi=300)
+    Each positive value is counted in the logarithmic bucket ``ceil(log_gamma(value))``, so a quantile is
+    estimated within the relative accuracy of the true value with a number of buckets that only grows with
+    the logarithm of the range of the values (see DDSketch, https://arxiv.org/abs/1908.10693).
+    """
+
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY):
+        """Initialize an empty sketch.
+
+        :param relative_accuracy: The largest relative error of an estimated quantile
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f'relative accuracy should be between 0 and 1: {relative_accuracy}')
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.zeros = 0
+        self.buckets: Dict[int, int] = {}
+
+    @property
+    def count(self) -> int:
+        """The number of values added to the sketch."""
+        return self.zeros + sum(self.buckets.values())
+
+    def add(self, value: float) -> None:
+        """Add a value to the sketch."""
+        if value < 0:
+            raise ValueError(f'negative value: {value}')
+        if value == 0:
+            self.zeros += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        """Add the values of another sketch with the same relative accuracy to this one."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('can not merge sketches with different relative accuracies')
+        self.zeros += other.zeros
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def quantile(self, q: float) -> float:
+        """Estimate the quantile, or get NaN if the sketch is empty."""
+        if not 0 <= q <= 1:
+            raise ValueError(f'quantile should be between 0 and 1: {q}')
+        count = self.count
+        if not count:
+            return math.nan
+        rank = q * (count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                break
+        # the midpoint of the bucket in relative terms, so the error is at most the relative accuracy
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def to_dict(self) -> Mapping[str, Any]:
+        """Get a JSON-serializable dictionary of the sketch."""
+        return dict(
+            relative_accuracy=self.relative_accuracy,
+            zeros=self.zeros,
+            buckets={str(key): count for key, count in sorted(self.buckets.items())},
+        )
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> 'QuantileSketch':
+        """Load a sketch from a dictionary made by :meth:`to_dict`."""
+        rv = cls(relative_accuracy=data['relative_accuracy'])
+        rv.zeros = data['zeros']
+        rv.buckets = {int(key): count for key, count in data['buckets'].items()}
+        return rv
+
+
+class SizeStatistics:
+    """Summary statistics, a fixed-bin histogram, and a quantile sketch of pathway sizes, updated one at a time."""
+
+    def __init__(
+        self,
+        bin_width: int = BIN_WIDTH,
+        maximum_size: int = MAXIMUM_SIZE,
+        relative_accuracy: float = RELATIVE_ACCURACY,
+    ):
+        """Initialize empty statistics.
+
+        :param bin_width: The width of each histogram bin
+        :param maximum_size: Sizes of at least this are counted as overflow instead of in a bin
+        :param relative_accuracy: The relative accuracy of the quantile sketch
+        """
+        self.bin_width = bin_width
+        self.maximum_size = maximum_size
+        self.histogram = [0] * math.ceil(maximum_size / bin_width)
+        self.overflow = 0
+        self.count = 0
+        self.total = 0
+        self.minimum: Optional[int] = None
+        self.maximum: Optional[int] = None
+        self.sketch = QuantileSketch(relative_accuracy=relative_accuracy)
+
+    @classmethod
+    def from_sizes(cls, sizes: Iterable[int], **kwargs) -> 'SizeStatistics':
+        """Calculate the statistics of the sizes, which are consumed one at a time."""
+        rv = cls(**kwargs)
+        for size in sizes:
+            rv.add(size)
+        return rv
+
+    @property
+    def mean(self) -> float:
+        """The mean size, or NaN if there are no sizes."""
+        return self.total / self.count if self.count else math.nan
+
+    def add(self, size: int) -> None:
+        """Add the size of a pathway."""
+        if size < self.maximum_size:
+            self.histogram[size // self.bin_width] += 1
+        else:
+            self.overflow += 1
+        self.count += 1
+        self.total += size
+        self.minimum = size if self.minimum is None else min(self.minimum, size)
+        self.maximum = size if self.maximum is None else max(self.maximum, size)
+        self.sketch.add(size)
+
+    def quantile(self, q: float) -> float:
+        """Estimate the quantile of the sizes with the sketch."""
+        return self.sketch.quantile(q)
+
+    def to_dict(self) -> Mapping[str, Any]:
+        """Get a JSON-serializable dictionary of the statistics."""
+        return dict(
+            count=self.count,
+            total=self.total,
+            minimum=self.minimum,
+            maximum=self.maximum,
+            bin_width=self.bin_width,
+            maximum_size=self.maximum_size,
+            histogram=self.histogram,
+            overflow=self.overflow,
+            sketch=self.sketch.to_dict(),
+        )
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> 'SizeStatistics':
+        """Load statistics from a dictionary made by :meth:`to_dict`."""
+        rv = cls(bin_width=data['bin_width'], maximum_size=data['maximum_size'])
+        rv.histogram = list(data['histogram'])
+        rv.overflow = data['overflow']
+        rv.count = data['count']
+        rv.total = data['total']
+        rv.minimum = data['minimum']
+        rv.maximum = data['maximum']
+        rv.sketch = QuantileSketch.from_dict(data['sketch'])
+        return rv
+
+
+def _iter_pathway_sizes(manager) -> Iterable[int]:
+    """Stream the number of genes in each of the manager's pathways that has any.
 
+    This is the query of :meth:`bio2bel.compath.CompathManager.get_pathway_size_distribution`, with the
+    rows fetched in batches instead of collected into a dictionary.
+    """
+    from sqlalchemy import func
 
-def _iter(cutoff: int = 2000) -> Iterable[Tuple[CompathManager, Mapping[str, int], int]]:
-    for name, manager_cls in get_compath_manager_classes().items():
-        logger.info('loading %s', name)
-        manager = manager_cls()
+    count = func.count(manager.protein_model.hgnc_id)
+    query = (
+        manager.session
+        .query(count)
+        .select_from(manager.pathway_model)
+        .join(manager.pathway_model.proteins)
+        .group_by(manager.pathway_model.identifier)
+        .having(count > 0)
+    )
+    for size, in query.yield_per(1000):
+        yield size
 
-        if not manager.is_populated():
-            # manager.populate()
-            logger.warning('skipping unpopulated manager for %s', name)
-            continue
 
-        logger.info('getting pathway size distribution for %s', name)
-        pathway_id_to_size = manager.get_pathway_size_distribution()
-        pathway_id_to_size = {
-            k: v
-            for k, v in pathway_id_to_size.items()
-            if v < cutoff
-        }
-        yield manager, pathway_id_to_size, max(pathway_id_to_size.values())
+def _calculate_database(name: str) -> Optional[SizeStatistics]:
+    from bio2bel.compath import get_compath_manager_classes
 
+    logger.info('loading %s', name)
+    manager = get_compath_manager_classes()[name]()
+    if not manager.is_populated():
+        logger.warning('skipping unpopulated manager for %s', name)
+        return
+    logger.info('getting pathway size distribution for %s', name)
+    return SizeStatistics.from_sizes(_iter_pathway_sizes(manager))
+
+
+def calculate_size_statistics(workers: Optional[int] = None) -> Dict[str, SizeStatistics]:
+    """Calculate the pathway size statistics of all populated ComPath databases.
+
+    :param workers: If more than one, the number of processes used to calculate the databases concurrently
+    :return: A dictionary from database names to their statistics
+    """
+    from bio2bel.compath import get_compath_manager_classes
+
+    names = list(get_compath_manager_classes())
+    if workers is None or workers <= 1:
+        results = map(_calculate_database, names)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(names))) as executor:
+            results = list(executor.map(_calculate_database, names))
+
+    return {
+        name: statistics
+        for name, statistics in zip(names, results)
+        if statistics is not None
+    }
+
+
+def _get_paths(directory) -> List[Path]:
+    directory = Path(COMPATH_HOME if directory is None else directory)
+    return [directory / 'size_statistics.json', directory / 'size_statistics.tsv']
+
+
+def get_summary_df(statistics: Mapping[str, SizeStatistics]) -> pd.DataFrame:
+    """Get a table with the number of pathways, the range and mean of their sizes, and their quantiles."""
+    return pd.DataFrame(
+        [
+            (
+                name, value.count, value.minimum, value.maximum, round(value.mean, 1),
+                *(round(value.quantile(q), 1) for q in QUANTILES), value.overflow,
+            )
+            for name, value in sorted(statistics.items())
+        ],
+        columns=[
+            'database', 'pathways', 'minimum', 'maximum', 'mean',
+            *(f'q{round(100 * q)}' for q in QUANTILES), f'at least {MAXIMUM_SIZE}',
+        ],
+    )
+
+
+def write_size_statistics(statistics: Mapping[str, SizeStatistics], directory=None) -> None:
+    """Write the statistics as JSON, and a summary of them as TSV.
+
+    :param statistics: A dictionary from database names to their statistics
+    :param directory: The directory to write to. Defaults to :data:`compath_resources.constants.COMPATH_HOME`.
+    """
+    json_path, tsv_path = _get_paths(directory)
+    with atomic_path(json_path) as temporary_path:
+        temporary_path.write_text(json.dumps(
+            dict(
+                version=STATISTICS_VERSION,
+                databases={name: value.to_dict() for name, value in sorted(statistics.items())},
+            ),
+            indent=1,
+        ))
+    with atomic_path(tsv_path) as temporary_path:
+        get_summary_df(statistics).to_csv(temporary_path, sep='\t', index=False)
+
+
+def read_size_statistics(directory=None) -> Optional[Dict[str, SizeStatistics]]:
+    """Read the statistics written by :func:`write_size_statistics`, if they exist and have the right version.
+
+    :param directory: The directory to read from. Defaults to :data:`compath_resources.constants.COMPATH_HOME`.
+    """
+    json_path, _ = _get_paths(directory)
+    if not json_path.exists():
+        return None
+    data = json.loads(json_path.read_text())
+    if data.get('version') != STATISTICS_VERSION:
+        logger.warning('ignoring pathway size statistics with unknown format at %s', json_path)
+        return None
+    return {
+        name: SizeStatistics.from_dict(value)
+        for name, value in data['databases'].items()
+    }
+
+
+def plot_size_statistics(statistics: Mapping[str, SizeStatistics], path) -> None:
+    """Plot the histogram of each database's pathway sizes, with its median.
+
+    :param statistics: A dictionary from database names to their statistics
+    :param path: The path of the figure
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.set_theme(style='darkgrid')
+    fig, axes = plt.subplots(len(statistics), figsize=(10, 3 * len(statistics)), squeeze=False)
+    for ax, (name, value) in zip(axes.ravel(), sorted(statistics.items())):
+        # only draw the bins up to the largest pathway
+        bins = min(len(value.histogram), (value.maximum or 0) // value.bin_width + 1)
+        ax.bar(
+            [value.bin_width * i for i in range(bins)],
+            value.histogram[:bins],
+            width=value.bin_width,
+            align='edge',
+        )
+        ax.axvline(value.quantile(0.5), color='black', linestyle='--', label='median')
+        ax.set_title(f'Distribution {name} pathways size', fontsize=18)
+        ax.set_xlabel('Size', fontsize=18)
+        ax.set_ylabel('Frequency', fontsize=18)
+        ax.legend()
+    plt.tight_layout()
+    plt.savefig(path, dpi=300)
+    plt.close(fig)
+
+
+@click.group()
+def main():
+    """Calculate and plot pathway size statistics."""
+
+
+@main.command()
+@click.option('--workers', type=int, default=1, show_default=True, help='Number of worker processes')
+@verbose_option
+def calculate(workers: int):
+    """Calculate the statistics of all populated databases."""
+    statistics = calculate_size_statistics(workers=workers)
+    write_size_statistics(statistics)
+    click.echo(get_summary_df(statistics).to_string(index=False))
 
-def _plot(ax, title, upper, distribution):
-    ax.set_title(f'Distribution {title} pathways size', fontsize=18)
-    ax.set_xlabel('Size', fontsize=18)
-    ax.set_ylabel('Frequency', fontsize=18)
-    ax.set_xlim(0, upper)
 
-    values = list(distribution.values())
-    sns.distplot(values, bins=20, hist=False, ax=ax)
+@main.command()
+@click.option('-o', '--output', type=click.Path(dir_okay=False), help='Defaults to size_statistics.png in COMPATH_HOME')
+def plot(output: Optional[str]):
+    """Plot the statistics written by the calculate command."""
+    statistics = read_size_statistics()
+    if statistics is None:
+        click.secho('run the calculate command before plotting', fg='red')
+        raise click.Abort
+    plot_size_statistics(statistics, output or COMPATH_HOME / 'size_statistics.png')
 
 
 if __name__ == '__main__':
-    logging.basicConfig(level=logging.INFO)
     main()
@@ -1,10 +1,46 @@
 # -*- coding: utf-8 -*-
 
-"""ComPath resources."""
-
+"""ComPath resources.
+
+The resource files are parsed at most once per process. The loaders keep the parsed dataframes in a
+cache keyed on the modification time and size of the underlying files, so they are automatically
+re-read after :mod:`compath_resources.sync` rewrites them. Parsing itself is skipped when the
+precompiled snapshot written by :mod:`compath_resources.sync` is up-to-date with a resource file (see
+:mod:`compath_resources.resources.snapshot`). The cached dataframes are shared between
+callers, so the loaders return read-only views of them. In-place assignments like
+``df.loc[0, 'Source ID'] = ...`` raise a :class:`ValueError`, so make a copy with
+:meth:`pandas.DataFrame.copy` first.
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Mapping, Optional, Tuple
+
+import numpy as np
 import pandas as pd
 
 from compath_resources.constants import RESOURCES
+from .snapshot import COLUMNS, FIELDS, Snapshot, read_snapshot, write_snapshot as _write_snapshot
+
+__all__ = [
+    'get_df',
+    'clear_cache',
+    'warm_cache',
+    'write_snapshot',
+    'get_decopath_df',
+    'get_kegg_wikipathways_df',
+    'get_kegg_reactome_df',
+    'get_wikipathways_reactome_df',
+    'get_pathbank_kegg_df',
+    'get_pathbank_reactome_df',
+    'get_pathbank_wikipathways_df',
+    'get_special_mappings_df',
+    'get_reactome_hierarchy_df',
+    'get_neurommsig_ad_df',
+    'get_neurommsig_pd_df',
+    'get_inferred_df',
+]
 
 # Inter-database mappings
 KEGG_WIKIPATHWAYS_PATH = RESOURCES / 'kegg_wikipathways.tsv'
@@ -20,54 +56,297 @@ REACTOME_HIERARCHICAL_MAPPINGS_PATH = RESOURCES / 'reactome_hierarchy.tsv'
 
 DECOPATH_PATH = RESOURCES / 'decopath.tsv'
 
+# Mappings of NeuroMMSig disease subgraphs
+NEUROMMSIG_AD_PATH = RESOURCES / 'neurommsig_ad.tsv'
+NEUROMMSIG_PD_PATH = RESOURCES / 'neurommsig_pd.tsv'
+
+#: Mappings implied by the others, written by :mod:`compath_resources.inference`. It's not in
+#: :data:`RESOURCE_PATHS` since it's derived from them.
+INFERRED_PATH = RESOURCES / 'inferred.tsv'
+
+RESOURCE_PATHS = [
+    KEGG_WIKIPATHWAYS_PATH,
+    KEGG_REACTOME_PATH,
+    WIKIPATHWAYS_REACTOME_PATH,
+    PATHBANK_KEGG_PATH,
+    PATHBANK_REACTOME_PATH,
+    PATHBANK_WIKIPATHWAYS_PATH,
+    SPECIAL_MAPPINGS_PATH,
+    REACTOME_HIERARCHICAL_MAPPINGS_PATH,
+    DECOPATH_PATH,
+    NEUROMMSIG_AD_PATH,
+    NEUROMMSIG_PD_PATH,
+]
+
+SNAPSHOT_METADATA_PATH = RESOURCES / 'snapshot.json'
+SNAPSHOT_CODES_PATH = RESOURCES / 'snapshot.npy'
+
+_Stamp = Tuple[int, int]
+
+#: Parsed resources, keyed on a path or on the arguments to :func:`get_df`, along with the stamps of the files
+_CACHE: Dict[Hashable, Tuple[Tuple[_Stamp, ...], Any]] = {}
+_CACHE_LOCK = threading.RLock()
+
+
+def clear_cache() -> None:
+    """Clear the cache of parsed resources."""
+    with _CACHE_LOCK:
+        _CACHE.clear()
+
+
+def warm_cache(
+    include_reactome_hierarchy: bool = False,
+    include_decopath: bool = False,
+    include_special: bool = False,
+    include_inferred: bool = False,
+    include_neurommsig: bool = False,
+) -> None:
+    """Parse all resources and the combination of them given by the flags for :func:`get_df`."""
+    for path in RESOURCE_PATHS:
+        _read_resource(path)
+    get_df(
+        include_reactome_hierarchy=include_reactome_hierarchy,
+        include_decopath=include_decopath,
+        include_special=include_special,
+        include_inferred=include_inferred,
+        include_neurommsig=include_neurommsig,
+    )
+
+
+def write_snapshot() -> None:
+    """Write the precompiled snapshot of the resource files."""
+    _write_snapshot(RESOURCE_PATHS, SNAPSHOT_METADATA_PATH, SNAPSHOT_CODES_PATH)
+
+
+def _get_stamp(path: Path) -> Optional[_Stamp]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _freeze(df: pd.DataFrame) -> pd.DataFrame:
+    """Copy a dataframe into one whose columns are backed by read-only arrays.
+
+    Categorical columns are left as they are, see :func:`_view`.
+    """
+    arrays = {}
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            arrays[column] = df[column].array
+            continue
+        array = df[column].to_numpy(copy=True)
+        array.setflags(write=False)
+        arrays[column] = array
+    return pd.DataFrame(arrays, index=df.index, copy=False)
+
+
+def _view(df: pd.DataFrame) -> pd.DataFrame:
+    """Get a view of a frozen dataframe that doesn't let changes through to it.
+
+    Categorical columns are copied, which only copies their small integer codes and shares their categories.
+    """
+    rv = df.copy(deep=False)
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            rv[column] = df[column].copy()
+    return rv
+
+
+def _get_cached(key: Hashable, paths, build):
+    """Get a cached value, building it if any of the files changed."""
+    stamps = tuple(_get_stamp(path) for path in paths)
+    with _CACHE_LOCK:
+        entry = _CACHE.get(key)
+        if entry is None or entry[0] != stamps:
+            entry = _CACHE[key] = stamps, build()
+    return entry[1]
+
+
+def _cached(key: Hashable, paths, build) -> pd.DataFrame:
+    """Get a read-only view of a cached dataframe, building it if any of the files changed."""
+    return _view(_get_cached(key, paths, lambda: _freeze(build())))
+
+
+def _get_snapshot() -> Optional[Snapshot]:
+    return _get_cached(
+        'snapshot',
+        [SNAPSHOT_METADATA_PATH, SNAPSHOT_CODES_PATH],
+        lambda: read_snapshot(SNAPSHOT_METADATA_PATH, SNAPSHOT_CODES_PATH),
+    )
+
+
+def _parse_resource(path: Path) -> pd.DataFrame:
+    snapshot = _get_snapshot()
+    if snapshot is not None:
+        df = snapshot.get_df(path)
+        if df is not None:
+            return df
+    return pd.read_csv(path, sep='\t')
+
+
+def _read_resource(path: Path) -> pd.DataFrame:
+    return _cached(path, [path], lambda: _parse_resource(path))
+
 
 def get_df(
     include_reactome_hierarchy: bool = False,
     include_decopath: bool = False,
     include_special: bool = False,
+    compact: bool = False,
+    include_inferred: bool = False,
+    include_neurommsig: bool = False,
 ) -> pd.DataFrame:
     """Get all dataframes.
 
     :param include_reactome_hierarchy: include Reactome hierarchy?
     :param include_decopath: include decopath?
     :param include_special: include special mappings (inside same db)?
-    :return: dataframe with ComPath dataset
+    :param include_inferred: include the mappings implied by all others, from :func:`get_inferred_df`?
+    :param include_neurommsig: include the mappings of NeuroMMSig disease subgraphs? Their targets
+        only have names if they appear in another resource.
+    :param compact: Encode all columns as categoricals? Prefixes, identifiers, names, and relations
+        each have a single, sorted set of categories shared by their source and target columns, so
+        each string is stored once and columns of the same kind can be compared or joined on their codes.
+    :return: dataframe with ComPath dataset, as a read-only view of a cached dataframe
     """
-    dfs = [
-        get_kegg_wikipathways_df(),
-        get_kegg_reactome_df(),
-        get_wikipathways_reactome_df(),
-        get_pathbank_kegg_df(),
-        get_pathbank_reactome_df(),
-        get_pathbank_reactome_df(),
+    paths = _get_df_paths(
+        include_reactome_hierarchy=include_reactome_hierarchy,
+        include_decopath=include_decopath,
+        include_special=include_special,
+        include_inferred=include_inferred,
+        include_neurommsig=include_neurommsig,
+    )
+    return _cached(
+        (
+            'get_df', include_reactome_hierarchy, include_decopath, include_special, compact, include_inferred,
+            include_neurommsig,
+        ),
+        [*RESOURCE_PATHS, INFERRED_PATH] if include_inferred else RESOURCE_PATHS,
+        lambda: _get_compact_df(paths) if compact else _get_df(paths),
+    )
+
+
+#: The names of the columns in the dataframe returned by :func:`get_df`
+DF_COLUMNS = {
+    'Source Resource': 'source prefix',
+    'Source ID': 'source identifier',
+    'Source Name': 'source name',
+    'Target Resource': 'target prefix',
+    'Target ID': 'target identifier',
+    'Target Name': 'target name',
+    'Mapping Type': 'relation',
+}
+
+_SORT_COLUMNS = ['Source Resource', 'Source ID', 'Target Resource', 'Target ID']
+
+
+def _get_df_paths(
+    include_reactome_hierarchy: bool = False,
+    include_decopath: bool = False,
+    include_special: bool = False,
+    include_inferred: bool = False,
+    include_neurommsig: bool = False,
+) -> List[Path]:
+    paths = [
+        KEGG_WIKIPATHWAYS_PATH,
+        KEGG_REACTOME_PATH,
+        WIKIPATHWAYS_REACTOME_PATH,
+        PATHBANK_KEGG_PATH,
+        PATHBANK_REACTOME_PATH,
+        PATHBANK_WIKIPATHWAYS_PATH,
     ]
     if include_special:
-        dfs.append(get_special_mappings_df())
+        paths.append(SPECIAL_MAPPINGS_PATH)
 
     if include_reactome_hierarchy:
-        dfs.append(get_reactome_hierarchy_df())
+        paths.append(REACTOME_HIERARCHICAL_MAPPINGS_PATH)
 
     if include_decopath:
-        dfs.append(get_decopath_df())
-
-    df = pd.concat(dfs)
-    df = df.sort_values(['Source Resource', 'Source ID', 'Target Resource', 'Target ID'])
-    df = df.rename(columns={
-        'Source Resource': 'source prefix',
-        'Source ID': 'source identifier',
-        'Source Name': 'source name',
-        'Target Resource': 'target prefix',
-        'Target ID': 'target identifier',
-        'Target Name': 'target name',
-        'Mapping Type': 'relation',
-    })
+        paths.append(DECOPATH_PATH)
+
+    if include_neurommsig:
+        paths.extend((NEUROMMSIG_AD_PATH, NEUROMMSIG_PD_PATH))
+
+    if include_inferred:
+        paths.append(INFERRED_PATH)
+
+    return paths
+
+
+def _get_df(paths: List[Path]) -> pd.DataFrame:
+    # the inferred mappings have extra columns for their provenance
+    df = pd.concat([_read_resource(path)[COLUMNS] for path in paths])
+    df = df.sort_values(_SORT_COLUMNS)
+    df = df.rename(columns=DF_COLUMNS)
     df = df.drop_duplicates()
     return df
 
 
+def _get_codes(paths: List[Path]) -> Tuple[Mapping[str, np.ndarray], List[np.ndarray]]:
+    """Get the vocabulary of each field and the code matrix of each resource file.
+
+    The codes come from the snapshot if it's up-to-date with all files. Otherwise, the files are encoded.
+    """
+    snapshot = _get_snapshot()
+    if snapshot is not None:
+        blocks = [snapshot.get_codes(path) for path in paths]
+        if all(block is not None for block in blocks):
+            return snapshot.vocabularies, blocks
+
+    dfs = [_read_resource(path) for path in paths]
+    vocabularies, indexes = {}, {}
+    for field in set(FIELDS.values()):
+        columns = [column for column in COLUMNS if FIELDS[column] == field]
+        vocabulary = sorted({value for df in dfs for column in columns for value in df[column].dropna()})
+        vocabularies[field] = np.array([*vocabulary, np.nan], dtype=object)
+        indexes[field] = pd.Index(vocabulary)
+    blocks = [
+        np.column_stack([indexes[FIELDS[column]].get_indexer(df[column]) for column in COLUMNS]).astype(np.int32)
+        for df in dfs
+    ]
+    return vocabularies, blocks
+
+
+def _get_compact_df(paths: List[Path]) -> pd.DataFrame:
+    """Build the dataframe for :func:`get_df` by sorting and deduplicating integer codes."""
+    vocabularies, blocks = _get_codes(paths)
+    codes = np.concatenate(blocks)
+    index = np.concatenate([np.arange(len(block)) for block in blocks])
+
+    # vocabularies are sorted, so sorting codes sorts values. missing values (-1) go last, like in pandas
+    sort_keys = [
+        np.where(codes[:, i] < 0, np.iinfo(np.int32).max, codes[:, i])
+        for i in (COLUMNS.index(column) for column in reversed(_SORT_COLUMNS))
+    ]
+    order = np.lexsort(sort_keys)
+    codes, index = codes[order], index[order]
+
+    keep = ~pd.DataFrame(codes).duplicated().to_numpy()
+    codes, index = codes[keep], index[keep]
+
+    # only keep the categories in use, shared between the source and target columns of each field
+    columns = {}
+    for field, vocabulary in vocabularies.items():
+        positions = [i for i, column in enumerate(COLUMNS) if FIELDS[column] == field]
+        used = np.unique(codes[:, positions])
+        used = used[used >= 0]
+        dtype = pd.CategoricalDtype(pd.Index(vocabulary[used], dtype=object))
+        for i in positions:
+            field_codes = np.searchsorted(used, codes[:, i])
+            field_codes[codes[:, i] < 0] = -1
+            columns[DF_COLUMNS[COLUMNS[i]]] = pd.Categorical.from_codes(field_codes, dtype=dtype)
+
+    return pd.DataFrame(
+        {DF_COLUMNS[column]: columns[DF_COLUMNS[column]] for column in COLUMNS},
+        index=index,
+    )
+
+
 def get_decopath_df() -> pd.DataFrame:
     """Get the decopath mappings."""
-    return pd.read_csv(DECOPATH_PATH, sep='\t')
+    return _read_resource(DECOPATH_PATH)
 
 
 """Inter-database mappings"""
@@ -75,32 +354,32 @@ def get_decopath_df() -> pd.DataFrame:
 
 def get_kegg_wikipathways_df() -> pd.DataFrame:
     """Get KEGG-WikiPathways data."""
-    return pd.read_csv(KEGG_WIKIPATHWAYS_PATH, sep='\t')
+    return _read_resource(KEGG_WIKIPATHWAYS_PATH)
 
 
 def get_kegg_reactome_df() -> pd.DataFrame:
     """Get KEGG-Reactome data."""
-    return pd.read_csv(KEGG_REACTOME_PATH, sep='\t')
+    return _read_resource(KEGG_REACTOME_PATH)
 
 
 def get_wikipathways_reactome_df() -> pd.DataFrame:
     """Get WikiPathways-Reactome data."""
-    return pd.read_csv(WIKIPATHWAYS_REACTOME_PATH, sep='\t')
+    return _read_resource(WIKIPATHWAYS_REACTOME_PATH)
 
 
 def get_pathbank_kegg_df() -> pd.DataFrame:
     """Get PathBank-KEGG data."""
-    return pd.read_csv(PATHBANK_KEGG_PATH, sep='\t')
+    return _read_resource(PATHBANK_KEGG_PATH)
 
 
 def get_pathbank_reactome_df() -> pd.DataFrame:
     """Get PathBank-Reactome data."""
-    return pd.read_csv(PATHBANK_REACTOME_PATH, sep='\t')
+    return _read_resource(PATHBANK_REACTOME_PATH)
 
 
 def get_pathbank_wikipathways_df() -> pd.DataFrame:
     """Get PathBank-WikiPathways data."""
-    return pd.read_csv(PATHBANK_WIKIPATHWAYS_PATH, sep='\t')
+    return _read_resource(PATHBANK_WIKIPATHWAYS_PATH)
 
 
 """Intra-database mappings"""
@@ -108,9 +387,30 @@ def get_pathbank_wikipathways_df() -> pd.DataFrame:
 
 def get_special_mappings_df() -> pd.DataFrame:
     """Get special mappings data."""
-    return pd.read_csv(SPECIAL_MAPPINGS_PATH, sep='\t')
+    return _read_resource(SPECIAL_MAPPINGS_PATH)
 
 
 def get_reactome_hierarchy_df() -> pd.DataFrame:
     """Get reactome hierarchy data."""
-    return pd.read_csv(REACTOME_HIERARCHICAL_MAPPINGS_PATH, sep='\t')
+    return _read_resource(REACTOME_HIERARCHICAL_MAPPINGS_PATH)
+
+
+"""Disease subgraph mappings"""
+
+
+def get_neurommsig_ad_df() -> pd.DataFrame:
+    """Get the mappings of the NeuroMMSig Alzheimer's disease subgraphs."""
+    return _read_resource(NEUROMMSIG_AD_PATH)
+
+
+def get_neurommsig_pd_df() -> pd.DataFrame:
+    """Get the mappings of the NeuroMMSig Parkinson's disease subgraphs."""
+    return _read_resource(NEUROMMSIG_PD_PATH)
+
+
+"""Inferred mappings"""
+
+
+def get_inferred_df() -> pd.DataFrame:
+    """Get the mappings implied by all others, with the number of hops and the supporting path of each."""
+    return _read_resource(INFERRED_PATH)
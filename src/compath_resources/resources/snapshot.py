@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+"""A precompiled, columnar snapshot of the ComPath resources.
+
+The snapshot consists of two files next to the resources, both written by :mod:`compath_resources.sync`:
+
+1. ``snapshot.npy``, an integer matrix with one row per mapping and one column per resource column,
+   holding codes into the vocabulary of the column's field. It is memory-mapped when loaded.
+2. ``snapshot.json``, holding the sorted vocabularies of each field (prefixes, identifiers, names,
+   and relations), the rows of each resource file, and the SHA-256 hash of each resource file.
+
+Each string appears once in the vocabularies, so loading the snapshot neither infers dtypes nor creates
+a separate string object for every cell. A resource file whose hash does not match the snapshot is
+ignored, so callers fall back to parsing the TSV.
+"""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..utils import atomic_path
+
+__all__ = [
+    'COLUMNS',
+    'FIELDS',
+    'Snapshot',
+    'write_snapshot',
+    'read_snapshot',
+    'get_hashes',
+]
+
+logger = logging.getLogger(__name__)
+
+#: The version of the snapshot format. Snapshots with other versions are ignored.
+SNAPSHOT_VERSION = 1
+
+#: The columns of the resource files
+COLUMNS = [
+    'Source Resource',
+    'Source ID',
+    'Source Name',
+    'Mapping Type',
+    'Target Resource',
+    'Target ID',
+    'Target Name',
+]
+
+#: The field of each column. Columns of the same field share a vocabulary.
+FIELDS = {
+    'Source Resource': 'prefix',
+    'Source ID': 'identifier',
+    'Source Name': 'name',
+    'Mapping Type': 'relation',
+    'Target Resource': 'prefix',
+    'Target ID': 'identifier',
+    'Target Name': 'name',
+}
+
+
+def _hash_file(path: Path) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def get_hashes(paths: Iterable[Path]) -> Dict[str, str]:
+    """Get the SHA-256 hash of each of the given files, keyed by file name."""
+    return {
+        Path(path).name: _hash_file(path)
+        for path in paths
+    }
+
+
+class Snapshot(NamedTuple):
+    """A loaded snapshot."""
+
+    #: The sorted vocabulary of each field, as object arrays. The last element is always NaN, so
+    #: the missing value code -1 decodes to it.
+    vocabularies: Mapping[str, np.ndarray]
+    #: The code matrix, with one column per entry in :data:`COLUMNS`
+    codes: np.ndarray
+    #: A dictionary from resource file names to their hash and the slice of their rows in the code matrix
+    resources: Mapping[str, Tuple[str, int, int]]
+
+    def get_codes(self, path: Path) -> Optional[np.ndarray]:
+        """Get the codes of a resource file, if the snapshot is up-to-date with it."""
+        entry = self.resources.get(Path(path).name)
+        if entry is None:
+            return None
+        sha256, start, stop = entry
+        if sha256 != _hash_file(path):
+            logger.warning('snapshot is out of date with %s. run `python -m compath_resources.sync`', path)
+            return None
+        return self.codes[start:stop]
+
+    def get_df(self, path: Path) -> Optional[pd.DataFrame]:
+        """Get the dataframe of a resource file, if the snapshot is up-to-date with it."""
+        codes = self.get_codes(path)
+        if codes is None:
+            return None
+        return pd.DataFrame({
+            column: self.vocabularies[FIELDS[column]][codes[:, i]]
+            for i, column in enumerate(COLUMNS)
+        })
+
+
+def write_snapshot(paths: Iterable[Path], metadata_path: Path, codes_path: Path) -> None:
+    """Write a snapshot of the given resource files."""
+    dfs: Dict[Path, pd.DataFrame] = {}
+    for path in paths:
+        df = pd.read_csv(path, sep='\t')
+        if list(df.columns) != COLUMNS or any(dtype != object for dtype in df.dtypes):
+            logger.warning('can not include %s in snapshot', path)
+            continue
+        dfs[Path(path)] = df
+
+    vocabularies: Dict[str, List[str]] = {}
+    for field in sorted(set(FIELDS.values())):
+        columns = [column for column in COLUMNS if FIELDS[column] == field]
+        vocabularies[field] = sorted({
+            value
+            for df in dfs.values()
+            for column in columns
+            for value in df[column].dropna()
+        })
+    indexes = {
+        field: pd.Index(vocabulary)
+        for field, vocabulary in vocabularies.items()
+    }
+
+    blocks = []
+    resources = {}
+    start = 0
+    for path, df in dfs.items():
+        blocks.append(np.column_stack([
+            indexes[FIELDS[column]].get_indexer(df[column])
+            for column in COLUMNS
+        ]).astype(np.int32))
+        resources[path.name] = dict(sha256=_hash_file(path), start=start, stop=start + len(df.index))
+        start += len(df.index)
+
+    with atomic_path(codes_path) as temporary_path:
+        np.save(temporary_path, np.concatenate(blocks) if blocks else np.zeros((0, len(COLUMNS)), dtype=np.int32))
+    with atomic_path(metadata_path) as temporary_path:
+        temporary_path.write_text(json.dumps(
+            dict(
+                version=SNAPSHOT_VERSION,
+                columns=COLUMNS,
+                resources=resources,
+                vocabularies=vocabularies,
+            ),
+            indent=1,
+            ensure_ascii=False,
+        ), encoding='utf-8')
+
+
+def read_snapshot(metadata_path: Path, codes_path: Path) -> Optional[Snapshot]:
+    """Read a snapshot, memory-mapping its codes, if it exists and has the right version."""
+    if not Path(metadata_path).exists() or not Path(codes_path).exists():
+        return None
+    metadata = json.loads(Path(metadata_path).read_text(encoding='utf-8'))
+    if metadata.get('version') != SNAPSHOT_VERSION or metadata['columns'] != COLUMNS:
+        logger.warning('ignoring snapshot with unknown format at %s', metadata_path)
+        return None
+
+    vocabularies = {}
+    for field, vocabulary in metadata['vocabularies'].items():
+        array = np.empty(len(vocabulary) + 1, dtype=object)
+        array[:-1] = vocabulary
+        array[-1] = np.nan
+        vocabularies[field] = array
+
+    return Snapshot(
+        vocabularies=vocabularies,
+        codes=np.load(codes_path, mmap_mode='r'),
+        resources={
+            name: (entry['sha256'], entry['start'], entry['stop'])
+            for name, entry in metadata['resources'].items()
+        },
+    )
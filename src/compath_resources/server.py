@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+
+"""A small HTTP/JSON server for looking up ComPath mappings from other processes.
+
+The mappings are loaded once into a :class:`compath_resources.index.MappingIndex` and a
+:class:`compath_resources.closure.Closure` when the server starts, so workers can query them without importing this package or parsing the resources themselves.
+Run it with ``compath-resources serve``, then post batches of CURIEs:
+
+.. code-block:: sh
+
+    $ curl -d '{"curies": ["kegg.pathway:hsa00010"], "prefix": "reactome"}' localhost:8765/translate
+
+========================  ======  ================================================================
+Endpoint                  Method  Response
+========================  ======  ================================================================
+``/translate``            POST    the equivalent CURIEs of each CURIE, optionally only with ``prefix``
+``/equivalents``          POST    the equivalent CURIEs of each CURIE
+``/hierarchy``            POST    the ``parents`` and ``children`` of each CURIE, optionally ``transitive``
+``/lookup``               POST    the mappings of each CURIE, optionally only with ``relation``
+``/metrics``              GET     the number of requests and their latency by endpoint
+``/health``               GET     the number of pathways and mappings
+========================  ======  ================================================================
+
+Request bodies are JSON objects with a list of ``curies``. For the ``POST`` endpoints, the CURIEs can
+also be given as ``curie`` query parameters instead. ``/hierarchy`` gives the direct parents and
+children, and also all ``ancestors`` and ``descendants`` from the closure if ``transitive`` is true.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .closure import Closure, get_closure
+from .index import MappingIndex, get_index
+
+__all__ = [
+    'MappingServer',
+    'LatencyMetrics',
+    'run_server',
+]
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+#: The largest request body that's accepted, in bytes
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+#: The number of most recent latencies per endpoint that quantiles are calculated from
+LATENCY_WINDOW = 10_000
+
+#: The endpoint that requests to unknown paths and requests that can't be parsed are counted under
+OTHER_ENDPOINT = 'other'
+
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+}
+
+
+class HTTPError(Exception):
+    """An error that's sent to the client with the given status."""
+
+    def __init__(self, status: int, message: str):  # noqa: D107
+        super().__init__(message)
+        self.status = status
+
+
+class LatencyMetrics:
+    """The number of requests per endpoint and the latency of the most recent ones."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        """Initialize the metrics.
+
+        :param window: The number of most recent latencies kept per endpoint
+        """
+        self.window = window
+        self.started = time.time()
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.latencies: Dict[str, Deque[float]] = {}
+
+    def add(self, endpoint: str, seconds: float, error: bool = False) -> None:
+        """Record a request."""
+        self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+        if error:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+        latencies = self.latencies.get(endpoint)
+        if latencies is None:
+            latencies = self.latencies[endpoint] = deque(maxlen=self.window)
+        latencies.append(seconds)
+
+    def summarize(self) -> Mapping[str, Any]:
+        """Summarize the metrics, with latencies in milliseconds."""
+        return dict(
+            uptime=time.time() - self.started,
+            endpoints={
+                endpoint: dict(
+                    requests=count,
+                    errors=self.errors.get(endpoint, 0),
+                    **_summarize_latencies(self.latencies[endpoint]),
+                )
+                for endpoint, count in sorted(self.counts.items())
+            },
+        )
+
+
+def _summarize_latencies(latencies: Deque[float]) -> Mapping[str, float]:
+    values = sorted(latencies)
+    return dict(
+        mean_ms=1000 * sum(values) / len(values),
+        p50_ms=1000 * _get_quantile(values, 0.50),
+        p95_ms=1000 * _get_quantile(values, 0.95),
+        p99_ms=1000 * _get_quantile(values, 0.99),
+        max_ms=1000 * values[-1],
+    )
+
+
+def _get_quantile(values: List[float], q: float) -> float:
+    """Get the quantile of sorted values with the nearest rank method."""
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+Handler = Callable[[Mapping[str, Any]], Any]
+
+
+class MappingServer:
+    """An asyncio HTTP/JSON server answering queries about the mappings from an in-memory index."""
+
+    def __init__(self, index: Optional[MappingIndex] = None, closure: Optional[Closure] = None):
+        """Initialize the server.
+
+        :param index: The index to answer queries from. Defaults to :func:`compath_resources.index.get_index`.
+        :param closure: The closure to answer transitive hierarchy queries from. Defaults to
+            :func:`compath_resources.closure.get_closure`.
+        """
+        self.index = get_index() if index is None else index
+        self.closure = get_closure() if closure is None else closure
+        self.metrics = LatencyMetrics()
+        self.routes: Dict[str, Tuple[str, Handler]] = {
+            '/translate': ('POST', self.translate),
+            '/equivalents': ('POST', self.equivalents),
+            '/hierarchy': ('POST', self.hierarchy),
+            '/lookup': ('POST', self.lookup),
+            '/metrics': ('GET', lambda _: self.metrics.summarize()),
+            '/health': ('GET', lambda _: dict(pathways=len(self.index.names), mappings=len(self.index))),
+        }
+
+    def translate(self, query: Mapping[str, Any]) -> Mapping[str, List[str]]:
+        """Get the equivalent CURIEs of each CURIE, optionally only the ones with the given prefix."""
+        prefix = query.get('prefix')
+        return {
+            curie: sorted(
+                equivalent
+                for equivalent in self.index.equivalents(curie)
+                if prefix is None or equivalent.startswith(f'{prefix}:')
+            )
+            for curie in _get_curies(query)
+        }
+
+    def equivalents(self, query: Mapping[str, Any]) -> Mapping[str, List[str]]:
+        """Get the equivalent CURIEs of each CURIE."""
+        return {
+            curie: sorted(self.index.equivalents(curie))
+            for curie in _get_curies(query)
+        }
+
+    def hierarchy(self, query: Mapping[str, Any]) -> Mapping[str, Mapping[str, List[str]]]:
+        """Get the CURIEs of the direct parents and children of each CURIE.
+
+        If ``transitive`` is true, the CURIEs of all of their ancestors and descendants are given too.
+        """
+        transitive = _get_flag(query, 'transitive')
+        rv = {}
+        for curie in _get_curies(query):
+            rv[curie] = dict(
+                parents=sorted(self.index.parents(curie)),
+                children=sorted(self.index.children(curie)),
+            )
+            if transitive:
+                rv[curie].update(
+                    ancestors=sorted(self.closure.ancestors(curie)),
+                    descendants=sorted(self.closure.descendants(curie)),
+                )
+        return rv
+
+    def lookup(self, query: Mapping[str, Any]) -> Mapping[str, List[Mapping[str, str]]]:
+        """Get the mappings of each CURIE, optionally only the ones with the given relation."""
+        return {
+            curie: [mapping._asdict() for mapping in mappings]
+            for curie, mappings in self.index.lookup_many(_get_curies(query), relation=query.get('relation')).items()
+        }
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.AbstractServer:
+        """Start listening. Use port 0 to pick a free port."""
+        return await asyncio.start_server(self.handle, host=host, port=port)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answer the requests on a connection until the client closes it."""
+        try:
+            while await self._handle_request(reader, writer):
+                pass
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        """Answer one request and return if the connection should be kept open."""
+        request_line, path, version, headers, body = b'', None, 'HTTP/1.0', {}, None
+        start = time.perf_counter()
+        try:
+            request_line = await _read_line(reader)
+            if not request_line:
+                return False
+            start = time.perf_counter()
+            headers = await _read_headers(reader)
+            method, target, version = _parse_request_line(request_line)
+            url = urlsplit(target)
+            path = url.path
+            body = await _read_body(headers, reader)
+            status, response = 200, self._dispatch(method, path, url.query, body)
+        except HTTPError as e:
+            status, response = e.status, dict(error=str(e))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            raise
+        except Exception as e:
+            logger.exception('error answering %s', request_line)
+            status, response = 500, dict(error=str(e))
+
+        # if the body wasn't read, the rest of the stream can't be parsed as the next request
+        keep_alive = body is not None and _keep_alive(version, headers)
+        _write_response(writer, status, response, keep_alive)
+        await writer.drain()
+        endpoint = path if path in self.routes else OTHER_ENDPOINT
+        self.metrics.add(endpoint, time.perf_counter() - start, error=status != 200)
+        return keep_alive
+
+    def _dispatch(self, method: str, path: str, query_string: str, body: bytes) -> Any:
+        route = self.routes.get(path)
+        if route is None:
+            raise HTTPError(404, f'unknown endpoint: {path}')
+        allowed_method, handler = route
+        if method != allowed_method:
+            raise HTTPError(405, f'use {allowed_method} for {path}')
+        query = _parse_query(query_string, body)
+        try:
+            return handler(query)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+
+
+def _parse_request_line(request_line: bytes) -> Tuple[str, str, str]:
+    parts = request_line.decode('latin-1').split()
+    if len(parts) != 3:
+        raise HTTPError(400, 'invalid request line')
+    return parts[0], parts[1], parts[2]
+
+
+async def _read_line(reader: asyncio.StreamReader) -> bytes:
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        raise HTTPError(400, 'the request line or a header is too long')
+
+
+async def _read_headers(reader: asyncio.StreamReader) -> Mapping[str, str]:
+    headers = {}
+    while True:
+        line = await _read_line(reader)
+        if line in {b'\r\n', b'\n', b''}:
+            return headers
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+
+
+async def _read_body(headers: Mapping[str, str], reader: asyncio.StreamReader) -> bytes:
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise HTTPError(400, 'invalid content length')
+    if length > MAX_BODY_SIZE:
+        raise HTTPError(413, f'request bodies can be at most {MAX_BODY_SIZE} bytes')
+    if not length:
+        return b''
+    return await reader.readexactly(length)
+
+
+def _parse_query(query_string: str, body: bytes) -> Mapping[str, Any]:
+    parameters = parse_qs(query_string)
+    query: Dict[str, Any] = {
+        key: values[-1]
+        for key, values in parameters.items()
+    }
+    if 'curie' in parameters:
+        query['curies'] = parameters['curie']
+    if body:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            raise HTTPError(400, 'the request body is not valid JSON')
+        if not isinstance(data, dict):
+            raise HTTPError(400, 'the request body should be a JSON object')
+        query.update(data)
+    return query
+
+
+def _get_curies(query: Mapping[str, Any]) -> List[str]:
+    curies = query.get('curies')
+    if not isinstance(curies, list) or not all(isinstance(curie, str) for curie in curies):
+        raise ValueError('give a list of CURIEs as "curies"')
+    return curies
+
+
+def _get_flag(query: Mapping[str, Any], key: str) -> bool:
+    value = query.get(key, False)
+    if isinstance(value, bool):
+        return value
+    # from the query string
+    if value in {'true', '1'}:
+        return True
+    if value in {'false', '0', ''}:
+        return False
+    raise ValueError(f'give true or false as "{key}"')
+
+
+def _keep_alive(version: str, headers: Mapping[str, str]) -> bool:
+    connection = headers.get('connection', '').lower()
+    if version == 'HTTP/1.0':
+        return connection == 'keep-alive'
+    return connection != 'close'
+
+
+def _write_response(writer: asyncio.StreamWriter, status: int, response: Any, keep_alive: bool) -> None:
+    body = json.dumps(response, ensure_ascii=False).encode('utf-8')
+    writer.write(
+        f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+        f'Content-Type: application/json; charset=utf-8\r\n'
+        f'Content-Length: {len(body)}\r\n'
+        f'Connection: {"keep-alive" if keep_alive else "close"}\r\n'
+        f'\r\n'.encode('latin-1'),
+    )
+    writer.write(body)
+
+
+def run_server(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, index: Optional[MappingIndex] = None) -> None:
+    """Load the index and serve queries until interrupted.
+
+    :param host: The host to listen on
+    :param port: The port to listen on
+    :param index: The index to answer queries from. Defaults to :func:`compath_resources.index.get_index`.
+    """
+    server = MappingServer(index)
+
+    async def _main():
+        async with await server.start(host=host, port=port) as listener:
+            for socket in listener.sockets:
+                logger.info('serving %d mappings on http://%s:%d', len(server.index), *socket.getsockname()[:2])
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        pass
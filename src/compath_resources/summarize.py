@@ -22,6 +22,7 @@ def charts():
     """Generate the summary for ComPath."""
     sns.set_theme(style="darkgrid")
     df = get_df(include_reactome_hierarchy=False, include_decopath=True, include_special=True)
+    DATA_DIRECTORY.mkdir(parents=True, exist_ok=True)
     df.to_csv(DATA_DIRECTORY.joinpath('compath.tsv'), sep='\t', index=False)
 
     prefix_df = pd.concat([df['source prefix'], df['target prefix']]).to_frame()
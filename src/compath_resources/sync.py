@@ -5,61 +5,75 @@
 .. warning:: DO NOT RELY ON THIS CODE IN YOUR PACKAGE. USE :mod:`compath_resources.resources`.
 """
 
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import click
 import pandas as pd
 
 import compath_resources.resources as rsc
-from compath_resources.constants import ROOT
+from compath_resources.closure import write_closure
+from compath_resources.constants import EXACT_MATCH, PART_OF, ROOT
+from compath_resources.inference import write_inferred
+from compath_resources.resources.snapshot import _hash_file
+from compath_resources.utils import atomic_path
+from compath_resources.validate import validate_df
 
 _MAPPINGS_DIRECTORY = ROOT / 'mappings'
+_NEUROMMSIG_DIRECTORY = _MAPPINGS_DIRECTORY / 'neurommsig'
 
 
-def _fix_kegg_identifier(prefix, identifier) -> str:
-    if prefix == 'kegg.pathway' and identifier.startswith('path:'):
-        return identifier[len('path:'):]
-    return identifier
+#: The current relation for each relation in the mappings
+MAPPING_FIXES = {
+    'equivalentTo': EXACT_MATCH,
+    'isPartOf': PART_OF,
+    EXACT_MATCH: EXACT_MATCH,
+    PART_OF: PART_OF,
+}
 
 
-def _fix_kegg_prefix(prefix: str) -> str:
-    if prefix == 'kegg':
-        return 'kegg.pathway'
-    return prefix
-
-
-def _fix_mapping(mapping: str) -> str:
-    if mapping == 'equivalentTo':
-        return 'skos:exactMatch'
-    elif mapping == 'isPartOf':
-        return 'BFO:0000050'
-    elif mapping in {'skos:exactMatch', 'BFO:0000050'}:
-        return mapping
-    else:
-        raise ValueError(f'unknown mapping: {mapping}')
+#: The prefix of the identifiers in each column of the NeuroMMSig tables. The other columns have the
+#: identifiers of the same subgraphs in other diseases, like ``NeuroMMSig PD ID``.
+NEUROMMSIG_PREFIXES = {
+    'KEGG ID': 'kegg.pathway',
+    'Reactome ID': 'reactome',
+    'WikiPathways ID': 'wikipathways',
+}
 
 
 def _fix_kegg_entries(df: pd.DataFrame) -> None:
-    df['Source Resource'] = df['Source Resource'].map(_fix_kegg_prefix)
-    df['Target Resource'] = df['Target Resource'].map(_fix_kegg_prefix)
-    df['Source ID'] = [
-        _fix_kegg_identifier(prefix, identifier)
-        for prefix, identifier in df[['Source Resource', 'Source ID']].values
-    ]
-    df['Target ID'] = [
-        _fix_kegg_identifier(prefix, identifier)
-        for prefix, identifier in df[['Target Resource', 'Target ID']].values
-    ]
-    df['Mapping Type'] = df['Mapping Type'].map(_fix_mapping)
+    for side in ('Source', 'Target'):
+        prefixes = df[f'{side} Resource'].replace('kegg', 'kegg.pathway')
+        identifiers = df[f'{side} ID']
+        is_kegg = prefixes.eq('kegg.pathway')
+        strings = identifiers.astype(str)
+        has_path = is_kegg & strings.str.startswith('path:')
+        strings = strings.mask(has_path, strings.str[len('path:'):])
+        # identifiers without their organism, like 4062 or 04062 for hsa04062
+        is_number = is_kegg & strings.str.fullmatch(r'\d+')
+        strings = strings.mask(is_number, 'hsa' + strings.str.zfill(5))
+        df[f'{side} Resource'] = prefixes
+        df[f'{side} ID'] = identifiers.mask(has_path | is_number, strings)
+
+    mappings = df['Mapping Type'].map(MAPPING_FIXES)
+    unknown = df.loc[mappings.isna(), 'Mapping Type']
+    if len(unknown.index):
+        raise ValueError(f'unknown mapping: {unknown.iloc[0]}')
+    df['Mapping Type'] = mappings
 
 
 def _import_decopath_df() -> pd.DataFrame:
     """Get the decopath dataframe."""
-    excel_file = pd.ExcelFile(_MAPPINGS_DIRECTORY / 'decopath_ontology.xlsx', engine='openpyxl')
-    dfs = []
-    for sheet_name in excel_file.sheet_names:
-        df = excel_file.parse(sheet_name, usecols=list(range(7)))
-        df = df.dropna()
-        _fix_kegg_entries(df)
-        dfs.append(df)
-    return pd.concat(dfs)
+    sheets = pd.read_excel(
+        _MAPPINGS_DIRECTORY / 'decopath_ontology.xlsx', sheet_name=None, usecols=list(range(7)), engine='openpyxl',
+    )
+    df = pd.concat([sheet.dropna() for sheet in sheets.values()])
+    _fix_kegg_entries(df)
+    return df
 
 
 def _import_df(path, sep: str = ',', **kwargs):
@@ -108,17 +122,289 @@ def _import_reactome_hierarchy_df() -> pd.DataFrame:
     return _import_df(_MAPPINGS_DIRECTORY / 'reactome_hierarchy.tsv', sep='\t')
 
 
-def _main():
+#: The NeuroMMSig tables, which have the names of the subgraphs of each disease
+NEUROMMSIG_TABLES = (
+    _NEUROMMSIG_DIRECTORY / 'ad_neurommsig_pathway_dbs.tsv',
+    _NEUROMMSIG_DIRECTORY / 'pd_neurommsig_pathway_dbs.tsv',
+)
+
+#: The files the names of the targets of the NeuroMMSig mappings are looked up in, in order of preference.
+#: The resource files are the outputs of other importers, so the NeuroMMSig importers run after them.
+NEUROMMSIG_NAME_PATHS = (
+    rsc.KEGG_WIKIPATHWAYS_PATH,
+    rsc.KEGG_REACTOME_PATH,
+    rsc.WIKIPATHWAYS_REACTOME_PATH,
+    rsc.PATHBANK_KEGG_PATH,
+    rsc.PATHBANK_REACTOME_PATH,
+    rsc.PATHBANK_WIKIPATHWAYS_PATH,
+    rsc.SPECIAL_MAPPINGS_PATH,
+    rsc.REACTOME_HIERARCHICAL_MAPPINGS_PATH,
+    rsc.DECOPATH_PATH,
+    *NEUROMMSIG_TABLES,
+)
+
+
+def _get_names(paths: Iterable[Path]) -> pd.Series:
+    """Get the names of the pathways in resource files and of the subgraphs in NeuroMMSig tables, by CURIE.
+
+    If a pathway has several names, the first one is kept.
+    """
+    parts = []
+    for path in paths:
+        df = pd.read_csv(path, sep='\t', dtype=str)
+        if 'NeuroMMSig ID' in df.columns:
+            parts.append(pd.Series(df['NeuroMMSig Name'].to_numpy(), index='neurommsig:' + df['NeuroMMSig ID']))
+            continue
+        for side in ('Source', 'Target'):
+            curies = df[f'{side} Resource'] + ':' + df[f'{side} ID']
+            parts.append(pd.Series(df[f'{side} Name'].to_numpy(), index=curies))
+    names = pd.concat(parts)
+    return names[~names.index.duplicated()]
+
+
+def _import_neurommsig_df(path: Path, name_paths: Sequence[Path] = NEUROMMSIG_NAME_PATHS) -> pd.DataFrame:
+    """Get the mappings of the NeuroMMSig subgraphs from a table with a column of identifiers for each database.
+
+    Cells with several identifiers separate them with ``|``. The names of the targets are looked up in the
+    given files, and are missing if they aren't in any of them.
+
+    :param path: The NeuroMMSig table
+    :param name_paths: The resource files and NeuroMMSig tables to look up the names of the targets in
+    """
+    wide = pd.read_csv(path, sep='\t', dtype=str)
+    df = wide.melt(
+        id_vars=['NeuroMMSig ID', 'NeuroMMSig Name'], var_name='column', value_name='Target ID', ignore_index=False,
+    )
+    df['Target ID'] = df['Target ID'].str.split('|')
+    # keep the mappings of each subgraph together, in the order of the columns
+    df = df.explode('Target ID').dropna(subset=['Target ID']).sort_index(kind='stable')
+    df = pd.DataFrame({
+        'Source Resource': 'neurommsig',
+        'Source ID': df['NeuroMMSig ID'].to_numpy(),
+        'Source Name': df['NeuroMMSig Name'].to_numpy(),
+        'Mapping Type': 'equivalentTo',
+        'Target Resource': df['column'].map(NEUROMMSIG_PREFIXES).fillna('neurommsig').to_numpy(),
+        'Target ID': df['Target ID'].str.strip().to_numpy(),
+    })
+    _fix_kegg_entries(df)
+    df['Target Name'] = (df['Target Resource'] + ':' + df['Target ID']).map(_get_names(name_paths))
+    return df
+
+
+def _import_neurommsig_ad_df(*name_paths: Path) -> pd.DataFrame:
+    """Get the mappings of the NeuroMMSig Alzheimer's disease subgraphs."""
+    return _import_neurommsig_df(NEUROMMSIG_TABLES[0], name_paths or NEUROMMSIG_NAME_PATHS)
+
+
+def _import_neurommsig_pd_df(*name_paths: Path) -> pd.DataFrame:
+    """Get the mappings of the NeuroMMSig Parkinson's disease subgraphs."""
+    return _import_neurommsig_df(NEUROMMSIG_TABLES[1], name_paths or NEUROMMSIG_NAME_PATHS)
+
+
+class Importer(NamedTuple):
+    """An importer of a file in the mappings folder."""
+
+    #: The function that imports the mappings
+    function: Callable[[], pd.DataFrame]
+    #: The file in the mappings folder it reads
+    source: Path
+    #: The resource file it writes
+    output: Path
+    #: Other files the function reads, which are passed to it. If they're the outputs of other importers,
+    #: it runs after them. It runs again when any of them changed since it last ran.
+    dependencies: Tuple[Path, ...] = ()
+
+
+#: The importers, slowest first
+IMPORTERS = [
+    Importer(_import_decopath_df, _MAPPINGS_DIRECTORY / 'decopath_ontology.xlsx', rsc.DECOPATH_PATH),
+    Importer(
+        _import_reactome_hierarchy_df, _MAPPINGS_DIRECTORY / 'reactome_hierarchy.tsv',
+        rsc.REACTOME_HIERARCHICAL_MAPPINGS_PATH,
+    ),
+    Importer(_import_kegg_wikipathways_df, _MAPPINGS_DIRECTORY / 'kegg_wikipathways.csv', rsc.KEGG_WIKIPATHWAYS_PATH),
+    Importer(_import_kegg_reactome_df, _MAPPINGS_DIRECTORY / 'kegg_reactome.csv', rsc.KEGG_REACTOME_PATH),
+    Importer(
+        _import_wikipathways_reactome_df, _MAPPINGS_DIRECTORY / 'wikipathways_reactome.csv',
+        rsc.WIKIPATHWAYS_REACTOME_PATH,
+    ),
+    Importer(_import_pathbank_kegg_df, _MAPPINGS_DIRECTORY / 'pathbank_kegg.csv', rsc.PATHBANK_KEGG_PATH),
+    Importer(_import_pathbank_reactome_df, _MAPPINGS_DIRECTORY / 'pathbank_reactome.csv', rsc.PATHBANK_REACTOME_PATH),
+    Importer(
+        _import_pathbank_wikipathways_df, _MAPPINGS_DIRECTORY / 'pathbank_wikipathways.csv',
+        rsc.PATHBANK_WIKIPATHWAYS_PATH,
+    ),
+    Importer(_import_special_mappings_df, _MAPPINGS_DIRECTORY / 'special_mappings.csv', rsc.SPECIAL_MAPPINGS_PATH),
+    Importer(_import_neurommsig_ad_df, NEUROMMSIG_TABLES[0], rsc.NEUROMMSIG_AD_PATH, NEUROMMSIG_NAME_PATHS),
+    Importer(_import_neurommsig_pd_df, NEUROMMSIG_TABLES[1], rsc.NEUROMMSIG_PD_PATH, NEUROMMSIG_NAME_PATHS),
+]
+
+#: The manifest of the hashes of each importer's source and output from the last time it ran
+MANIFEST_PATH = rsc.RESOURCES / 'sync.json'
+
+
+class SyncResult(NamedTuple):
+    """The result of syncing one resource file."""
+
+    #: The name of the resource file
+    name: str
+    #: The number of mappings in the resource file
+    rows: int
+    #: The number of seconds it took to import and write the mappings
+    seconds: float
+    #: Whether the resource file was up-to-date, so it wasn't imported again
+    skipped: bool = False
+
+
+def _read_manifest() -> Dict[str, Dict[str, Any]]:
+    if not MANIFEST_PATH.exists():
+        return {}
+    return json.loads(MANIFEST_PATH.read_text(encoding='utf-8'))
+
+
+def _write_manifest(manifest: Mapping[str, Mapping[str, Any]]) -> None:
+    with atomic_path(MANIFEST_PATH) as temporary_path:
+        temporary_path.write_text(json.dumps(manifest, indent=2, sort_keys=True) + '\n', encoding='utf-8')
+
+
+def _hash_dependencies(importer: Importer) -> Dict[str, str]:
+    return {path.name: _hash_file(path) for path in importer.dependencies}
+
+
+def _get_manifest_entry(importer: Importer, rows: int) -> Dict[str, Any]:
+    rv = dict(source=_hash_file(importer.source), output=_hash_file(importer.output), rows=rows)
+    if importer.dependencies:
+        rv['dependencies'] = _hash_dependencies(importer)
+    return rv
+
+
+def _is_synced(importer: Importer, entry: Optional[Mapping[str, Any]]) -> bool:
+    """Check if the importer's source, output, and dependencies have the hashes they had the last time it ran."""
+    if entry is None or not importer.output.exists():
+        return False
+    return all((
+        entry['source'] == _hash_file(importer.source),
+        entry['output'] == _hash_file(importer.output),
+        entry.get('dependencies', {}) == _hash_dependencies(importer),
+    ))
+
+
+def check() -> List[str]:
+    """Get the names of the resource files that are out of sync with their sources, using the manifest.
+
+    This only hashes files, so it's much faster than importing the mappings again.
+    """
+    manifest = _read_manifest()
+    return [
+        importer.output.name
+        for importer in IMPORTERS
+        if not _is_synced(importer, manifest.get(importer.output.name))
+    ]
+
+
+def _sync_resource(importer: Callable[..., pd.DataFrame], path: Path, dependencies: Sequence[Path] = ()) -> SyncResult:
+    start = time.time()
+    df = importer(*dependencies)
+    report = validate_df(df, resource=path.name)
+    if len(report.index):
+        raise ValueError(f'invalid mappings for {path.name}:\n{report.to_string()}')
+    with atomic_path(path) as temporary_path:
+        df.to_csv(temporary_path, sep='\t', index=False)
+    return SyncResult(name=path.name, rows=len(df.index), seconds=time.time() - start)
+
+
+def _get_stages(importers: Sequence[Importer]) -> List[List[Importer]]:
+    """Group the importers into stages that only depend on the outputs of importers in earlier stages."""
+    outputs = {importer.output for importer in importers}
+    done = set()
+    rv = []
+    remaining = list(importers)
+    while remaining:
+        stage = [
+            importer
+            for importer in remaining
+            if all(path not in outputs or path in done for path in importer.dependencies)
+        ]
+        if not stage:
+            raise ValueError(f'cyclic dependencies between {", ".join(i.output.name for i in remaining)}')
+        rv.append(stage)
+        done.update(importer.output for importer in stage)
+        remaining = [importer for importer in remaining if importer not in stage]
+    return rv
+
+
+def _run(importers: Sequence[Importer], workers: Optional[int]) -> List[SyncResult]:
+    if workers == 1 or len(importers) <= 1:
+        return [
+            _sync_resource(importer.function, importer.output, importer.dependencies)
+            for importer in importers
+        ]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_sync_resource, importer.function, importer.output, importer.dependencies)
+            for importer in importers
+        ]
+        return [future.result() for future in futures]
+
+
+def sync(workers: Optional[int] = None, force: bool = False) -> List[SyncResult]:
+    """Import the mappings that changed into the package, then write the snapshot, closure, and inferred mappings.
+
+    Importers that read the outputs of other importers run after them, so they see the new outputs.
+
+    :param workers: The number of processes to run the importers in. If 1, they are run in this process.
+    :param force: If true, import all mappings, even if their sources didn't change since the last sync
+    :return: The results of each resource file, in the order of :data:`IMPORTERS`
+    """
+    manifest = _read_manifest()
+    results: Dict[str, SyncResult] = {}
+    changed = False
+    for stage in _get_stages(IMPORTERS):
+        todo = []
+        for importer in stage:
+            entry = manifest.get(importer.output.name)
+            if not force and _is_synced(importer, entry):
+                results[importer.output.name] = SyncResult(
+                    name=importer.output.name, rows=entry['rows'], seconds=0.0, skipped=True,
+                )
+            else:
+                todo.append(importer)
+
+        for importer, result in zip(todo, _run(todo, workers)):
+            results[result.name] = result
+            manifest[result.name] = _get_manifest_entry(importer, result.rows)
+        changed = changed or bool(todo)
+
+    if changed:
+        rsc.write_snapshot()
+        rsc.clear_cache()
+        write_closure()
+        write_inferred()
+        _write_manifest(manifest)
+
+    return [results[importer.output.name] for importer in IMPORTERS]
+
+
+@click.command()
+@click.option('--workers', type=int, help='Number of worker processes. Defaults to the number of CPUs.')
+@click.option('--force', is_flag=True, help='Import all mappings, even if their sources did not change')
+@click.option('--check', 'check_only', is_flag=True, help='Only check if the resources are in sync with the manifest')
+def _main(workers: Optional[int], force: bool, check_only: bool):
     """Import all mappings into the package."""
-    _import_decopath_df().to_csv(rsc.DECOPATH_PATH, sep='\t', index=False)
-    _import_kegg_wikipathways_df().to_csv(rsc.KEGG_WIKIPATHWAYS_PATH, sep='\t', index=False)
-    _import_kegg_reactome_df().to_csv(rsc.KEGG_REACTOME_PATH, sep='\t', index=False)
-    _import_wikipathways_reactome_df().to_csv(rsc.WIKIPATHWAYS_REACTOME_PATH, sep='\t', index=False)
-    _import_pathbank_kegg_df().to_csv(rsc.PATHBANK_KEGG_PATH, sep='\t', index=False)
-    _import_pathbank_reactome_df().to_csv(rsc.PATHBANK_REACTOME_PATH, sep='\t', index=False)
-    _import_pathbank_wikipathways_df().to_csv(rsc.PATHBANK_WIKIPATHWAYS_PATH, sep='\t', index=False)
-    _import_special_mappings_df().to_csv(rsc.SPECIAL_MAPPINGS_PATH, sep='\t', index=False)
-    _import_reactome_hierarchy_df().to_csv(rsc.REACTOME_HIERARCHICAL_MAPPINGS_PATH, sep='\t', index=False)
+    if check_only:
+        names = check()
+        if names:
+            click.echo(f'out of sync: {", ".join(names)}. run `python -m compath_resources.sync`', err=True)
+            sys.exit(1)
+        click.echo('resources are in sync')
+        return
+
+    start = time.time()
+    results = sync(workers=workers, force=force)
+    for result in results:
+        status = 'skipped' if result.skipped else f'{result.seconds:>7.2f} s'
+        click.echo(f'{result.name:<32} {result.rows:>6} rows {status:>9}')
+    click.echo(f'{"total":<32} {sum(result.rows for result in results):>6} rows {time.time() - start:>7.2f} s')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+"""Translate columns of pathway identifiers in large tables through the equivalence mappings.
+
+Tables like pathway enrichment results are read in chunks, so their size isn't limited by the memory.
+The CURIEs in a chosen column are translated with a hash table built once from the equivalence
+clusters of :func:`compath_resources.closure.get_closure`, then each chunk is written as soon as it's
+translated. Run it with ``compath-resources translate``:
+
+.. code-block:: sh
+
+    $ compath-resources translate -i enrichment.tsv -c pathway --prefix reactome -o enrichment_reactome.tsv
+
+Pathways are translated either to their equivalents with a given prefix, or to the representative of
+their equivalence cluster, so the same pathway gets the same CURIE whichever database it came from.
+"""
+
+import logging
+import time
+from typing import Mapping, NamedTuple, Optional, TextIO
+
+import pandas as pd
+
+from .closure import Closure, get_closure
+
+__all__ = [
+    'TranslationResult',
+    'get_translation_table',
+    'translate_df',
+    'translate_file',
+]
+
+logger = logging.getLogger(__name__)
+
+#: The number of rows read and translated at once
+DEFAULT_CHUNK_SIZE = 100_000
+
+#: The delimiter between several equivalents of a pathway with the same prefix
+DELIMITER = '|'
+
+
+class TranslationResult(NamedTuple):
+    """The number of rows translated from a file and how long it took."""
+
+    #: The number of rows
+    rows: int
+    #: The number of rows whose pathway could be translated
+    translated: int
+    #: The number of seconds it took to read, translate, and write the rows
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        """The throughput of the translation."""
+        return self.rows / self.seconds if self.seconds else float('inf')
+
+
+def get_translation_table(
+    prefix: Optional[str] = None,
+    representative: bool = False,
+    input_prefix: Optional[str] = None,
+    closure: Optional[Closure] = None,
+) -> Mapping[str, str]:
+    """Get a table from the CURIE of each pathway to its translation.
+
+    :param prefix: If given, translate pathways to their equivalents with this prefix. Otherwise,
+        translate them to all of their equivalents. Several equivalents are joined with :data:`DELIMITER`.
+    :param representative: If true, translate pathways to the representative of their equivalence cluster
+        instead. Pathways in mappings but without equivalents are their own representative.
+    :param input_prefix: If given, the table is keyed on the identifiers of the pathways with this prefix,
+        for translating columns of identifiers instead of CURIEs
+    :param closure: The closure of the mappings. Defaults to :func:`compath_resources.closure.get_closure`.
+    :return: A dictionary from CURIEs, or identifiers if ``input_prefix`` is given, to translations.
+        Pathways without a translation, including all pathways that aren't in any mapping, are left out.
+    :raises ValueError: If both ``prefix`` and ``representative`` are given
+    """
+    if prefix is not None and representative:
+        raise ValueError('translate either to a prefix or to the representatives of the clusters, not both')
+    if closure is None:
+        closure = get_closure()
+
+    curies = [f'{node_prefix}:{identifier}' for node_prefix, identifier in closure.nodes]
+    rv = {}
+    for members in closure.members.values():
+        if len(members) < 2 and not representative:
+            continue
+        for member in members:
+            node_prefix, identifier = closure.nodes[member]
+            if input_prefix is not None and node_prefix != input_prefix:
+                continue
+            key = curies[member] if input_prefix is None else identifier
+            if representative:
+                rv[key] = curies[closure.clusters[member]]
+                continue
+            translations = sorted(
+                curies[other]
+                for other in members
+                if other != member and (prefix is None or closure.nodes[other][0] == prefix)
+            )
+            if translations:
+                rv[key] = DELIMITER.join(translations)
+    return rv
+
+
+def translate_df(
+    df: pd.DataFrame,
+    column: str,
+    table: Mapping[str, str],
+    output_column: Optional[str] = None,
+) -> int:
+    """Add the translations of a column to a dataframe.
+
+    :param df: A dataframe, which is changed in place
+    :param column: The column with the CURIEs or identifiers to translate
+    :param table: A table from :func:`get_translation_table`
+    :param output_column: The column the translations are written to. Defaults to ``{column}_translated``.
+        Values without a translation are left empty.
+    :return: The number of rows that were translated
+    """
+    if column not in df.columns:
+        raise KeyError(f'missing column: {column}')
+    translations = df[column].map(table)
+    df[output_column or f'{column}_translated'] = translations.fillna('')
+    return int(translations.notna().sum())
+
+
+def translate_file(
+    input_file: TextIO,
+    output_file: TextIO,
+    column: str,
+    prefix: Optional[str] = None,
+    representative: bool = False,
+    input_prefix: Optional[str] = None,
+    output_column: Optional[str] = None,
+    sep: str = '\t',
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> TranslationResult:
+    """Translate a column of a table, reading and writing it one chunk at a time.
+
+    :param input_file: The table to read, with a header
+    :param output_file: The file the table is written to, with the translations in an extra column
+    :param column: The column with the CURIEs or identifiers to translate
+    :param prefix: If given, translate pathways to their equivalents with this prefix
+    :param representative: If true, translate pathways to the representative of their equivalence cluster
+    :param input_prefix: If given, the column has identifiers with this prefix instead of CURIEs
+    :param output_column: The column the translations are written to. Defaults to ``{column}_translated``.
+    :param sep: The delimiter of the table
+    :param chunk_size: The number of rows read and translated at once, which bounds the memory used
+    """
+    start = time.time()
+    table = get_translation_table(prefix=prefix, representative=representative, input_prefix=input_prefix)
+    logger.info('built a table of %d translations in %.2f seconds', len(table), time.time() - start)
+
+    rows = translated = 0
+    chunks = pd.read_csv(
+        input_file, sep=sep, dtype=str, keep_default_na=False, chunksize=chunk_size, na_filter=False,
+    )
+    # the header is written on its own, so it's there even if the table has no rows
+    header = chunks.get_chunk(0)
+    translate_df(header, column, table, output_column=output_column)
+    header.to_csv(output_file, sep=sep, index=False)
+    for chunk in chunks:
+        translated += translate_df(chunk, column, table, output_column=output_column)
+        chunk.to_csv(output_file, sep=sep, index=False, header=False)
+        rows += len(chunk.index)
+        logger.debug('translated %d rows', rows)
+
+    return TranslationResult(rows=rows, translated=translated, seconds=time.time() - start)
@@ -1,79 +1,220 @@
 # -*- coding: utf-8 -*-
 
-"""Upload the ComPath Mappings to NDEx.
+"""Export the ComPath Mappings as CX and upload them to NDEx.
+
+Building and uploading are separate steps. The CX is written to a local file, which doesn't need
+:mod:`ndex2` and can be checked or diffed offline, then the file is posted to NDEx as is:
+
+.. code-block:: sh
+
+    $ python -m compath_resources.upload_ndex export --output compath.cx
+    $ python -m compath_resources.upload_ndex upload --input compath.cx
+
+Each pathway is a single node, no matter how many mappings it appears in, and each mapping is an edge.
 
 .. seealso:: http://public.ndexbio.org/v2/network/551a8489-5a65-11eb-9e72-0ac135e8bacf
 """
 
+import json
+from pathlib import Path
+from typing import Any, Mapping, Optional, TextIO, Tuple
+
 import bioregistry
 import click
+import numpy as np
+import pandas as pd
 import pystow
-from tqdm import tqdm
+from networkx.utils import open_file
 
 from compath_resources import get_df
-from compath_resources.utils import get_git_hash
+from compath_resources.utils import atomic_path, get_git_hash
+
+__all__ = [
+    'COMPATH_NDEX_UUID',
+    'get_cx_tables',
+    'write_cx',
+    'upload_cx',
+]
 
 COMPATH_NDEX_UUID = '551a8489-5a65-11eb-9e72-0ac135e8bacf'
 
+#: The default file the CX is written to and uploaded from
+DEFAULT_CX_PATH = 'compath.cx'
 
-@click.command()
-@click.option('--username')
-@click.option('--password')
-def ndex(username, password):
-    """Upload to NDEx."""
-    try:
-        from ndex2 import NiceCXBuilder
-    except ImportError:
-        click.secho('Need to `pip install ndex2` before uploading to NDEx', fg='red')
-        return
+AUTHORS = [
+    'Daniel Domingo-Fernández',
+    'Carlos Bobis-Álvarez',
+    'Josep Marín-Llaó',
+    'Yojana Gadiya',
+    'Sarah Mubeen',
+    'Charles Tapley Hoyt',
+]
 
-    cx = NiceCXBuilder()
-    cx.set_name('ComPath')
-    cx.add_network_attribute('description', 'Manually curated mappings between pathways.')
-    cx.add_network_attribute('reference', 'https://github.com/compath/compath-resources')
-    cx.add_network_attribute('rights', 'Waiver-No rights reserved (CC0)')
+#: The value NDEx expects in the first aspect of every CX document
+NUMBER_VERIFICATION = 281474976710655
 
+
+def _get_mappings() -> pd.DataFrame:
+    return get_df(include_special=True, include_decopath=True, include_reactome_hierarchy=True)
+
+
+def get_cx_tables(df: Optional[pd.DataFrame] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Get the unique nodes and edges of the CX network.
+
+    :param df: The mappings, in the format of :func:`compath_resources.get_df`. Defaults to all of them,
+        including the special mappings, DecoPath, and the Reactome hierarchy.
+    :return: A node table with the columns ``@id``, ``n`` (the CURIE), and ``r`` (the name), and an edge table
+        with the columns ``@id``, ``s`` and ``t`` (the ids of the source and target nodes), and ``i`` (the relation).
+        Nodes are numbered in the order they first appear in the mappings.
+    """
+    if df is None:
+        df = _get_mappings()
+
+    sources = df['source prefix'].astype(str) + ':' + df['source identifier'].astype(str)
+    targets = df['target prefix'].astype(str) + ':' + df['target identifier'].astype(str)
+
+    # interleave the sources and targets so nodes are numbered in the order of the rows
+    curies = np.column_stack([sources.to_numpy(), targets.to_numpy()]).ravel()
+    names = np.column_stack([df['source name'].to_numpy(), df['target name'].to_numpy()]).ravel()
+    codes, uniques = pd.factorize(curies)
+
+    first = np.unique(codes, return_index=True)[1]
+    nodes = pd.DataFrame({
+        '@id': np.arange(len(uniques)),
+        'n': uniques,
+        'r': names[first],
+    })
+
+    codes = codes.reshape(-1, 2)
+    edges = pd.DataFrame({
+        's': codes[:, 0],
+        't': codes[:, 1],
+        'i': df['relation'].to_numpy(),
+    }).drop_duplicates(ignore_index=True)
+    edges.insert(0, '@id', np.arange(len(edges.index)))
+    return nodes, edges
+
+
+def _get_context(nodes: pd.DataFrame) -> Mapping[str, str]:
     context = {'orcid': 'https://identifiers.org/orcid:'}
-    mappings = get_df(include_special=True, include_decopath=True, include_reactome_hierarchy=True)
-    for _, mapping in mappings.iterrows():
-        for prefix in (mapping['Source Resource'], mapping['Target Resource']):
-            if prefix in {'decopath', 'pathbank'}:
-                continue
-            context[prefix] = bioregistry.get_miriam_url_prefix(prefix)
-    cx.set_context(context)
-
-    cx.add_network_attribute('version', get_git_hash())
-    cx.add_network_attribute('author', [
-        'Daniel Domingo-Fernández',
-        'Carlos Bobis-Álvarez',
-        'Josep Marín-Llaó',
-        'Yojana Gadiya',
-        'Sarah Mubeen',
-        'Charles Tapley Hoyt',
-    ], type='list_of_string')
-
-    for _, mapping in tqdm(mappings.iterrows(), desc='Loading NiceCXBuilder'):
-        source = cx.add_node(
-            represents=mapping['Source Name'],
-            name=f'{mapping["Source Resource"]}:{mapping["Source ID"]}',
-        )
-        target = cx.add_node(
-            represents=mapping['Target Name'],
-            name=f'{mapping["Target Resource"]}:{mapping["Target ID"]}',
-        )
-        cx.add_edge(
-            source=source,
-            target=target,
-            interaction=mapping['Mapping Type'],
+    for prefix in sorted(nodes['n'].str.split(':', n=1).str[0].unique()):
+        uri_prefix = bioregistry.get_miriam_uri_prefix(prefix)
+        if uri_prefix is not None:
+            context[prefix] = uri_prefix
+    return context
+
+
+def _get_network_attributes() -> Any:
+    return [
+        {'n': 'name', 'v': 'ComPath', 'd': 'string'},
+        {'n': 'description', 'v': 'Manually curated mappings between pathways.'},
+        {'n': 'reference', 'v': 'https://github.com/compath/compath-resources'},
+        {'n': 'rights', 'v': 'Waiver-No rights reserved (CC0)'},
+        {'n': 'version', 'v': get_git_hash()},
+        {'n': 'author', 'v': AUTHORS, 'd': 'list_of_string'},
+    ]
+
+
+def _write_aspect(file: TextIO, name: str, elements) -> None:
+    file.write(f',\n{{"{name}": [')
+    for i, element in enumerate(elements):
+        if i:
+            file.write(',\n')
+        file.write(json.dumps(element, ensure_ascii=False))
+    file.write(']}')
+
+
+@open_file(0, mode='w')
+def write_cx(path, df: Optional[pd.DataFrame] = None) -> None:
+    """Write the ComPath mappings as CX, one node and edge at a time.
+
+    :param path: A path or file-like
+    :param df: The mappings, in the format of :func:`compath_resources.get_df`. Defaults to the ones
+        used by :func:`get_cx_tables`.
+    """
+    file: TextIO = path
+    nodes, edges = get_cx_tables(df)
+    network_attributes = _get_network_attributes()
+
+    file.write(f'[{{"numberVerification": [{{"longNumber": {NUMBER_VERIFICATION}}}]}}')
+    _write_aspect(file, 'metaData', [
+        dict(name='@context', elementCount=1, version='1.0', consistencyGroup=1, properties=[]),
+        dict(name='networkAttributes', elementCount=len(network_attributes), version='1.0', consistencyGroup=1,
+             properties=[]),
+        *(
+            # the id counter is the largest id in the aspect
+            dict(name=name, elementCount=len(table.index), idCounter=max(len(table.index) - 1, 0), version='1.0',
+                 consistencyGroup=1, properties=[])
+            for name, table in (('nodes', nodes), ('edges', edges))
+        ),
+    ])
+    _write_aspect(file, '@context', [_get_context(nodes)])
+    _write_aspect(file, 'networkAttributes', network_attributes)
+    _write_aspect(file, 'nodes', (
+        {'@id': node_id, 'n': curie, 'r': name} if isinstance(name, str) else {'@id': node_id, 'n': curie}
+        for node_id, curie, name in zip(nodes['@id'].tolist(), nodes['n'].tolist(), nodes['r'].tolist())
+    ))
+    _write_aspect(file, 'edges', (
+        {'@id': edge_id, 's': source, 't': target, 'i': relation}
+        for edge_id, source, target, relation in zip(
+            edges['@id'].tolist(), edges['s'].tolist(), edges['t'].tolist(), edges['i'].tolist(),
         )
+    ))
+    _write_aspect(file, 'status', [{'error': '', 'success': True}])
+    file.write(']\n')
+
 
-    nice_cx = cx.get_nice_cx()
-    nice_cx.update_to(
-        uuid=COMPATH_NDEX_UUID,
-        server=pystow.get_config('ndex', 'server', default='http://public.ndexbio.org'),
+def upload_cx(
+    path,
+    uuid: str = COMPATH_NDEX_UUID,
+    username: Optional[str] = None,
+    password: Optional[str] = None,
+) -> None:
+    """Replace the network on NDEx with a CX file written by :func:`write_cx`.
+
+    :param path: The path to the CX file
+    :param uuid: The UUID of the NDEx network to update
+    :param username: The NDEx username. Defaults to the ``ndex`` ``username`` config with :mod:`pystow`.
+    :param password: The NDEx password. Defaults to the ``ndex`` ``password`` config with :mod:`pystow`.
+    """
+    from ndex2.client import Ndex2
+
+    client = Ndex2(
+        host=pystow.get_config('ndex', 'server', default='http://public.ndexbio.org'),
         username=pystow.get_config('ndex', 'username', passthrough=username),
         password=pystow.get_config('ndex', 'password', passthrough=password),
     )
+    with Path(path).open('rb') as file:
+        client.update_cx_network(file, uuid)
+
+
+@click.group()
+def ndex():
+    """Export to and upload to NDEx."""
+
+
+@ndex.command()
+@click.option('-o', '--output', type=click.Path(dir_okay=False), default=DEFAULT_CX_PATH, show_default=True)
+def export(output):
+    """Write the CX to a local file."""
+    with atomic_path(output) as temporary_path:
+        write_cx(temporary_path)
+    click.echo(f'wrote {output}')
+
+
+@ndex.command()
+@click.option('-i', '--input', 'path', type=click.Path(exists=True, dir_okay=False), default=DEFAULT_CX_PATH,
+              show_default=True)
+@click.option('--username')
+@click.option('--password')
+def upload(path, username, password):
+    """Upload a CX file to NDEx."""
+    try:
+        import ndex2  # noqa: F401
+    except ImportError:
+        click.secho('Need to `pip install ndex2` before uploading to NDEx', fg='red')
+        return
+    upload_cx(path, username=username, password=password)
 
 
 if __name__ == '__main__':
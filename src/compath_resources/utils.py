@@ -3,8 +3,13 @@
 """Utilities."""
 
 import os
-from subprocess import CalledProcessError, check_output  # noqa: S404
-from typing import Optional
+import stat
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from subprocess import CalledProcessError, check_output, run  # noqa: S404
+from typing import Iterator, Mapping, Optional, Union
 
 
 def get_git_hash() -> Optional[str]:
@@ -31,3 +36,57 @@ def _git(*args: str) -> Optional[str]:
             return
         else:
             return ret.strip().decode('utf-8')
+
+
+def get_import_times(statement: str) -> Mapping[str, int]:
+    """Get the cumulative import time in microseconds of each module imported by running the statement.
+
+    The statement is run in a new interpreter with ``python -X importtime``, so the modules that
+    are already imported in this one are counted too.
+    """
+    result = run(  # noqa: S603
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rv = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rv[name.strip()] = int(cumulative)
+    return rv
+
+
+@contextmanager
+def atomic_path(path: Union[str, Path]) -> Iterator[Path]:
+    """Get a temporary path to write to, which replaces the given path if no error is raised.
+
+    The temporary file is in the same directory and has the same suffix, so readers never see a
+    half-written file and writers that add missing suffixes (like :func:`numpy.save`) use it as is.
+    The file keeps the mode of the file it replaces, or gets the default mode for new files, since
+    temporary files are only readable by their owner.
+    """
+    path = Path(path)
+    fd, temporary_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.stem}.', suffix=path.suffix)
+    os.close(fd)
+    try:
+        yield Path(temporary_path)
+        os.chmod(temporary_path, _get_mode(path))
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def _get_mode(path: Path) -> int:
+    """Get the mode of a file, or the mode a new file would get from the umask if it doesn't exist."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        pass
+    # the umask can only be read by setting it
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
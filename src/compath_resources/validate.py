@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+"""Validate the prefixes and identifiers in ComPath mappings against the Bioregistry.
+
+Identifiers are grouped by prefix, so the Bioregistry is consulted and each prefix's MIRIAM pattern
+is applied once per prefix instead of once per row.
+
+.. code-block:: python
+
+    from compath_resources.validate import validate_resources
+
+    report = validate_resources()
+    assert report.empty, report.to_string()
+"""
+
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+import bioregistry
+import pandas as pd
+
+from .resources import RESOURCE_PATHS, _read_resource
+
+__all__ = [
+    'REPORT_COLUMNS',
+    'validate_df',
+    'validate_resources',
+]
+
+#: The columns of a validation report
+REPORT_COLUMNS = ['resource', 'row', 'side', 'prefix', 'identifier', 'problem']
+
+#: The prefix and identifier columns of each side of a mapping, in the resource files and in
+#: :func:`compath_resources.get_df`
+_SIDES = {
+    'source': [('Source Resource', 'Source ID'), ('source prefix', 'source identifier')],
+    'target': [('Target Resource', 'Target ID'), ('target prefix', 'target identifier')],
+}
+
+#: Prefixes that are valid in the Bioregistry but should not be used in mappings, and what to use instead
+DISALLOWED_PREFIXES = {
+    'kegg': 'kegg.pathway',
+}
+
+#: Prefixes that are allowed even though they're not in the Bioregistry. DecoPath and NeuroMMSig have
+#: no registered resource, so their identifiers are only checked for being present.
+UNREGISTERED_PREFIXES = {
+    'decopath',
+    'neurommsig',
+}
+
+
+@lru_cache(maxsize=None)
+def _get_prefix_problem(prefix: str) -> Optional[str]:
+    """Get the problem with a prefix, if there is one."""
+    if not isinstance(prefix, str):
+        return 'missing prefix'
+    if prefix in DISALLOWED_PREFIXES:
+        return f'use {DISALLOWED_PREFIXES[prefix]} instead of {prefix}'
+    if prefix in UNREGISTERED_PREFIXES:
+        return None
+    normalized_prefix = bioregistry.normalize_prefix(prefix)
+    if normalized_prefix is None:
+        return 'prefix is not in the Bioregistry'
+    if normalized_prefix != prefix:
+        return f'use {normalized_prefix} instead of {prefix}'
+    if bioregistry.is_deprecated(prefix):
+        return 'prefix is deprecated'
+    return None
+
+
+@lru_cache(maxsize=None)
+def _get_pattern(prefix: str) -> Optional['re.Pattern[str]']:
+    """Get the compiled MIRIAM pattern for identifiers with the given prefix, if it has one."""
+    resource = bioregistry.get_resource(prefix)
+    if resource is None or not resource.miriam:
+        return None
+    pattern = resource.miriam.get('pattern')
+    if pattern is None:
+        return None
+    return re.compile(pattern)
+
+
+def _get_sides(df: pd.DataFrame) -> Iterable[Tuple[str, str, str]]:
+    for side, candidates in _SIDES.items():
+        for prefix_column, identifier_column in candidates:
+            if prefix_column in df.columns and identifier_column in df.columns:
+                yield side, prefix_column, identifier_column
+                break
+        else:
+            raise ValueError(f'missing {side} prefix and identifier columns')
+
+
+def validate_df(df: pd.DataFrame, resource: Optional[str] = None) -> pd.DataFrame:
+    """Validate the prefixes and identifiers of both sides of each mapping.
+
+    :param df: A dataframe with the columns of the resource files or of :func:`compath_resources.get_df`
+    :param resource: The name of the mappings, used in the report
+    :return: A report of the invalid prefixes and identifiers, with the columns in :data:`REPORT_COLUMNS`.
+        Rows are given by their position in the dataframe. It's empty if everything is valid.
+    """
+    parts = []
+    for side, prefix_column, identifier_column in _get_sides(df):
+        part = pd.DataFrame({
+            'row': range(len(df.index)),
+            'side': side,
+            'prefix': df[prefix_column].to_numpy(),
+            'identifier': df[identifier_column].to_numpy(),
+        })
+        for prefix, group in part.groupby('prefix', sort=False, dropna=False):
+            problem = _get_prefix_problem(prefix)
+            if problem is not None:
+                parts.append(group.assign(problem=problem))
+                continue
+            pattern = _get_pattern(prefix)
+            if pattern is None:
+                continue
+            invalid = group[~group['identifier'].astype(str).str.fullmatch(pattern)]
+            if len(invalid.index):
+                parts.append(invalid.assign(problem=f'identifier does not match {pattern.pattern}'))
+
+    if not parts:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    rv = pd.concat(parts).sort_values(['row', 'side'])
+    rv.insert(0, 'resource', resource)
+    return rv[REPORT_COLUMNS].reset_index(drop=True)
+
+
+def validate_resources(paths: Optional[Iterable[Path]] = None) -> pd.DataFrame:
+    """Validate the resource files.
+
+    :param paths: The resource files. Defaults to all of them.
+    :return: A report of the invalid prefixes and identifiers in all files, as in :func:`validate_df`
+    """
+    reports = [
+        validate_df(_read_resource(path), resource=Path(path).name)
+        for path in (RESOURCE_PATHS if paths is None else paths)
+    ]
+    return _concat_reports(reports)
+
+
+def _concat_reports(reports: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    reports = [report for report in reports if len(report.index)]
+    if not reports:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    return pd.concat(reports, ignore_index=True)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+"""Test the precomputed closure of the mappings."""
+
+import os
+import tempfile
+import unittest
+
+from compath_resources.closure import CLOSURE_PATH, Closure, get_closure
+from compath_resources.constants import EXACT_MATCH, PART_OF
+from compath_resources.index import PathwayMapping, get_index
+
+
+def _mapping(source: str, relation: str, target: str) -> PathwayMapping:
+    return PathwayMapping(*source.split(':'), source, relation, *target.split(':'), target)
+
+
+class TestClosure(unittest.TestCase):
+    """Test the closure on a small graph."""
+
+    def setUp(self) -> None:
+        """Build a closure with a part-of cycle and two equivalence clusters."""
+        self.closure = Closure.from_mappings([
+            _mapping('a:1', PART_OF, 'a:2'),
+            _mapping('a:2', PART_OF, 'a:3'),
+            _mapping('a:3', PART_OF, 'a:4'),
+            _mapping('a:4', PART_OF, 'a:3'),
+            _mapping('b:1', PART_OF, 'a:1'),
+            _mapping('a:1', EXACT_MATCH, 'c:1'),
+            _mapping('c:1', EXACT_MATCH, 'b:2'),
+            _mapping('b:3', EXACT_MATCH, 'c:3'),
+        ])
+
+    def test_ancestors(self):
+        """Test ancestors and descendants, including through a cycle."""
+        self.assertEqual({'a:1', 'a:2', 'a:3', 'a:4'}, self.closure.ancestors('b:1'))
+        self.assertEqual({'a:3', 'a:4'}, self.closure.ancestors('a:2'))
+        self.assertEqual({'a:4'}, self.closure.ancestors('a:3'))
+        self.assertEqual({'a:1', 'a:2', 'a:3', 'b:1'}, self.closure.descendants('a:4'))
+        self.assertEqual(set(), self.closure.descendants('b:1'))
+        self.assertEqual(set(), self.closure.ancestors('x:1'))
+        self.assertTrue(self.closure.is_ancestor('a:3', 'b:1'))
+        self.assertFalse(self.closure.is_ancestor('b:1', 'a:3'))
+        self.assertFalse(self.closure.is_ancestor('x:1', 'a:3'))
+
+    def test_clusters(self):
+        """Test equivalence clusters and their representatives."""
+        self.assertEqual({'a:1', 'b:2', 'c:1'}, self.closure.cluster('b:2'))
+        self.assertEqual('a:1', self.closure.representative('c:1'))
+        self.assertEqual('b:3', self.closure.representative('c:3'))
+        self.assertEqual('a:2', self.closure.representative('a:2'))
+        self.assertEqual('x:1', self.closure.representative('x:1'))
+        self.assertTrue(self.closure.same_cluster('a:1', 'b:2'))
+        self.assertFalse(self.closure.same_cluster('a:1', 'b:3'))
+
+    def test_json(self):
+        """Test writing and reading the closure."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'closure.json')
+            self.closure.to_json(path, hashes={'a.tsv': 'abc'})
+            self.assertIsNone(Closure.from_json(path, hashes={'a.tsv': 'def'}))
+            closure = Closure.from_json(path, hashes={'a.tsv': 'abc'})
+        self.assertEqual(self.closure.nodes, closure.nodes)
+        self.assertEqual(self.closure.clusters, closure.clusters)
+        self.assertEqual(self.closure.ancestor_bits, closure.ancestor_bits)
+        self.assertEqual(self.closure.descendant_bits, closure.descendant_bits)
+
+
+class TestResourceClosure(unittest.TestCase):
+    """Test the closure of the resources."""
+
+    def test_up_to_date(self):
+        """Test the closure shipped with the package is up-to-date with the resources."""
+        closure = get_closure()
+        self.assertIs(closure, get_closure())
+        expected = Closure.from_resources()
+        self.assertEqual(expected.nodes, closure.nodes)
+        self.assertEqual(expected.clusters, closure.clusters)
+        self.assertEqual(expected.ancestor_table, closure.ancestor_table)
+        self.assertTrue(CLOSURE_PATH.exists())
+
+    def test_index(self):
+        """Test the closure agrees with the direct mappings in the index."""
+        closure, index = get_closure(), get_index()
+        for prefix, identifier in closure.nodes[::25]:
+            curie = f'{prefix}:{identifier}'
+            with self.subTest(curie=curie):
+                self.assertLessEqual(index.parents(curie) - {curie}, closure.ancestors(curie))
+                self.assertLessEqual(index.children(curie) - {curie}, closure.descendants(curie))
+                self.assertLessEqual(index.equivalents(curie), closure.cluster(curie))
+
+    def test_neurommsig(self):
+        """Test the NeuroMMSig subgraphs are in the clusters of the pathways they map to."""
+        closure = get_closure()
+        self.assertTrue(closure.same_cluster('neurommsig:NEUROMMSIG2', 'kegg.pathway:hsa04062'))
+        self.assertTrue(closure.same_cluster('neurommsig:NEUROMMSIG4', 'neurommsig:NEUROMMSIG125'))
+
+    def test_pathbank_wikipathways(self):
+        """Test the mappings between PathBank and WikiPathways are in the closure."""
+        closure = get_closure()
+        self.assertTrue(closure.same_cluster('pathbank:PW000007', 'wikipathways:WP28'))
+        self.assertTrue(closure.is_ancestor('wikipathways:WP4210', 'pathbank:PW122411'))
@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+
+"""Test the curation utilities."""
+
+import itertools as itt
+import json
+import os
+import random
+import tempfile
+import unittest
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+from compath_resources.curation import (
+    MinHashLSH, NgramSimilarity, SequenceMatcherSimilarity, _concat_chunks, align_gene_set_matrices,
+    calculate_jaccard, calculate_pairwise_similarities, calculate_similarity_matrices, evaluate_candidates,
+    get_gene_set_matrix, get_gene_vocabulary, get_name_similarity, iter_top_similarities,
+)
+
+WORDS = ['signaling', 'pathway', 'metabolism', 'cycle', 'degradation', 'biosynthesis', 'apoptosis', 'wnt', 'notch']
+
+
+def _make_database(rng: random.Random, prefix: str, n_pathways: int, n_genes: int):
+    genes = [f'GENE{i}' for i in range(n_genes)]
+    pathway_id_to_symbols = {}
+    pathway_id_to_name = {}
+    for i in range(n_pathways):
+        pathway_id = f'{prefix}{i:05}'
+        pathway_id_to_symbols[pathway_id] = set(rng.sample(genes, rng.randint(1, 30)))
+        pathway_id_to_name[pathway_id] = ' '.join(rng.choices(WORDS, k=rng.randint(1, 4)))
+    return pathway_id_to_symbols, pathway_id_to_name
+
+
+def _make_fixture(seed: int = 0, n_pathways: int = 60, n_genes: int = 80):
+    rng = random.Random(seed)
+    database, mappings = {}, {}
+    for name in ('kegg', 'reactome', 'wikipathways'):
+        database[name], mappings[name] = _make_database(rng, name, n_pathways, n_genes)
+    return database, mappings
+
+
+def _legacy(database, mappings, minimum_gene_set_similarity, minimum_string_similarity):
+    """Calculate the similarities with the original pairwise loop."""
+    rv = {}
+    for (a_database_name, a_sets), (b_database_name, b_sets) in itt.combinations(database.items(), r=2):
+        a_pathway_id_to_name, b_pathway_id_to_name = mappings[a_database_name], mappings[b_database_name]
+        rows = []
+        for (a_pathway_id, a_set), (b_pathway_id, b_set) in itt.product(a_sets.items(), b_sets.items()):
+            gene_similarity = calculate_jaccard(a_set, b_set)
+            if gene_similarity < minimum_gene_set_similarity:
+                continue
+            a_pathway_name = a_pathway_id_to_name[a_pathway_id]
+            b_pathway_name = b_pathway_id_to_name[b_pathway_id]
+            string_similarity = SequenceMatcher(None, a_pathway_name, b_pathway_name).ratio()
+            if string_similarity < minimum_string_similarity:
+                continue
+            rows.append((
+                a_pathway_id, a_pathway_name,
+                b_pathway_id, b_pathway_name,
+                round(gene_similarity, 3), round(string_similarity, 3),
+            ))
+        rv[a_database_name, b_database_name] = pd.DataFrame(
+            rows,
+            columns=[f'{a_database_name}_id', f'{a_database_name}_name', f'{b_database_name}_id',
+                     f'{b_database_name}_name', 'gene_set_similarity', 'string_similarity'],
+        ).sort_values([f'{a_database_name}_name', 'gene_set_similarity'], ascending=False)
+    return rv
+
+
+class TestSimilarityMatrices(unittest.TestCase):
+    """Test the sparse similarity engine reproduces the pairwise implementation."""
+
+    def assert_same(self, expected, actual):
+        """Assert two dictionaries of similarity dataframes are identical."""
+        self.assertEqual(set(expected), set(actual))
+        for key, expected_df in expected.items():
+            with self.subTest(pair=key):
+                pd.testing.assert_frame_equal(
+                    expected_df.reset_index(drop=True),
+                    actual[key].reset_index(drop=True),
+                )
+
+    def test_thresholds(self):
+        """Test different gene set and string similarity thresholds."""
+        database, mappings = _make_fixture()
+        for minimum_gene_set_similarity, minimum_string_similarity in [(0.8, 0.0), (0.3, 0.5), (0.0, 0.0)]:
+            with self.subTest(gene=minimum_gene_set_similarity, string=minimum_string_similarity):
+                expected = _legacy(database, mappings, minimum_gene_set_similarity, minimum_string_similarity)
+                actual = calculate_similarity_matrices(
+                    database, mappings,
+                    minimum_gene_set_similarity=minimum_gene_set_similarity,
+                    minimum_string_similarity=minimum_string_similarity,
+                )
+                self.assert_same(expected, actual)
+
+    def test_workers(self):
+        """Test calculating database pairs in worker processes gives the same result."""
+        database, mappings = _make_fixture()
+        expected = calculate_similarity_matrices(database, mappings, minimum_gene_set_similarity=0.3)
+        with tempfile.TemporaryDirectory() as directory:
+            actual = calculate_similarity_matrices(
+                database, mappings, minimum_gene_set_similarity=0.3, directory=directory, workers=2,
+            )
+            self.assertEqual(list(expected), list(actual))
+            self.assert_same(expected, actual)
+            for a_database_name, b_database_name in expected:
+                path = os.path.join(directory, f'{a_database_name}_{b_database_name}.tsv')
+                self.assertTrue(os.path.exists(path))
+
+    def test_align(self):
+        """Test aligning gene set matrices built with separate vocabularies."""
+        database, mappings = _make_fixture()
+        expected = calculate_similarity_matrices(database, mappings, minimum_gene_set_similarity=0.3)
+        gene_set_matrices = align_gene_set_matrices({
+            name: get_gene_set_matrix(pathway_id_to_symbols, mappings[name])
+            for name, pathway_id_to_symbols in database.items()
+        })
+        actual = calculate_pairwise_similarities(gene_set_matrices, minimum_gene_set_similarity=0.3)
+        self.assert_same(expected, actual)
+
+    def test_incremental(self):
+        """Test merging recalculated rows into the previous results gives the same result as a full run."""
+        database, mappings = _make_fixture()
+        with tempfile.TemporaryDirectory() as directory:
+            calculate_similarity_matrices(database, mappings, minimum_gene_set_similarity=0.3, directory=directory)
+
+            database['kegg']['kegg00000'] = {'GENE1', 'GENE2', 'GENE3'}
+            mappings['reactome']['reactome00001'] = 'a new name'
+            del database['wikipathways']['wikipathways00002']
+            database['wikipathways']['wikipathways99999'] = {'GENE1', 'GENE2'}
+            mappings['wikipathways']['wikipathways99999'] = 'new pathway'
+
+            expected = calculate_similarity_matrices(database, mappings, minimum_gene_set_similarity=0.3)
+            for workers in (1, 2):
+                with self.subTest(workers=workers):
+                    actual = calculate_similarity_matrices(
+                        database, mappings, minimum_gene_set_similarity=0.3, directory=directory,
+                        incremental=True, workers=workers,
+                    )
+                    self.assert_same(expected, actual)
+
+                    with open(os.path.join(directory, 'manifest.json')) as file:
+                        manifest = json.load(file)
+                    statistics = manifest['pairs']['kegg_reactome']
+                    self.assertEqual('incremental', statistics['mode'])
+                    self.assertLess(0, statistics['reused'])
+
+            # changing the parameters requires a full run
+            calculate_similarity_matrices(
+                database, mappings, minimum_gene_set_similarity=0.5, directory=directory, incremental=True,
+            )
+            with open(os.path.join(directory, 'manifest.json')) as file:
+                manifest = json.load(file)
+            self.assertEqual('full', manifest['pairs']['kegg_reactome']['mode'])
+
+    def test_ngram_workers(self):
+        """Test the n-gram name similarity can be used in worker processes."""
+        database, mappings = _make_fixture()
+        expected = calculate_similarity_matrices(
+            database, mappings, minimum_gene_set_similarity=0.3, name_similarity='ngram',
+        )
+        actual = calculate_similarity_matrices(
+            database, mappings, minimum_gene_set_similarity=0.3, name_similarity='ngram', workers=2,
+        )
+        self.assert_same(expected, actual)
+
+
+def _make_shared_fixture(seed: int = 0, n_pathways: int = 60, n_shared: int = 20, n_genes: int = 2000):
+    """Make databases sharing some pathways, which have a gene changed in each database.
+
+    The vocabulary is large compared to the pathways, so the other pathways rarely overlap.
+    """
+    rng = random.Random(seed)
+    genes = [f'GENE{i}' for i in range(n_genes)]
+    shared = [set(rng.sample(genes, rng.randint(20, 40))) for _ in range(n_shared)]
+    database, mappings = {}, {}
+    for name in ('kegg', 'reactome', 'wikipathways'):
+        database[name], mappings[name] = {}, {}
+        for i in range(n_pathways):
+            pathway_id = f'{name}{i:05}'
+            if i < n_shared:
+                symbols = set(shared[i])
+                symbols.remove(rng.choice(sorted(symbols)))
+                symbols.add(rng.choice(genes))
+                mappings[name][pathway_id] = f'shared pathway {i}'
+            else:
+                symbols = set(rng.sample(genes, rng.randint(5, 40)))
+                mappings[name][pathway_id] = ' '.join(rng.choices(WORDS, k=rng.randint(1, 4)))
+            database[name][pathway_id] = symbols
+    return database, mappings
+
+
+class TestMinHashLSH(unittest.TestCase):
+    """Test the locality-sensitive hashing candidate generation."""
+
+    def setUp(self) -> None:
+        """Prepare a fixture with shared pathways."""
+        self.database, self.mappings = _make_shared_fixture()
+        gene_to_index = get_gene_vocabulary(self.database.values())
+        self.gene_set_matrices = {
+            name: get_gene_set_matrix(pathway_id_to_symbols, self.mappings[name], gene_to_index)
+            for name, pathway_id_to_symbols in self.database.items()
+        }
+
+    def test_signatures(self):
+        """Test identical gene sets get identical signatures, regardless of the chunk size."""
+        lsh = MinHashLSH(bands=8, rows=2)
+        matrix = self.gene_set_matrices['kegg'].matrix
+        signatures = lsh.get_signatures(matrix)
+        self.assertEqual((matrix.shape[0], 16), signatures.shape)
+        np.testing.assert_array_equal(signatures, lsh.get_signatures(matrix, chunk_size=7))
+        np.testing.assert_array_equal(signatures[:3], lsh.get_signatures(matrix[[0, 1, 2]]))
+
+    def test_candidates(self):
+        """Test the candidates are unique pairs between different databases, ordered like the exact method."""
+        candidates = MinHashLSH().get_candidates(self.gene_set_matrices)
+        self.assertEqual(list(itt.combinations(self.gene_set_matrices, r=2)), list(candidates))
+        for (a_database_name, b_database_name), (a_indices, b_indices) in candidates.items():
+            with self.subTest(pair=(a_database_name, b_database_name)):
+                keys = a_indices * len(self.gene_set_matrices[b_database_name].pathway_ids) + b_indices
+                np.testing.assert_array_equal(np.unique(keys), keys)
+
+    def test_recall(self):
+        """Test the measured recall against the exact method on pathways shared between databases."""
+        evaluation = evaluate_candidates(self.gene_set_matrices, MinHashLSH(), minimum_gene_set_similarity=0.9)
+        self.assertLessEqual(60, evaluation['expected'])
+        self.assertLessEqual(0.95, evaluation['recall'])
+        self.assertGreater(0.1, evaluation['candidate_fraction'])
+
+        # fewer and longer bands lower the recall
+        strict = evaluate_candidates(self.gene_set_matrices, MinHashLSH(bands=1, rows=16), minimum_gene_set_similarity=0.9)
+        self.assertGreater(evaluation['recall'], strict['recall'])
+
+    def test_similarities(self):
+        """Test only pairs from the exact results are found, with the same similarities."""
+        expected = calculate_similarity_matrices(self.database, self.mappings, minimum_gene_set_similarity=0.5)
+        actual = calculate_similarity_matrices(
+            self.database, self.mappings, minimum_gene_set_similarity=0.5, lsh=MinHashLSH(),
+        )
+        for pair, expected_df in expected.items():
+            with self.subTest(pair=pair):
+                merged = actual[pair].merge(expected_df, how='left', indicator=True)
+                self.assertTrue((merged['_merge'] == 'both').all())
+                self.assertLessEqual(20, len(actual[pair].index))
+
+    def test_incremental(self):
+        """Test incremental runs with candidates give the same result as a full run with candidates."""
+        lsh = MinHashLSH()
+        with tempfile.TemporaryDirectory() as directory:
+            calculate_similarity_matrices(
+                self.database, self.mappings, minimum_gene_set_similarity=0.5, directory=directory, lsh=lsh,
+            )
+            self.database['kegg']['kegg00030'] = set(self.database['reactome']['reactome00003'])
+            expected = calculate_similarity_matrices(
+                self.database, self.mappings, minimum_gene_set_similarity=0.5, lsh=lsh,
+            )
+            for workers in (1, 2):
+                with self.subTest(workers=workers):
+                    actual = calculate_similarity_matrices(
+                        self.database, self.mappings, minimum_gene_set_similarity=0.5, directory=directory,
+                        incremental=True, workers=workers, lsh=lsh,
+                    )
+                    for pair, expected_df in expected.items():
+                        pd.testing.assert_frame_equal(
+                            expected_df.reset_index(drop=True), actual[pair].reset_index(drop=True),
+                        )
+                    with open(os.path.join(directory, 'manifest.json')) as file:
+                        manifest = json.load(file)
+                    self.assertEqual('incremental', manifest['pairs']['kegg_reactome']['mode'])
+                    self.assertLess(0, manifest['pairs']['kegg_reactome']['candidates'])
+
+
+def _get_top(df: pd.DataFrame, a_database_name: str, b_database_name: str, k: int) -> pd.DataFrame:
+    """Get the best matches of each pathway from a full result, ranked like the top-k mode."""
+    a_id_to_row = {pathway_id: row for row, pathway_id in enumerate(sorted(df[f'{a_database_name}_id'].unique()))}
+    df = df.assign(_row=df[f'{a_database_name}_id'].map(a_id_to_row))
+    df = df.sort_values(
+        ['_row', 'gene_set_similarity', 'string_similarity', f'{b_database_name}_id'],
+        ascending=[True, False, False, True],
+    )
+    return df.groupby('_row').head(k).drop(columns='_row').reset_index(drop=True)
+
+
+class TestTopK(unittest.TestCase):
+    """Test keeping only the best matches of each pathway."""
+
+    def test_top_k(self):
+        """Test the top-k mode keeps the best rows of the full result and writes them as it goes."""
+        database, mappings = _make_fixture()
+        expected = calculate_similarity_matrices(database, mappings, minimum_gene_set_similarity=0.3)
+        for k, workers in [(1, 1), (3, 1), (3, 2)]:
+            with tempfile.TemporaryDirectory() as directory:
+                actual = calculate_similarity_matrices(
+                    database, mappings, minimum_gene_set_similarity=0.3, directory=directory,
+                    workers=workers, top_k=k,
+                )
+                for (a_database_name, b_database_name), expected_df in expected.items():
+                    with self.subTest(k=k, workers=workers, pair=(a_database_name, b_database_name)):
+                        df = actual[a_database_name, b_database_name]
+                        self.assertLessEqual(df.groupby(f'{a_database_name}_id').size().max(), k)
+                        pd.testing.assert_frame_equal(
+                            _get_top(expected_df, a_database_name, b_database_name, k),
+                            _get_top(df, a_database_name, b_database_name, k),
+                        )
+                        path = os.path.join(directory, f'{a_database_name}_{b_database_name}.tsv')
+                        pd.testing.assert_frame_equal(df, pd.read_csv(path, sep='\t', na_filter=False))
+
+    def test_chunks(self):
+        """Test the chunk size and candidates don't change the result."""
+        database, mappings = _make_shared_fixture()
+        gene_to_index = get_gene_vocabulary(database.values())
+        a = get_gene_set_matrix(database['kegg'], mappings['kegg'], gene_to_index)
+        b = get_gene_set_matrix(database['reactome'], mappings['reactome'], gene_to_index)
+        expected = _concat_chunks(list(iter_top_similarities('kegg', a, 'reactome', b, k=2, chunk_size=1000)))
+        self.assertLessEqual(20, len(expected.index))
+        for chunk_size in (1, 7):
+            with self.subTest(chunk_size=chunk_size):
+                chunks = list(iter_top_similarities('kegg', a, 'reactome', b, k=2, chunk_size=chunk_size))
+                self.assertEqual(-(-len(a.pathway_ids) // chunk_size), len(chunks))
+                pd.testing.assert_frame_equal(expected, _concat_chunks(chunks))
+
+        everything = (
+            np.repeat(np.arange(len(a.pathway_ids)), len(b.pathway_ids)),
+            np.tile(np.arange(len(b.pathway_ids)), len(a.pathway_ids)),
+        )
+        actual = _concat_chunks(list(iter_top_similarities(
+            'kegg', a, 'reactome', b, k=2, chunk_size=7, candidates=everything,
+        )))
+        pd.testing.assert_frame_equal(expected, actual)
+
+    def test_incremental(self):
+        """Test top-k runs can't be incremental."""
+        database, mappings = _make_fixture()
+        with self.assertRaises(ValueError):
+            calculate_similarity_matrices(database, mappings, incremental=True, top_k=1)
+
+
+class TestNameSimilarity(unittest.TestCase):
+    """Test the name similarity stages."""
+
+    def setUp(self) -> None:
+        """Prepare pairs of names."""
+        rng = random.Random(1)
+        self.a_names = [' '.join(rng.choices(WORDS, k=rng.randint(1, 4))) for _ in range(40)]
+        self.b_names = [' '.join(rng.choices(WORDS, k=rng.randint(1, 4))) for _ in range(40)] + ['']
+        pairs = list(itt.product(range(len(self.a_names)), range(len(self.b_names))))
+        self.a_indices = np.array([a for a, _ in pairs])
+        self.b_indices = np.array([b for _, b in pairs])
+
+    def test_exact(self):
+        """Test the bounded sequence matcher gives the same scores as a new matcher for each pair."""
+        similarity = SequenceMatcherSimilarity()
+        a_profile, b_profile = similarity.prepare(self.a_names), similarity.prepare(self.b_names)
+        for minimum in (0.0, 0.4, 0.8):
+            with self.subTest(minimum=minimum):
+                scores = similarity.score(a_profile, b_profile, self.a_indices, self.b_indices, minimum=minimum)
+                for a_index, b_index, score in zip(self.a_indices, self.b_indices, scores):
+                    expected = SequenceMatcher(None, self.a_names[a_index], self.b_names[b_index]).ratio()
+                    if expected >= minimum:
+                        self.assertEqual(expected, score)
+                    else:
+                        self.assertFalse(score >= minimum)
+
+    def test_ngram(self):
+        """Test the n-gram similarity is bounded and recognizes identical names."""
+        similarity = get_name_similarity('ngram')
+        self.assertIsInstance(similarity, NgramSimilarity)
+        a_profile, b_profile = similarity.prepare(self.a_names), similarity.prepare(self.b_names)
+        scores = similarity.score(a_profile, b_profile, self.a_indices, self.b_indices)
+        self.assertTrue(((0 <= scores) & (scores <= 1)).all())
+        for a_index, b_index, score in zip(self.a_indices, self.b_indices, scores):
+            if self.a_names[a_index] == self.b_names[b_index]:
+                self.assertEqual(1.0, score)
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+"""Test the exporters."""
+
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+import rdflib
+from click.testing import CliRunner
+from rdflib.namespace import RDFS
+
+import pybel
+from compath_resources import get_df
+from compath_resources.cli import main
+from compath_resources.constants import PART_OF
+from compath_resources.exporters.bel import BEL_RELATIONS, get_bel, write_bel_script, write_nodelink
+from compath_resources.exporters.rdf import (
+    COMPATH_PREFIX, NAMESPACES, NEUROMMSIG_PREFIX, RDF_FORMATS, get_rdf, write_rdf,
+)
+from compath_resources.upload_ndex import get_cx_tables, write_cx
+from pybel.dsl import BiologicalProcess
+
+
+def _get_bel_legacy(df: pd.DataFrame) -> pybel.BELGraph:
+    """Build the graph by adding each mapping one by one."""
+    graph = pybel.BELGraph(
+        name='ComPath Mappings',
+        version='1.1.0',
+        description='Hierarchical and equivalence relations between entries in KEGG, Reactome, PathBank,'
+                    ' and WikiPathways.'
+    )
+    for source_ns, source_id, source_name, relation, target_ns, target_id, target_name in df.values:
+        source = BiologicalProcess(namespace=source_ns, identifier=source_id, name=source_name)
+        target = BiologicalProcess(namespace=target_ns, identifier=target_id, name=target_name)
+        if BEL_RELATIONS[relation] == pybel.constants.PART_OF:
+            graph.add_part_of(source, target)
+        else:
+            graph.add_equivalence(source, target)
+    return graph
+
+
+class TestBEL(unittest.TestCase):
+    """Test the BEL exporter gives the same results as adding mappings one by one."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Build the graph the slow way."""
+        cls.df = get_df(include_reactome_hierarchy=True, include_decopath=True, include_special=True)
+        cls.expected = _get_bel_legacy(cls.df)
+
+    def test_graph(self):
+        """Test building the graph in bulk."""
+        graph = get_bel(self.df)
+        self.assertEqual(list(self.expected), list(graph))
+        self.assertEqual(
+            list(self.expected.edges(keys=True, data=True)),
+            list(graph.edges(keys=True, data=True)),
+        )
+        self.assertEqual(self.expected.document, graph.document)
+
+    def test_legacy_relations(self):
+        """Test the relation vocabulary of older versions of the resources."""
+        df = self.df.replace({'relation': {'skos:exactMatch': 'equivalentTo', 'BFO:0000050': 'isPartOf'}})
+        self.assertEqual(set(self.expected.edges(keys=True)), set(get_bel(df).edges(keys=True)))
+        with self.assertRaises(ValueError):
+            get_bel(self.df.replace({'relation': {'skos:exactMatch': 'skos:closeMatch'}}))
+
+    def test_bel_script(self):
+        """Test streaming a BEL script."""
+        expected, actual = io.StringIO(), io.StringIO()
+        pybel.to_bel_script(self.expected, expected)
+        write_bel_script(actual, self.df)
+        # the first line has a timestamp, and the statements are in a different order
+        self.assertEqual(
+            sorted(expected.getvalue().splitlines()[1:]),
+            sorted(actual.getvalue().splitlines()[1:]),
+        )
+
+    def test_nodelink(self):
+        """Test streaming node-link JSON."""
+        file = io.StringIO()
+        write_nodelink(file, self.df)
+        actual = json.loads(file.getvalue())
+        expected = pybel.to_nodelink(self.expected)
+        self.assertEqual(json.loads(json.dumps(expected['graph'])), actual['graph'])
+        self.assertEqual(json.loads(json.dumps(expected['nodes'])), actual['nodes'])
+        self.assertEqual(
+            sorted(json.dumps(link, sort_keys=True) for link in expected['links']),
+            sorted(json.dumps(link, sort_keys=True) for link in actual['links']),
+        )
+        graph = pybel.from_nodelink(actual)
+        self.assertEqual(self.expected.number_of_edges(), graph.number_of_edges())
+
+
+class TestRDF(unittest.TestCase):
+    """Test the RDF exporter."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Build the RDFLib graph."""
+        cls.graph = get_rdf()
+
+    def test_graph(self):
+        """Test each pathway has exactly one label."""
+        subjects = [subject for subject, _, _ in self.graph.triples((None, RDFS.label, None))]
+        self.assertEqual(len(subjects), len(set(subjects)))
+        self.assertEqual(set(subjects), set(self.graph.all_nodes()) - set(self.graph.objects(None, RDFS.label)))
+
+    def test_stream(self):
+        """Test streaming each format gives the same triples as the RDFLib graph."""
+        for rdf_format in RDF_FORMATS:
+            with self.subTest(format=rdf_format):
+                stream = io.StringIO()
+                self.assertIsNone(get_rdf(stream, format=rdf_format))
+                graph = rdflib.Graph().parse(data=stream.getvalue(), format=rdf_format)
+                self.assertEqual(set(self.graph), set(graph))
+        with self.assertRaises(ValueError):
+            get_rdf(io.StringIO(), format='json-ld')
+
+    def test_prefixes(self):
+        """Test all prefixes in the resources can be written, including the NeuroMMSig mappings."""
+        df = get_df(
+            include_reactome_hierarchy=True, include_decopath=True, include_special=True, include_neurommsig=True,
+        )
+        self.assertLessEqual(set(df['source prefix']) | set(df['target prefix']), set(NAMESPACES))
+        stream = io.StringIO()
+        write_rdf(stream, df=df, format='turtle')
+        graph = rdflib.Graph().parse(data=stream.getvalue(), format='turtle')
+        columns = ['source prefix', 'source identifier', 'relation', 'target prefix', 'target identifier']
+        self.assertEqual(
+            len(df[columns].drop_duplicates().index),
+            len(graph) - len(set(graph.subjects(RDFS.label, None))),
+        )
+
+    def test_predicates(self):
+        """Test part of relations in either vocabulary give the same predicate as earlier versions."""
+        df = get_df(include_reactome_hierarchy=True, include_neurommsig=True)
+        legacy_df = df.replace({'relation': {PART_OF: 'isPartOf'}})
+        for mappings in (df, legacy_df):
+            stream = io.StringIO()
+            write_rdf(stream, df=mappings, format='nt')
+            graph = rdflib.Graph().parse(data=stream.getvalue(), format='nt')
+            self.assertEqual(
+                {COMPATH_PREFIX + 'partOf', COMPATH_PREFIX + 'equivalentTo', str(RDFS.label)},
+                {str(predicate) for predicate in graph.predicates()},
+            )
+        subject = rdflib.URIRef(NEUROMMSIG_PREFIX + 'NEUROMMSIG2')
+        self.assertEqual('Chemokine signaling subgraph', str(graph.value(subject, RDFS.label)))
+
+    def test_cli(self):
+        """Test writing RDF from the command line."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'compath_mappings.rdf')
+            result = CliRunner().invoke(main, ['rdf', '--output', path])
+            self.assertEqual(0, result.exit_code, msg=result.output)
+            graph = rdflib.Graph().parse(path, format='xml')
+        self.assertEqual(set(self.graph), set(graph))
+
+
+class TestCX(unittest.TestCase):
+    """Test the CX exporter for NDEx."""
+
+    def setUp(self) -> None:
+        """Write the CX for all mappings."""
+        self.df = get_df(include_special=True, include_decopath=True, include_reactome_hierarchy=True)
+        stream = io.StringIO()
+        write_cx(stream, self.df)
+        self.aspects = {
+            name: elements
+            for aspect in json.loads(stream.getvalue())
+            for name, elements in aspect.items()
+        }
+
+    def test_nodes(self):
+        """Test each pathway is a single node."""
+        nodes = self.aspects['nodes']
+        curies = {
+            f'{prefix}:{identifier}'
+            for side in ('source', 'target')
+            for prefix, identifier in self.df[[f'{side} prefix', f'{side} identifier']].values
+        }
+        self.assertEqual(len(curies), len(nodes))
+        self.assertEqual(curies, {node['n'] for node in nodes})
+        self.assertEqual(list(range(len(nodes))), [node['@id'] for node in nodes])
+
+    def test_edges(self):
+        """Test each unique mapping is an edge between existing nodes."""
+        nodes = {node['@id']: node['n'] for node in self.aspects['nodes']}
+        edges = {
+            (nodes[edge['s']], edge['i'], nodes[edge['t']])
+            for edge in self.aspects['edges']
+        }
+        self.assertEqual(len(edges), len(self.aspects['edges']))
+        self.assertEqual(
+            {
+                (f'{sp}:{si}', relation, f'{tp}:{ti}')
+                for sp, si, relation, tp, ti in self.df[[
+                    'source prefix', 'source identifier', 'relation', 'target prefix', 'target identifier',
+                ]].values
+            },
+            edges,
+        )
+
+    def test_metadata(self):
+        """Test the metadata counts the elements of each aspect."""
+        for metadata in self.aspects['metaData']:
+            self.assertEqual(len(self.aspects[metadata['name']]), metadata['elementCount'], msg=metadata['name'])
+        self.assertEqual([{'longNumber': 281474976710655}], self.aspects['numberVerification'])
+        self.assertNotIn('decopath', self.aspects['@context'][0])
+
+    def test_tables(self):
+        """Test the node and edge tables."""
+        nodes, edges = get_cx_tables(self.df)
+        self.assertFalse(nodes['n'].duplicated().any())
+        self.assertFalse(edges[['s', 't', 'i']].duplicated().any())
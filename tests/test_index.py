@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+"""Test the mapping index."""
+
+import unittest
+
+from compath_resources import get_df
+from compath_resources.constants import EXACT_MATCH, PART_OF
+from compath_resources.index import PathwayMapping, get_index, parse_curie
+
+
+class TestIndex(unittest.TestCase):
+    """Test the mapping index agrees with filtering the mapping table."""
+
+    def setUp(self) -> None:
+        """Get the index and the table it was built from."""
+        self.index = get_index()
+        df = get_df(
+            include_reactome_hierarchy=True, include_decopath=True, include_special=True, include_neurommsig=True,
+        )
+        self.df = df.astype(object).where(df.notna(), None)
+        self.curies = sorted({
+            f'{prefix}:{identifier}'
+            for prefix, identifier in self.df[['source prefix', 'source identifier']].values[::50]
+        })
+
+    def test_cached(self):
+        """Test the index is built once per process."""
+        self.assertIs(self.index, get_index())
+        self.assertEqual(len(self.df.index), len(self.index))
+
+    def test_lookup(self):
+        """Test looking up mappings by CURIE."""
+        for curie, mappings in self.index.lookup_many(self.curies).items():
+            with self.subTest(curie=curie):
+                prefix, identifier = parse_curie(curie)
+                source_idx = (self.df['source prefix'] == prefix) & (self.df['source identifier'] == identifier)
+                target_idx = (self.df['target prefix'] == prefix) & (self.df['target identifier'] == identifier)
+                expected = [
+                    *map(PathwayMapping._make, self.df[source_idx].values.tolist()),
+                    *map(PathwayMapping._make, self.df[target_idx].values.tolist()),
+                ]
+                self.assertEqual(sorted(expected, key=str), sorted(mappings, key=str))
+                self.assertIn(curie, self.index)
+
+    def test_equivalents(self):
+        """Test getting equivalent pathways in either direction."""
+        df = self.df[self.df['relation'] == EXACT_MATCH]
+        for source_prefix, source_identifier, target_prefix, target_identifier in df[[
+            'source prefix', 'source identifier', 'target prefix', 'target identifier',
+        ]].values[::25]:
+            source, target = f'{source_prefix}:{source_identifier}', f'{target_prefix}:{target_identifier}'
+            with self.subTest(source=source, target=target):
+                self.assertIn(target, self.index.equivalents(source))
+                self.assertIn(source, self.index.equivalents(target))
+
+    def test_neurommsig(self):
+        """Test the NeuroMMSig subgraphs are indexed, with None for missing names."""
+        self.assertIn('kegg.pathway:hsa04062', self.index.equivalents('neurommsig:NEUROMMSIG2'))
+        self.assertEqual('Chemokine signaling subgraph', self.index.get_name('neurommsig:NEUROMMSIG2'))
+        self.assertIn('neurommsig:NEUROMMSIG210', self.index)
+        self.assertIsNone(self.index.get_name('neurommsig:NEUROMMSIG210'))
+
+    def test_pathbank_wikipathways(self):
+        """Test the mappings between PathBank and WikiPathways are indexed."""
+        self.assertIn(
+            (PART_OF, 'wikipathways', 'WP4210'),
+            {
+                (mapping.relation, mapping.target_prefix, mapping.target_identifier)
+                for mapping in self.index.lookup('pathbank:PW122411')
+            },
+        )
+        self.assertIn('wikipathways:WP23', self.index.equivalents('pathbank:PW070885'))
+        self.assertIn('pathbank:PW070885', self.index.equivalents('wikipathways:WP23'))
+
+    def test_missing(self):
+        """Test looking up unknown pathways."""
+        self.assertEqual([], self.index.lookup('reactome:R-HSA-0'))
+        self.assertEqual(set(), self.index.equivalents('reactome:R-HSA-0'))
+        self.assertNotIn('reactome:R-HSA-0', self.index)
+        with self.assertRaises(ValueError):
+            self.index.lookup('R-HSA-0')
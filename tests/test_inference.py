@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+"""Test inferring mappings from compositions of the mappings."""
+
+import itertools as itt
+import random
+import unittest
+from typing import Dict, Iterable, List, Set, Tuple
+
+import pandas as pd
+
+from compath_resources.constants import EXACT_MATCH, PART_OF
+from compath_resources.inference import INFERRED_COLUMNS, INFERRED_MAX_HOPS, infer_mappings
+from compath_resources.resources import get_df, get_inferred_df
+
+Triple = Tuple[str, str, str]
+
+
+def _make_df(triples: List[Triple]) -> pd.DataFrame:
+    return pd.DataFrame(
+        [
+            (*source.split(':'), source.upper(), relation, *target.split(':'), target.upper())
+            for source, relation, target in triples
+        ],
+        columns=[
+            'source prefix', 'source identifier', 'source name', 'relation',
+            'target prefix', 'target identifier', 'target name',
+        ],
+    )
+
+
+def _iter_triples(df: pd.DataFrame) -> Iterable[Triple]:
+    for source_prefix, source_identifier, relation, target_prefix, target_identifier in df[[
+        'Source Resource', 'Source ID', 'Mapping Type', 'Target Resource', 'Target ID',
+    ]].itertuples(index=False):
+        yield f'{source_prefix}:{source_identifier}', relation, f'{target_prefix}:{target_identifier}'
+
+
+def _get_triples(df: pd.DataFrame) -> Set[Triple]:
+    return set(_iter_triples(df))
+
+
+def _get_shortest(triples: List[Triple]) -> Dict[Triple, int]:
+    """Compose the mappings one hop at a time with sets, giving the fewest hops of each mapping."""
+    edges = set(triples) | {(target, relation, source) for source, relation, target in triples if relation == EXACT_MATCH}
+    rv = {edge: 1 for edge in edges}
+    frontier = set(edges)
+    hops = 1
+    while frontier:
+        hops += 1
+        frontier = {
+            (source, EXACT_MATCH if EXACT_MATCH == left == right else PART_OF, target)
+            for source, left, middle in frontier
+            for other, right, target in edges
+            if middle == other and source != target
+        } - set(rv)
+        rv.update(dict.fromkeys(frontier, hops))
+    return rv
+
+
+class TestInference(unittest.TestCase):
+    """Test inferring mappings on small graphs."""
+
+    def test_example(self):
+        """Test a PathBank pathway equivalent to a KEGG pathway that's part of a WikiPathways pathway."""
+        df = infer_mappings(_make_df([
+            ('pathbank:PW1', EXACT_MATCH, 'kegg.pathway:hsa1'),
+            ('kegg.pathway:hsa1', PART_OF, 'wikipathways:WP1'),
+            ('reactome:R1', EXACT_MATCH, 'kegg.pathway:hsa1'),
+        ]))
+        self.assertEqual(INFERRED_COLUMNS, list(df.columns))
+        self.assertEqual(
+            {
+                ('pathbank:PW1', PART_OF, 'wikipathways:WP1'),
+                ('reactome:R1', PART_OF, 'wikipathways:WP1'),
+                ('pathbank:PW1', EXACT_MATCH, 'reactome:R1'),
+            },
+            _get_triples(df),
+        )
+        row = df[df['Source ID'] == 'PW1'].set_index('Mapping Type').loc[PART_OF]
+        self.assertEqual('PATHBANK:PW1', row['Source Name'])
+        self.assertEqual(2, row['Hops'])
+        self.assertEqual(
+            f'pathbank:PW1 {EXACT_MATCH} kegg.pathway:hsa1 {PART_OF} wikipathways:WP1',
+            row['Provenance'],
+        )
+
+    def test_random(self):
+        """Test the inferred mappings, their hops, and their provenance against composing sets."""
+        rng = random.Random(0)
+        curies = [f'{prefix}:{i}' for prefix in 'abc' for i in range(8)]
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                triples = sorted({
+                    (source, rng.choice([EXACT_MATCH, PART_OF, PART_OF]), target)
+                    for source, target in rng.sample(list(itt.permutations(curies, 2)), 30)
+                })
+                shortest = _get_shortest(triples)
+                direct = {triple for triple, hops in shortest.items() if hops == 1}
+                df = infer_mappings(_make_df(triples))
+
+                expected = {
+                    triple
+                    for triple, hops in shortest.items()
+                    if hops > 1 and (triple[1] == PART_OF or triple[0] < triple[2])
+                }
+                self.assertEqual(expected, _get_triples(df))
+                for triple, hops, provenance in zip(_iter_triples(df), df['Hops'], df['Provenance']):
+                    self.assertEqual(shortest[triple], hops)
+                    parts = provenance.split(' ')
+                    self.assertEqual(2 * hops + 1, len(parts))
+                    self.assertEqual(triple[0], parts[0])
+                    self.assertEqual(triple[2], parts[-1])
+                    for i in range(0, len(parts) - 2, 2):
+                        self.assertIn(tuple(parts[i:i + 3]), direct)
+
+                limited = infer_mappings(_make_df(triples), max_hops=2)
+                self.assertEqual({triple for triple in expected if shortest[triple] == 2}, _get_triples(limited))
+
+    def test_invalid(self):
+        """Test unknown relations raise an error."""
+        with self.assertRaises(ValueError):
+            infer_mappings(_make_df([('a:1', 'skos:broadMatch', 'b:1')]))
+
+
+class TestResource(unittest.TestCase):
+    """Test the inferred mappings shipped with the resources."""
+
+    def test_up_to_date(self):
+        """Test the inferred mappings are up-to-date with the resources."""
+        expected = infer_mappings(max_hops=INFERRED_MAX_HOPS)
+        pd.testing.assert_frame_equal(expected, get_inferred_df().reset_index(drop=True))
+
+    def test_get_df(self):
+        """Test the inferred mappings can be included in all mappings."""
+        kwargs = dict(include_reactome_hierarchy=True, include_decopath=True, include_special=True)
+        df = get_df(**kwargs)
+        inferred_df = get_df(include_inferred=True, **kwargs)
+        self.assertEqual(list(df.columns), list(inferred_df.columns))
+        self.assertEqual(len(df.index) + len(get_inferred_df().index), len(inferred_df.index))
+        compact_df = get_df(include_inferred=True, compact=True, **kwargs)
+        self.assertEqual(len(inferred_df.index), len(compact_df.index))
+
+    def test_pathbank_wikipathways(self):
+        """Test the inferred mappings compose the PathBank-WikiPathways mappings, but not NeuroMMSig's."""
+        df = get_inferred_df()
+        provenance = df['Provenance']
+        self.assertTrue(provenance.str.contains(r'pathbank:\S+ \S+ wikipathways:').any())
+        self.assertTrue(provenance.str.contains(r'wikipathways:\S+ \S+ pathbank:').any())
+        self.assertFalse(provenance.str.contains('neurommsig:').any())
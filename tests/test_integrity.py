@@ -2,21 +2,22 @@
 
 """Test data integrity."""
 
-import re
 import unittest
 
-import bioregistry
 import pandas as pd
 
 from compath_resources.resources import (
-    get_decopath_df, get_kegg_reactome_df, get_kegg_wikipathways_df, get_pathbank_kegg_df, get_pathbank_reactome_df,
-    get_pathbank_wikipathways_df, get_reactome_hierarchy_df, get_special_mappings_df, get_wikipathways_reactome_df,
+    DF_COLUMNS, KEGG_REACTOME_PATH, KEGG_WIKIPATHWAYS_PATH, PATHBANK_KEGG_PATH, PATHBANK_REACTOME_PATH,
+    PATHBANK_WIKIPATHWAYS_PATH, WIKIPATHWAYS_REACTOME_PATH, _get_df_paths, _read_resource, get_decopath_df, get_df, get_kegg_reactome_df, get_kegg_wikipathways_df, get_neurommsig_ad_df, get_neurommsig_pd_df,
+    get_pathbank_kegg_df, get_pathbank_reactome_df, get_pathbank_wikipathways_df, get_reactome_hierarchy_df,
+    get_special_mappings_df, get_wikipathways_reactome_df,
 )
 from compath_resources.sync import (
-    _import_decopath_df, _import_kegg_reactome_df, _import_kegg_wikipathways_df, _import_pathbank_kegg_df,
-    _import_pathbank_reactome_df, _import_pathbank_wikipathways_df, _import_reactome_hierarchy_df,
-    _import_special_mappings_df, _import_wikipathways_reactome_df,
+    _import_decopath_df, _import_kegg_reactome_df, _import_kegg_wikipathways_df, _import_neurommsig_ad_df,
+    _import_neurommsig_pd_df, _import_pathbank_kegg_df, _import_pathbank_reactome_df, _import_pathbank_wikipathways_df,
+    _import_reactome_hierarchy_df, _import_special_mappings_df, _import_wikipathways_reactome_df, check,
 )
+from compath_resources.validate import validate_df
 
 DATA = [
     (_import_decopath_df, get_decopath_df),
@@ -30,52 +31,37 @@ DATA = [
     (_import_kegg_wikipathways_df, get_kegg_wikipathways_df),
 ]
 
+#: The files of mappings between two databases, which are in :func:`get_df` by default
+PAIRWISE_PATHS = [
+    KEGG_WIKIPATHWAYS_PATH,
+    KEGG_REACTOME_PATH,
+    WIKIPATHWAYS_REACTOME_PATH,
+    PATHBANK_KEGG_PATH,
+    PATHBANK_REACTOME_PATH,
+    PATHBANK_WIKIPATHWAYS_PATH,
+]
+
+#: The NeuroMMSig mappings, which have missing names
+NEUROMMSIG_DATA = [
+    (_import_neurommsig_ad_df, get_neurommsig_ad_df),
+    (_import_neurommsig_pd_df, get_neurommsig_pd_df),
+]
+
 
 class TestIntegrity(unittest.TestCase):
     """Test case for checking data integrity."""
 
     def test_curies(self):
         """Test correct prefixes and identifiers."""
-        registry = dict(bioregistry.read_registry())
-        registry['decopath'] = {}  # TODO decopath needs a real resource and an entry in the bioregistry
-
-        miriam_patterns = {
-            k: re.compile(entry['miriam']['pattern'])
-            for k, entry in registry.items()
-            if 'miriam' in entry
-        }
-
-        dataframes = {
-            getter.__name__.removeprefix('get_').removesuffix('_df'): getter()
-            for _, getter in DATA
-        }
-
-        rows = ['Source Resource', 'Source ID', 'Target Resource', 'Target ID']
-        for name, df in dataframes.items():
+        for _, getter in DATA + NEUROMMSIG_DATA:
+            name = getter.__name__.removeprefix('get_').removesuffix('_df')
             with self.subTest(name=name):
-                for i, (source_prefix, source_id, target_prefix, target_id) in enumerate(df[rows].values):
-                    self.assertIn(source_prefix, registry.keys())
-                    self.assertNotEqual(source_prefix, 'kegg')
-                    self.assertFalse(
-                        bioregistry.is_deprecated(source_prefix),
-                        msg=f'[{name}, row {i}] deprecated source prefix: {source_prefix}',
-                    )
-                    if source_regex := miriam_patterns.get(source_prefix):
-                        self.assertRegex(
-                            source_id, source_regex,
-                            msg=f'[{name}, row {i}] source prefix: {source_prefix}',
-                        )
-                    self.assertIn(target_prefix, registry.keys())
-                    self.assertNotEqual(target_prefix, 'kegg')
-                    self.assertFalse(
-                        bioregistry.is_deprecated(target_prefix),
-                        msg=f'[{name}, row {i}] deprecated target prefix: {target_prefix}',
-                    )
-                    if target_regex := miriam_patterns.get(target_prefix):
-                        self.assertRegex(
-                            target_id, target_regex,
-                            msg=f'[{name}, row {i}] target prefix: {target_prefix}',
-                        )
+                report = validate_df(getter(), resource=name)
+                self.assertEqual(0, len(report.index), msg=f'\n{report.to_string()}')
+
+    def test_manifest(self):
+        """Test the resources are in sync with the mappings, according to the manifest of the last sync."""
+        self.assertEqual([], check(), msg='\nFiles are out of sync.\nrun `python -m compath_resources.sync`')
 
     def test_import(self):
         """Test the exported data is the same as the excel."""
@@ -89,3 +75,24 @@ class TestIntegrity(unittest.TestCase):
                     (xlsx_df.values == tsv_df.values).all(),
                     msg='\nFiles are out of sync.\nrun `python -m compath_resources.sync`',
                 )
+
+    def test_import_neurommsig(self):
+        """Test the exported NeuroMMSig mappings are the same as the tables."""
+        for importer, getter in NEUROMMSIG_DATA:
+            with self.subTest(name=importer.__name__):
+                pd.testing.assert_frame_equal(importer(), getter(), obj='Files are out of sync')
+
+    def test_get_df(self):
+        """Test the default dataframe has the mappings of each pairwise file, with none missing or repeated."""
+        paths = _get_df_paths()
+        self.assertEqual(len(set(paths)), len(paths))
+        self.assertEqual(set(PAIRWISE_PATHS), set(paths))
+
+        expected = pd.concat([_read_resource(path) for path in PAIRWISE_PATHS]).rename(columns=DF_COLUMNS)
+        expected = expected.drop_duplicates()
+        for compact in (False, True):
+            with self.subTest(compact=compact):
+                df = get_df(compact=compact).astype(object)
+                self.assertEqual(len(expected), len(df))
+                merged = df.merge(expected, how='outer', indicator=True)
+                self.assertTrue((merged['_merge'] == 'both').all())
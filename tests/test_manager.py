@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+"""Test the Bio2BEL manager."""
+
+import unittest
+from unittest import mock
+
+from click.testing import CliRunner
+
+from compath_resources import get_df
+from compath_resources.cli import main
+from compath_resources.exporters.bel import get_bel
+from compath_resources.manager import Manager, _count_nodes_and_edges
+
+
+class TestManager(unittest.TestCase):
+    """Test the manager builds its graph lazily and summarizes without it."""
+
+    def test_lazy(self):
+        """Test creating a manager and summarizing doesn't build a graph."""
+        with mock.patch('compath_resources.manager.get_bel') as mock_get_bel:
+            manager = Manager()
+            manager.summarize()
+            manager.count_relations()
+        mock_get_bel.assert_not_called()
+
+    def test_shared(self):
+        """Test managers share a graph."""
+        self.assertIs(Manager().to_bel(), Manager().to_bel())
+
+    def test_summarize(self):
+        """Test the summary counts the nodes and edges of the graph."""
+        graph = Manager().to_bel()
+        self.assertEqual(
+            dict(pathways=graph.number_of_nodes(), mappings=graph.number_of_edges()),
+            Manager().summarize(),
+        )
+        self.assertEqual(graph.number_of_edges(), Manager().count_relations())
+
+    def test_count_all(self):
+        """Test counting the nodes and edges of the graph of all mappings."""
+        df = get_df(include_reactome_hierarchy=True, include_decopath=True, include_special=True)
+        graph = get_bel(df)
+        self.assertEqual(
+            dict(pathways=graph.number_of_nodes(), mappings=graph.number_of_edges()),
+            _count_nodes_and_edges(df),
+        )
+
+    def test_cli(self):
+        """Test the summarize command."""
+        result = CliRunner().invoke(main, ['summarize'])
+        self.assertEqual(0, result.exit_code, msg=result.output)
+        self.assertIn(f'Mappings: {Manager().count_relations()}', result.output)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""Test the pathway size statistics."""
+
+import math
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from compath_resources.pathway_size_statistics import (
+    QUANTILES, QuantileSketch, SizeStatistics, read_size_statistics, write_size_statistics,
+)
+
+
+class TestSizeStatistics(unittest.TestCase):
+    """Test the streaming statistics agree with calculating them from all sizes at once."""
+
+    def setUp(self) -> None:
+        """Make sizes with a long tail, like the sizes of pathways."""
+        self.sizes = np.random.default_rng(0).lognormal(3.5, 1.2, 5000).astype(int)
+        self.statistics = SizeStatistics.from_sizes(self.sizes.tolist())
+
+    def test_summary(self):
+        """Test the summary statistics."""
+        self.assertEqual(len(self.sizes), self.statistics.count)
+        self.assertEqual(self.sizes.min(), self.statistics.minimum)
+        self.assertEqual(self.sizes.max(), self.statistics.maximum)
+        self.assertAlmostEqual(self.sizes.mean(), self.statistics.mean)
+
+    def test_histogram(self):
+        """Test the fixed-bin histogram."""
+        statistics = self.statistics
+        bins = np.arange(0, statistics.maximum_size + 1, statistics.bin_width)
+        expected, _ = np.histogram(self.sizes[self.sizes < statistics.maximum_size], bins=bins)
+        self.assertEqual(expected.tolist(), statistics.histogram)
+        self.assertEqual((self.sizes >= statistics.maximum_size).sum(), statistics.overflow)
+        self.assertEqual(len(self.sizes), sum(statistics.histogram) + statistics.overflow)
+
+    def test_quantiles(self):
+        """Test the quantiles are within the relative accuracy of the sketch."""
+        for q in QUANTILES:
+            with self.subTest(q=q):
+                expected = np.quantile(self.sizes, q, method='lower')
+                self.assertLessEqual(
+                    abs(self.statistics.quantile(q) - expected),
+                    self.statistics.sketch.relative_accuracy * expected,
+                )
+
+    def test_sketch(self):
+        """Test merging sketches and sketches with zeros or no values."""
+        self.assertTrue(math.isnan(QuantileSketch().quantile(0.5)))
+
+        a, b = QuantileSketch(), QuantileSketch()
+        for value in range(100):
+            (a if value % 2 else b).add(value)
+        a.merge(b)
+        self.assertEqual(100, a.count)
+        self.assertEqual(0.0, a.quantile(0.0))
+        self.assertAlmostEqual(99, a.quantile(1.0), delta=0.99)
+        with self.assertRaises(ValueError):
+            a.merge(QuantileSketch(relative_accuracy=0.1))
+
+    def test_round_trip(self):
+        """Test writing and reading the statistics."""
+        statistics = {'a': self.statistics, 'b': SizeStatistics.from_sizes([3, 5, 2500])}
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertIsNone(read_size_statistics(directory))
+            write_size_statistics(statistics, directory)
+            result = read_size_statistics(directory)
+            summary_df = pd.read_csv(f'{directory}/size_statistics.tsv', sep='\t')
+
+        self.assertEqual(
+            {name: value.to_dict() for name, value in statistics.items()},
+            {name: value.to_dict() for name, value in result.items()},
+        )
+        self.assertEqual(['a', 'b'], summary_df['database'].tolist())
+        self.assertEqual([len(self.sizes), 3], summary_df['pathways'].tolist())
+        self.assertEqual(1, summary_df['at least 2000'][1])
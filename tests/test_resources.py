@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+"""Test loading the resources."""
+
+import itertools as itt
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from compath_resources.resources import (
+    KEGG_REACTOME_PATH, RESOURCE_PATHS, SNAPSHOT_CODES_PATH, SNAPSHOT_METADATA_PATH, _read_resource, clear_cache,
+    get_df, get_kegg_reactome_df, warm_cache,
+)
+from compath_resources.resources.snapshot import read_snapshot, write_snapshot
+
+
+class TestCache(unittest.TestCase):
+    """Test the cache of parsed resources."""
+
+    def setUp(self) -> None:
+        """Start with an empty cache."""
+        clear_cache()
+
+    def test_get_df(self):
+        """Test repeated calls give equal, read-only dataframes."""
+        warm_cache()
+        df = get_df()
+        self.assertIsInstance(df, pd.DataFrame)
+        pd.testing.assert_frame_equal(df, get_df())
+        with self.assertRaises(ValueError):
+            df.iloc[0, 0] = 'nope'
+
+        # new columns don't leak into the cache
+        df['new'] = 1
+        self.assertNotIn('new', get_df().columns)
+
+        # copies can be modified
+        df = get_kegg_reactome_df().copy()
+        df.iloc[0, 0] = 'yep'
+        self.assertNotEqual('yep', get_kegg_reactome_df().iloc[0, 0])
+
+    def test_compact(self):
+        """Test the compact dataframes hold the same mappings as the default ones."""
+        for flags in itt.product([False, True], repeat=3):
+            with self.subTest(flags=flags):
+                df = get_df(*flags)
+                compact_df = get_df(*flags, compact=True)
+                for column in compact_df.columns:
+                    self.assertIsInstance(compact_df[column].dtype, pd.CategoricalDtype)
+                self.assertEqual(compact_df['source prefix'].dtype, compact_df['target prefix'].dtype)
+                pd.testing.assert_frame_equal(df, compact_df.astype(object))
+
+    def test_neurommsig(self):
+        """Test including the NeuroMMSig mappings, which have missing names, in both kinds of dataframes."""
+        df = get_df(include_neurommsig=True)
+        self.assertEqual({'neurommsig'}, set(df['source prefix']) - set(get_df()['source prefix']))
+        self.assertTrue(df['target name'].isna().any())
+        pd.testing.assert_frame_equal(df, get_df(include_neurommsig=True, compact=True).astype(object))
+
+    def test_invalidate(self):
+        """Test rewritten files are parsed again."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory).joinpath('test.tsv')
+            path.write_text('a\tb\n1\t2\n')
+            self.assertEqual([[1, 2]], _read_resource(path).values.tolist())
+
+            path.write_text('a\tb\n3\t4\n5\t6\n')
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+            self.assertEqual([[3, 4], [5, 6]], _read_resource(path).values.tolist())
+
+
+class TestSnapshot(unittest.TestCase):
+    """Test the precompiled snapshot."""
+
+    def test_up_to_date(self):
+        """Test the snapshot gives the same dataframes as parsing the resource files."""
+        snapshot = read_snapshot(SNAPSHOT_METADATA_PATH, SNAPSHOT_CODES_PATH)
+        self.assertIsNotNone(snapshot, msg='\nSnapshot is missing.\nrun `python -m compath_resources.sync`')
+        for path in RESOURCE_PATHS:
+            with self.subTest(name=path.name):
+                df = snapshot.get_df(path)
+                self.assertIsNotNone(df, msg='\nSnapshot is out of sync.\nrun `python -m compath_resources.sync`')
+                pd.testing.assert_frame_equal(pd.read_csv(path, sep='\t'), df)
+
+    def test_out_of_date(self):
+        """Test a resource file that changed after the snapshot is not loaded from it."""
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            path = directory.joinpath(KEGG_REACTOME_PATH.name)
+            shutil.copy(KEGG_REACTOME_PATH, path)
+            write_snapshot([path], directory / 'snapshot.json', directory / 'snapshot.npy')
+            snapshot = read_snapshot(directory / 'snapshot.json', directory / 'snapshot.npy')
+            pd.testing.assert_frame_equal(pd.read_csv(path, sep='\t'), snapshot.get_df(path))
+
+            with path.open('a') as file:
+                print('kegg.pathway\thsa1\ta\tskos:exactMatch\treactome\tR-HSA-1\tb', file=file)
+            self.assertIsNone(snapshot.get_df(path))
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+"""Test the HTTP/JSON server."""
+
+import asyncio
+import http.client
+import json
+import unittest
+from typing import Any, Optional, Tuple
+
+from compath_resources.closure import get_closure
+from compath_resources.constants import EXACT_MATCH
+from compath_resources.index import get_index
+from compath_resources.server import MappingServer
+
+CURIES = ['kegg.pathway:hsa00010', 'reactome:R-HSA-71406', 'wikipathways:WP78', 'nope:nope']
+
+
+class TestServer(unittest.IsolatedAsyncioTestCase):
+    """Test the server answers queries on localhost like the index does."""
+
+    async def asyncSetUp(self) -> None:
+        """Start a server on a free port."""
+        self.index = get_index()
+        self.server = MappingServer(self.index)
+        self.listener = await self.server.start(port=0)
+        self.port = self.listener.sockets[0].getsockname()[1]
+        self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=10)
+
+    async def asyncTearDown(self) -> None:
+        """Stop the server."""
+        self.connection.close()
+        self.listener.close()
+        await self.listener.wait_closed()
+
+    def _request(self, method: str, path: str, body: Optional[Any] = None) -> Tuple[int, Any]:
+        self.connection.request(method, path, body=None if body is None else json.dumps(body))
+        response = self.connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    async def request(self, method: str, path: str, body: Optional[Any] = None) -> Tuple[int, Any]:
+        """Send a request from a thread, so the server can answer it on this event loop."""
+        return await asyncio.get_running_loop().run_in_executor(None, self._request, method, path, body)
+
+    async def test_equivalents(self):
+        """Test batch equivalence queries over a single connection."""
+        status, response = await self.request('POST', '/equivalents', dict(curies=CURIES))
+        self.assertEqual(200, status)
+        self.assertEqual({curie: sorted(self.index.equivalents(curie)) for curie in CURIES}, response)
+        self.assertTrue(response['kegg.pathway:hsa00010'])
+        self.assertEqual([], response['nope:nope'])
+
+        # the same, as query parameters
+        status, response = await self.request('POST', '/equivalents?curie=kegg.pathway:hsa00010')
+        self.assertEqual(200, status)
+        self.assertEqual(sorted(self.index.equivalents('kegg.pathway:hsa00010')), response['kegg.pathway:hsa00010'])
+
+    async def test_translate(self):
+        """Test translating to a given prefix."""
+        status, response = await self.request('POST', '/translate', dict(curies=CURIES, prefix='reactome'))
+        self.assertEqual(200, status)
+        for curie, equivalents in response.items():
+            with self.subTest(curie=curie):
+                self.assertEqual(
+                    sorted(e for e in self.index.equivalents(curie) if e.startswith('reactome:')),
+                    equivalents,
+                )
+
+    async def test_hierarchy(self):
+        """Test hierarchy queries."""
+        status, response = await self.request('POST', '/hierarchy', dict(curies=CURIES))
+        self.assertEqual(200, status)
+        for curie in CURIES:
+            with self.subTest(curie=curie):
+                self.assertEqual(sorted(self.index.parents(curie)), response[curie]['parents'])
+                self.assertEqual(sorted(self.index.children(curie)), response[curie]['children'])
+
+        # only the direct parents are given, not their parents
+        curie, parent, grandparent = next(
+            (curie, parent, grandparent)
+            for curie in (f'{prefix}:{identifier}' for prefix, identifier in self.index.names)
+            for parent in self.index.parents(curie)
+            for grandparent in self.index.parents(parent)
+            if grandparent not in self.index.parents(curie)
+        )
+        status, response = await self.request('POST', '/hierarchy', dict(curies=[curie]))
+        self.assertIn(parent, response[curie]['parents'])
+        self.assertNotIn(grandparent, response[curie]['parents'])
+
+    async def test_transitive_hierarchy(self):
+        """Test hierarchy queries with the ancestors and descendants from the closure."""
+        closure = get_closure()
+        for path, body in [
+            ('/hierarchy', dict(curies=CURIES, transitive=True)),
+            ('/hierarchy?transitive=true&' + '&'.join(f'curie={curie}' for curie in CURIES), None),
+        ]:
+            with self.subTest(path=path):
+                status, response = await self.request('POST', path, body)
+                self.assertEqual(200, status)
+                for curie in CURIES:
+                    self.assertEqual(sorted(self.index.parents(curie)), response[curie]['parents'])
+                    self.assertEqual(sorted(closure.ancestors(curie)), response[curie]['ancestors'])
+                    self.assertEqual(sorted(closure.descendants(curie)), response[curie]['descendants'])
+                    self.assertLessEqual(set(response[curie]['parents']), set(response[curie]['ancestors']))
+        self.assertTrue(response['reactome:R-HSA-71406']['ancestors'])
+
+        status, response = await self.request('POST', '/hierarchy', dict(curies=CURIES, transitive='nope'))
+        self.assertEqual(400, status)
+
+    async def test_lookup(self):
+        """Test looking up mappings with a given relation."""
+        status, response = await self.request('POST', '/lookup', dict(curies=CURIES, relation=EXACT_MATCH))
+        self.assertEqual(200, status)
+        for curie in CURIES:
+            with self.subTest(curie=curie):
+                expected = self.index.lookup(curie, relation=EXACT_MATCH)
+                self.assertEqual([mapping._asdict() for mapping in expected], response[curie])
+
+    async def test_errors(self):
+        """Test invalid requests get errors and don't break the connection."""
+        for method, path, body, expected_status in [
+            ('POST', '/equivalents', dict(curies='kegg.pathway:hsa00010'), 400),
+            ('POST', '/equivalents', dict(curies=['hsa00010']), 400),
+            ('POST', '/equivalents', [], 400),
+            ('GET', '/equivalents', None, 405),
+            ('GET', '/nope', None, 404),
+        ]:
+            with self.subTest(method=method, path=path, body=body):
+                status, response = await self.request(method, path, body)
+                self.assertEqual(expected_status, status)
+                self.assertIn('error', response)
+
+        status, response = await self.request('GET', '/health')
+        self.assertEqual(200, status)
+        self.assertEqual(len(self.index), response['mappings'])
+
+    async def test_metrics(self):
+        """Test request latencies are reported by endpoint."""
+        for _ in range(3):
+            await self.request('POST', '/equivalents', dict(curies=CURIES))
+        await self.request('POST', '/hierarchy', dict(curies=[1]))
+        status, response = await self.request('GET', '/metrics')
+        self.assertEqual(200, status)
+        endpoints = response['endpoints']
+        self.assertEqual(3, endpoints['/equivalents']['requests'])
+        self.assertEqual(0, endpoints['/equivalents']['errors'])
+        self.assertEqual(1, endpoints['/hierarchy']['errors'])
+        self.assertLessEqual(endpoints['/equivalents']['p50_ms'], endpoints['/equivalents']['max_ms'])
+
+    async def test_invalid_request(self):
+        """Test requests that can't be read get an error that's counted in the metrics."""
+        for request in [
+            b'POST /equivalents' + b'?curie=nope:nope' * 4_500 + b' HTTP/1.1\r\n\r\n',
+            b'POST /equivalents HTTP/1.1\r\nX-Nope: ' + b'nope' * 17_000 + b'\r\n\r\n',
+            b'nope\r\n\r\n',
+        ]:
+            with self.subTest(request=request[:20]):
+                reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+                writer.write(request)
+                await writer.drain()
+                response = await reader.read()
+                writer.close()
+                await writer.wait_closed()
+                self.assertTrue(response.startswith(b'HTTP/1.1 400 Bad Request\r\n'), msg=response[:100])
+
+        status, response = await self.request('GET', '/metrics')
+        self.assertEqual(200, status)
+        self.assertEqual(3, response['endpoints']['other']['errors'])
+        self.assertNotIn('/equivalents', response['endpoints'])
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+"""Test importing the package doesn't import heavy dependencies it doesn't need."""
+
+import unittest
+
+from compath_resources.utils import get_import_times
+
+HEAVY_MODULES = {'pandas', 'pybel', 'rdflib', 'pystow', 'bio2bel'}
+
+
+class TestStartup(unittest.TestCase):
+    """Test the package imports its dependencies lazily."""
+
+    def assert_not_imported(self, statement: str, modules) -> None:
+        """Assert running the statement imports none of the modules."""
+        imported = set(get_import_times(statement))
+        self.assertFalse(imported & set(modules), msg=f'imported by `{statement}`')
+
+    def test_import_package(self):
+        """Test importing the package only imports the package."""
+        self.assert_not_imported('import compath_resources', HEAVY_MODULES)
+
+    def test_import_get_df(self):
+        """Test loading the mappings doesn't import the exporters' dependencies."""
+        self.assert_not_imported(
+            'from compath_resources import get_df; get_df()',
+            {'pybel', 'rdflib', 'pystow', 'bio2bel'},
+        )
+
+    def test_lazy_attributes(self):
+        """Test the lazily imported functions are the ones from their modules."""
+        import compath_resources
+        from compath_resources import exporters
+        from compath_resources.exporters.bel import get_bel
+        from compath_resources.exporters.rdf import write_rdf
+        from compath_resources.resources import get_df
+
+        self.assertIs(get_df, compath_resources.get_df)
+        self.assertIs(get_bel, compath_resources.get_bel)
+        self.assertIs(write_rdf, exporters.write_rdf)
+        self.assertIn('get_rdf', dir(compath_resources))
+        with self.assertRaises(AttributeError):
+            compath_resources.nope  # noqa: B018
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+
+"""Test the sync utilities."""
+
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+from compath_resources import sync
+from compath_resources.sync import (
+    Importer, _MAPPINGS_DIRECTORY, _fix_kegg_entries, _import_df, _import_kegg_reactome_df, _import_neurommsig_df,
+    _sync_resource, check,
+)
+from compath_resources.utils import atomic_path
+
+
+class TestSync(unittest.TestCase):
+    """Test importing the mappings."""
+
+    def test_fix_kegg_entries(self):
+        """Test fixing KEGG prefixes, identifiers and relations."""
+        df = pd.DataFrame(
+            [
+                ('kegg', 'path:hsa00010', 'a', 'isPartOf', 'reactome', 'R-HSA-1', 'b'),
+                ('kegg.pathway', 'hsa00020', 'c', 'equivalentTo', 'kegg', 'path:hsa00030', 'd'),
+                ('reactome', 'path:R-HSA-2', 'e', 'skos:exactMatch', 'pathbank', 'SMP1', 'f'),
+            ],
+            columns=[
+                'Source Resource', 'Source ID', 'Source Name', 'Mapping Type', 'Target Resource', 'Target ID',
+                'Target Name',
+            ],
+        )
+        _fix_kegg_entries(df)
+        self.assertEqual(['kegg.pathway', 'kegg.pathway', 'reactome'], df['Source Resource'].tolist())
+        self.assertEqual(['hsa00010', 'hsa00020', 'path:R-HSA-2'], df['Source ID'].tolist())
+        self.assertEqual(['reactome', 'kegg.pathway', 'pathbank'], df['Target Resource'].tolist())
+        self.assertEqual(['R-HSA-1', 'hsa00030', 'SMP1'], df['Target ID'].tolist())
+        self.assertEqual(['BFO:0000050', 'skos:exactMatch', 'skos:exactMatch'], df['Mapping Type'].tolist())
+
+        df.loc[0, 'Mapping Type'] = 'skos:closeMatch'
+        with self.assertRaises(ValueError):
+            _fix_kegg_entries(df)
+
+    def test_fix_kegg_organism(self):
+        """Test adding the organism to KEGG identifiers that are only numbers."""
+        df = pd.DataFrame(
+            [
+                ('kegg', 4062, 'a', 'equivalentTo', 'kegg.pathway', 'path:00010', 'b'),
+                ('reactome', '123', 'c', 'equivalentTo', 'kegg.pathway', 'hsa00020', 'd'),
+            ],
+            columns=[
+                'Source Resource', 'Source ID', 'Source Name', 'Mapping Type', 'Target Resource', 'Target ID',
+                'Target Name',
+            ],
+        )
+        _fix_kegg_entries(df)
+        self.assertEqual(['hsa04062', '123'], df['Source ID'].tolist())
+        self.assertEqual(['hsa00010', 'hsa00020'], df['Target ID'].tolist())
+
+    def test_import_neurommsig(self):
+        """Test normalizing a wide NeuroMMSig table into mappings."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'ad_neurommsig_pathway_dbs.tsv'
+            path.write_text(
+                'NeuroMMSig Name\tNeuroMMSig ID\tKEGG ID\tReactome ID\tWikiPathways ID\tNeuroMMSig PD ID\n'
+                'Notch subgraph\tNEUROMMSIG7\t04330\t\tWP61|WP3845\tNEUROMMSIG133\n'
+                'Lonely subgraph\tNEUROMMSIG3\t\t\t\t\n'
+                'Chaperone subgraph\tNEUROMMSIG35\t\tR-HSA-390466\t\t\n'
+            )
+            df = _import_neurommsig_df(path)
+        self.assertEqual(
+            [
+                ('NEUROMMSIG7', 'kegg.pathway', 'hsa04330'),
+                ('NEUROMMSIG7', 'wikipathways', 'WP61'),
+                ('NEUROMMSIG7', 'wikipathways', 'WP3845'),
+                ('NEUROMMSIG7', 'neurommsig', 'NEUROMMSIG133'),
+                ('NEUROMMSIG35', 'reactome', 'R-HSA-390466'),
+            ],
+            list(df[['Source ID', 'Target Resource', 'Target ID']].itertuples(index=False, name=None)),
+        )
+        self.assertEqual({'neurommsig'}, set(df['Source Resource']))
+        self.assertEqual({'skos:exactMatch'}, set(df['Mapping Type']))
+        # names of targets come from the other resources and from the NeuroMMSig tables in the package
+        self.assertEqual('Notch signaling pathway - Homo sapiens (human)', df['Target Name'].iloc[0])
+        self.assertEqual('Notch signaling subgraph', df['Target Name'].iloc[3])
+
+    def test_sync_resource(self):
+        """Test importing and writing a resource file."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'kegg_reactome.tsv'
+            result = _sync_resource(_import_kegg_reactome_df, path)
+            self.assertEqual(['kegg_reactome.tsv'], os.listdir(directory))
+            df = pd.read_csv(path, sep='\t')
+        self.assertEqual('kegg_reactome.tsv', result.name)
+        self.assertEqual(len(df.index), result.rows)
+        pd.testing.assert_frame_equal(_import_kegg_reactome_df().reset_index(drop=True), df)
+
+    def test_skip_unchanged(self):
+        """Test only the sources that changed since the last sync are imported again."""
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            importers = []
+            for name in ('kegg_reactome', 'pathbank_kegg'):
+                source = directory / f'{name}.csv'
+                shutil.copy(_MAPPINGS_DIRECTORY / source.name, source)
+                importers.append(Importer(
+                    function=lambda source=source: _import_df(source),
+                    source=source,
+                    output=directory / f'{name}.tsv',
+                ))
+
+            with mock.patch.object(sync, 'IMPORTERS', importers), \
+                    mock.patch.object(sync, 'MANIFEST_PATH', directory / 'sync.json'), \
+                    mock.patch.object(sync.rsc, 'write_snapshot') as write_snapshot, \
+                    mock.patch.object(sync, 'write_closure'), \
+                    mock.patch.object(sync, 'write_inferred'):
+                self.assertEqual(['kegg_reactome.tsv', 'pathbank_kegg.tsv'], check())
+                results = sync.sync(workers=1)
+                self.assertFalse(any(result.skipped for result in results))
+                self.assertEqual([], check())
+                self.assertEqual(1, write_snapshot.call_count)
+
+                results = sync.sync(workers=1)
+                self.assertTrue(all(result.skipped for result in results))
+                self.assertEqual(1, write_snapshot.call_count)
+
+                with open(importers[1].source, 'a') as file:
+                    print('kegg,path:hsa00010,a,isPartOf,kegg,path:hsa00020,b', file=file)
+                self.assertEqual(['pathbank_kegg.tsv'], check())
+                results = sync.sync(workers=1)
+                self.assertEqual([True, False], [result.skipped for result in results])
+                self.assertEqual(results[0].rows, len(pd.read_csv(importers[0].output, sep='\t').index))
+                self.assertEqual(
+                    len(pd.read_csv(importers[1].source).index),
+                    len(pd.read_csv(importers[1].output, sep='\t').index),
+                )
+                self.assertEqual(2, write_snapshot.call_count)
+
+                importers[0].output.write_text('edited by hand')
+                self.assertEqual(['kegg_reactome.tsv'], check())
+                self.assertEqual([False, True], [result.skipped for result in sync.sync(workers=1, force=False)])
+                self.assertEqual([False, False], [result.skipped for result in sync.sync(workers=1, force=True)])
+
+    def test_dependencies(self):
+        """Test importers that read the outputs of other importers run after them, and again when they change."""
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            source = directory / 'kegg_reactome.csv'
+            shutil.copy(_MAPPINGS_DIRECTORY / source.name, source)
+            base = Importer(
+                function=lambda: _import_df(source),
+                source=source,
+                output=directory / 'kegg_reactome.tsv',
+            )
+            dependent_source = directory / 'last.txt'
+            dependent_source.write_text('the last mapping of kegg_reactome.tsv')
+            dependent = Importer(
+                function=lambda path: pd.read_csv(path, sep='\t').iloc[-1:],
+                source=dependent_source,
+                output=directory / 'last.tsv',
+                dependencies=(base.output,),
+            )
+            self.assertEqual([[base], [dependent]], sync._get_stages([dependent, base]))
+            with self.assertRaises(ValueError):
+                sync._get_stages([dependent._replace(output=base.output, dependencies=(base.output,))])
+
+            with mock.patch.object(sync, 'IMPORTERS', [dependent, base]), \
+                    mock.patch.object(sync, 'MANIFEST_PATH', directory / 'sync.json'), \
+                    mock.patch.object(sync.rsc, 'write_snapshot'), \
+                    mock.patch.object(sync, 'write_closure'), \
+                    mock.patch.object(sync, 'write_inferred'):
+                sync.sync(workers=1)
+                self.assertEqual([], check())
+                self.assertIn('dependencies', sync._read_manifest()['last.tsv'])
+
+                with open(source, 'a') as file:
+                    print('kegg,path:hsa00010,a,isPartOf,reactome,R-HSA-1,b', file=file)
+                self.assertEqual(['kegg_reactome.tsv'], check())
+                self.assertEqual([False, False], [result.skipped for result in sync.sync(workers=1)])
+                # the dependent importer saw the new output
+                last = pd.read_csv(dependent.output, sep='\t')
+                self.assertEqual(['hsa00010', 'R-HSA-1'], last[['Source ID', 'Target ID']].values[0].tolist())
+                self.assertEqual([], check())
+
+    def test_atomic_path(self):
+        """Test a file is only replaced if writing it succeeds."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'test.tsv'
+            path.write_text('old')
+            with self.assertRaises(RuntimeError), atomic_path(path) as temporary_path:
+                temporary_path.write_text('half')
+                raise RuntimeError
+            self.assertEqual('old', path.read_text())
+            self.assertEqual(['test.tsv'], os.listdir(directory))
+
+            with atomic_path(path) as temporary_path:
+                self.assertEqual('.tsv', temporary_path.suffix)
+                temporary_path.write_text('new')
+                self.assertEqual('old', path.read_text())
+            self.assertEqual('new', path.read_text())
+            self.assertEqual(['test.tsv'], os.listdir(directory))
+
+    def test_atomic_path_mode(self):
+        """Test replaced files keep their mode and new files get the mode from the umask."""
+        umask = os.umask(0o022)
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                path = Path(directory) / 'test.tsv'
+                with atomic_path(path) as temporary_path:
+                    temporary_path.write_text('new')
+                self.assertEqual(0o644, stat.S_IMODE(os.stat(path).st_mode))
+
+                os.chmod(path, 0o640)
+                with atomic_path(path) as temporary_path:
+                    temporary_path.write_text('newer')
+                self.assertEqual(0o640, stat.S_IMODE(os.stat(path).st_mode))
+        finally:
+            os.umask(umask)
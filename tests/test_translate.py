@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+"""Test translating columns of pathways in large tables."""
+
+import io
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+from click.testing import CliRunner
+
+from compath_resources.cli import main
+from compath_resources.closure import Closure, get_closure
+from compath_resources.constants import EXACT_MATCH, PART_OF
+from compath_resources.index import PathwayMapping
+from compath_resources.resources import get_pathbank_wikipathways_df
+from compath_resources.translate import DELIMITER, get_translation_table, translate_df, translate_file
+
+TABLE = '''pathway\tscore
+reactome:R-HSA-1\t0.1
+kegg.pathway:hsa1\t0.2
+wikipathways:WP1\t0.3
+reactome:R-HSA-3\t0.4
+nope:1\t0.5
+'''
+
+
+def _mapping(source: str, relation: str, target: str) -> PathwayMapping:
+    return PathwayMapping(*source.split(':'), source, relation, *target.split(':'), target)
+
+
+def _get_closure() -> Closure:
+    return Closure.from_mappings([
+        _mapping('reactome:R-HSA-1', EXACT_MATCH, 'kegg.pathway:hsa1'),
+        _mapping('kegg.pathway:hsa1', EXACT_MATCH, 'wikipathways:WP1'),
+        _mapping('reactome:R-HSA-2', EXACT_MATCH, 'wikipathways:WP1'),
+        _mapping('reactome:R-HSA-3', PART_OF, 'kegg.pathway:hsa1'),
+    ])
+
+
+class TestTranslationTable(unittest.TestCase):
+    """Test building the tables of translations."""
+
+    def setUp(self) -> None:
+        """Build a closure with one equivalence cluster and a pathway that's only part of another one."""
+        self.closure = _get_closure()
+
+    def test_prefix(self):
+        """Test translating to the equivalents with a prefix."""
+        table = get_translation_table(prefix='reactome', closure=self.closure)
+        self.assertEqual(
+            {
+                'kegg.pathway:hsa1': f'reactome:R-HSA-1{DELIMITER}reactome:R-HSA-2',
+                'wikipathways:WP1': f'reactome:R-HSA-1{DELIMITER}reactome:R-HSA-2',
+                'reactome:R-HSA-1': 'reactome:R-HSA-2',
+                'reactome:R-HSA-2': 'reactome:R-HSA-1',
+            },
+            table,
+        )
+
+    def test_representative(self):
+        """Test translating to the representatives, including pathways without equivalents."""
+        table = get_translation_table(representative=True, closure=self.closure)
+        self.assertEqual(
+            {curie: self.closure.representative(curie) for curie in table},
+            table,
+        )
+        self.assertEqual('reactome:R-HSA-3', table['reactome:R-HSA-3'])
+        self.assertEqual(1, len({table[curie] for curie in self.closure.cluster('wikipathways:WP1')}))
+
+    def test_input_prefix(self):
+        """Test keying the table on the identifiers of one prefix."""
+        table = get_translation_table(prefix='kegg.pathway', input_prefix='reactome', closure=self.closure)
+        self.assertEqual({'R-HSA-1': 'kegg.pathway:hsa1', 'R-HSA-2': 'kegg.pathway:hsa1'}, table)
+
+    def test_invalid(self):
+        """Test translating to both a prefix and the representatives raises an error."""
+        with self.assertRaises(ValueError):
+            get_translation_table(prefix='reactome', representative=True, closure=self.closure)
+
+    def test_resources(self):
+        """Test the translations of the resources match the equivalence clusters."""
+        closure = get_closure()
+        table = get_translation_table(prefix='kegg.pathway')
+        self.assertTrue(table)
+        for curie, translations in table.items():
+            expected = {member for member in closure.cluster(curie) if member.startswith('kegg.pathway:')}
+            self.assertEqual(expected - {curie}, set(translations.split(DELIMITER)))
+
+    def test_pathbank_wikipathways(self):
+        """Test translating PathBank pathways to their WikiPathways equivalents."""
+        table = get_translation_table(prefix='wikipathways', input_prefix='pathbank')
+        self.assertIn('wikipathways:WP28', table['PW000007'].split(DELIMITER))
+        df = get_pathbank_wikipathways_df()
+        df = df[(df['Mapping Type'] == EXACT_MATCH) & (df['Source Resource'] == 'pathbank')]
+        for identifier, target in df[['Source ID', 'Target ID']].values:
+            with self.subTest(identifier=identifier):
+                self.assertIn(f'wikipathways:{target}', table[identifier].split(DELIMITER))
+
+
+class TestTranslate(unittest.TestCase):
+    """Test translating tables."""
+
+    def test_translate_df(self):
+        """Test unmapped values are left empty and a missing column raises an error."""
+        df = pd.DataFrame({'pathway': ['a:1', 'b:1']})
+        self.assertEqual(1, translate_df(df, 'pathway', {'a:1': 'c:1'}))
+        self.assertEqual(['c:1', ''], df['pathway_translated'].tolist())
+        with self.assertRaises(KeyError):
+            translate_df(df, 'nope', {})
+
+    def test_chunks(self):
+        """Test the output doesn't depend on the size of the chunks."""
+        outputs = []
+        for chunk_size in (1, 2, 100):
+            with self.subTest(chunk_size=chunk_size):
+                output = io.StringIO()
+                result = translate_file(io.StringIO(TABLE), output, 'pathway', representative=True, chunk_size=chunk_size)
+                self.assertEqual(5, result.rows)
+                outputs.append(output.getvalue())
+        self.assertEqual(1, len(set(outputs)))
+
+        df = pd.read_csv(io.StringIO(outputs[0]), sep='\t', dtype=str, keep_default_na=False)
+        self.assertEqual(['pathway', 'score', 'pathway_translated'], list(df.columns))
+        self.assertEqual(['0.1', '0.2', '0.3', '0.4', '0.5'], df['score'].tolist())
+        self.assertEqual('', df['pathway_translated'].iloc[-1])
+
+    def test_empty(self):
+        """Test a table with only a header is written with the translated column."""
+        for chunk_size in (1, 100):
+            with self.subTest(chunk_size=chunk_size):
+                output = io.StringIO()
+                result = translate_file(
+                    io.StringIO('pathway\tscore\n'), output, 'pathway', prefix='reactome', chunk_size=chunk_size,
+                )
+                self.assertEqual(0, result.rows)
+                self.assertEqual('pathway\tscore\tpathway_translated\n', output.getvalue())
+
+    def test_cli(self):
+        """Test the command line interface writes the table and reports the throughput."""
+        table = get_translation_table(prefix='reactome')
+        curie = next(iter(table))
+        runner = CliRunner()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'output.tsv')
+            result = runner.invoke(main, [
+                'translate', '-c', 'pathway', '--prefix', 'reactome', '--output-column', 'reactome', '-o', path,
+            ], input=f'pathway\n{curie}\nnope:1\n')
+            self.assertEqual(0, result.exit_code, msg=result.output)
+            self.assertIn('translated 1 of 2 rows', result.output)
+            with open(path) as file:
+                self.assertEqual(f'pathway\treactome\n{curie}\t{table[curie]}\nnope:1\t\n', file.read())
+
+        result = runner.invoke(main, ['translate', '-c', 'pathway', '--prefix', 'reactome', '--representative'])
+        self.assertNotEqual(0, result.exit_code)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+"""Test validating prefixes and identifiers."""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from compath_resources import get_df
+from compath_resources.validate import REPORT_COLUMNS, validate_df, validate_resources
+
+
+class TestValidate(unittest.TestCase):
+    """Test validating prefixes and identifiers."""
+
+    def test_resources(self):
+        """Test the resource files are valid."""
+        report = validate_resources()
+        self.assertEqual(REPORT_COLUMNS, list(report.columns))
+        self.assertEqual(0, len(report.index), msg=f'\n{report.to_string()}')
+
+    def test_invalid(self):
+        """Test each kind of problem is reported with the position of its row."""
+        df = pd.DataFrame(
+            [
+                ('kegg.pathway', 'hsa00010', 'a', 'BFO:0000050', 'reactome', 'R-HSA-1', 'b'),
+                ('kegg', 'hsa00010', 'a', 'BFO:0000050', 'reactome', 'R-HSA-1', 'b'),
+                ('kegg.pathway', 'path:hsa00010', 'a', 'BFO:0000050', 'nope', 'R-HSA-1', 'b'),
+                ('decopath', 'DC1', 'a', 'BFO:0000050', np.nan, 'R-HSA-1', 'b'),
+                ('KEGG.PATHWAY', 'hsa00010', 'a', 'BFO:0000050', 'Reactome', 'R-HSA-1', 'b'),
+            ],
+            columns=[
+                'source prefix', 'source identifier', 'source name', 'relation', 'target prefix', 'target identifier',
+                'target name',
+            ],
+            index=[10, 11, 12, 13, 14],
+        )
+        report = validate_df(df, resource='test')
+        self.assertEqual(
+            [
+                ('test', 1, 'source', 'kegg', 'hsa00010'),
+                ('test', 2, 'source', 'kegg.pathway', 'path:hsa00010'),
+                ('test', 2, 'target', 'nope', 'R-HSA-1'),
+                ('test', 3, 'target', np.nan, 'R-HSA-1'),
+                ('test', 4, 'source', 'KEGG.PATHWAY', 'hsa00010'),
+                ('test', 4, 'target', 'Reactome', 'R-HSA-1'),
+            ],
+            [tuple(row) for row in report[REPORT_COLUMNS[:-1]].values],
+        )
+        self.assertEqual(
+            ['use kegg.pathway instead of KEGG.PATHWAY', 'use reactome instead of Reactome'],
+            report['problem'].iloc[-2:].tolist(),
+        )
+
+    def test_get_df(self):
+        """Test validating the mapping table, and that invalid rows can be found with the report."""
+        df = get_df().copy()
+        df.iloc[5, df.columns.get_loc('target prefix')] = 'kegg'
+        report = validate_df(df)
+        self.assertEqual([5], report['row'].tolist())
+        self.assertEqual('use kegg.pathway instead of kegg', report['problem'].iloc[0])